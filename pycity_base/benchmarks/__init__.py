@@ -0,0 +1,9 @@
+"""
+Performance benchmarks of pyCity's main computation paths.
+
+Run the complete suite with
+
+    python -m pycity_base.benchmarks
+
+See pycity_base.benchmarks.benchmark_suite for the available options.
+"""
@@ -0,0 +1,13 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Command line entry point of the benchmark suite.
+"""
+
+import sys
+
+from pycity_base.benchmarks.benchmark_suite import main
+
+
+if __name__ == '__main__':
+    sys.exit(main())
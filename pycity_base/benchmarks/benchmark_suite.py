@@ -0,0 +1,615 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Benchmark suite of pyCity's computation paths.
+
+Every benchmark consists of a setup function, which prepares all inputs
+(not timed), and the returned run function, which is timed with
+time.perf_counter. The peak memory of the run function is measured in an
+additional run with tracemalloc. All inputs are read from the local input
+folders, thus the suite runs offline.
+
+Results are stored as JSON files. A stored result file (baseline) can be
+compared with a new run to detect regressions:
+
+    python -m pycity_base.benchmarks --save    # Record a baseline
+    python -m pycity_base.benchmarks           # Compare with the baseline
+
+The process exits with code 1, if a regression has been found.
+"""
+
+from __future__ import division
+
+import os
+import gc
+import sys
+import json
+import time
+import platform
+import argparse
+import tracemalloc
+
+import numpy as np
+import openpyxl
+
+import shapely.geometry.point as point
+
+import pycity_base.classes.timer
+import pycity_base.classes.weather
+import pycity_base.classes.prices
+import pycity_base.classes.environment
+import pycity_base.classes.building as build
+import pycity_base.classes.city_district as citydist
+import pycity_base.classes.demand.apartment as apart
+import pycity_base.classes.demand.domestic_hot_water as dhw
+import pycity_base.classes.demand.electrical_demand as ed
+import pycity_base.classes.demand.load as load
+import pycity_base.classes.demand.occupancy as occ
+import pycity_base.classes.demand.space_heating as sh
+import pycity_base.classes.demand.zone_inputs as zi
+import pycity_base.classes.demand.zone_parameters as zp
+import pycity_base.classes.supply.heat_pump as hp
+import pycity_base.classes.supply.photovoltaic as pv
+import pycity_base.classes.supply.wind_energy_converter as wec
+import pycity_base.functions.change_resolution as chres
+import pycity_base.functions.zone_model as zmodel
+import pycity_base.functions.scripts.city_generators.city_generator as citgen
+
+
+#  Problem sizes. 'full' uses realistic sizes (annual simulation with
+#  15 minute resolution), 'quick' reduced sizes for smoke tests.
+sizes = {'full': {'time_discretization': 900, 'nb_buildings': 100},
+         'quick': {'time_discretization': 3600, 'nb_buildings': 10}}
+
+_src_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _create_environment(size, full_horizon=False):
+    """
+    Create an environment for one year in the resolution of the given size.
+
+    If full_horizon is True, the horizon of the timer covers the whole year.
+    """
+    time_discretization = sizes[size]['time_discretization']
+    timesteps_total = int(365 * 24 * 3600 / time_discretization)
+    if full_horizon:
+        timer = pycity_base.classes.timer.Timer(
+            time_discretization=time_discretization,
+            timesteps_horizon=timesteps_total,
+            timesteps_used_horizon=timesteps_total,
+            timesteps_total=timesteps_total)
+    else:
+        timer = pycity_base.classes.timer.Timer(
+            time_discretization=time_discretization,
+            timesteps_total=timesteps_total)
+    weather = pycity_base.classes.weather.Weather(timer)
+    prices = pycity_base.classes.prices.Prices()
+    return pycity_base.classes.environment.Environment(timer, weather, prices)
+
+
+def _read_sheet_columns(filename, sheet, first_row, columns):
+    """
+    Read columns of an excel sheet from the input folder, starting at
+    first_row, until the sheet ends.
+    """
+    path = os.path.join(_src_path, 'inputs', filename)
+    worksheet = openpyxl.load_workbook(path, data_only=True)[sheet]
+    return [np.array([worksheet.cell(row, column).value
+                      for row in range(first_row, worksheet.max_row + 1)])
+            for column in columns]
+
+
+def _bench_weather_loading(size):
+    timer = _create_environment(size).timer
+
+    def run():
+        pycity_base.classes.weather.Weather(timer)
+    return run
+
+
+def _bench_sun_geometry(size):
+    weather = _create_environment(size).weather
+
+    def run():
+        weather.computeGeometry(allTimeSteps=True)
+    return run
+
+
+def _bench_tilted_radiation(size):
+    weather = _create_environment(size).weather
+
+    def run():
+        weather.getRadiationTiltedSurface(beta=35, gamma=0, update=True,
+                                          currentValues=False)
+    return run
+
+
+def _bench_change_resolution(size):
+    time_discretization = sizes[size]['time_discretization']
+    random_state = np.random.RandomState(0)
+    minutely = random_state.rand(525600)
+    hourly = random_state.rand(8760)
+
+    def run():
+        chres.changeResolution(minutely, 60, time_discretization)
+        chres.changeResolution(minutely, 60, time_discretization, 'sum')
+        chres.changeResolution(hourly, 3600, 60)
+    return run
+
+
+def _bench_slp_electrical(size):
+    environment = _create_environment(size)
+    load.clear_shared_profiles()
+
+    def run():
+        ed.ElectricalDemand(environment, method=1, annual_demand=3000,
+                            profile_type='H0')
+    return run
+
+
+def _bench_slp_thermal(size):
+    environment = _create_environment(size)
+    load.clear_shared_profiles()
+
+    def run():
+        sh.SpaceHeating(environment, method=1, profile_type='HEF',
+                        living_area=150, specific_demand=100)
+    return run
+
+
+def _bench_occupancy(size):
+    environment = _create_environment(size)
+
+    def run():
+        occ.Occupancy(environment, number_occupants=3)
+    return run
+
+
+def _bench_dhw_stochastic(size):
+    environment = _create_environment(size)
+    occupancy = occ.Occupancy(environment, number_occupants=3).occupancy
+
+    def run():
+        dhw.DomesticHotWater(environment, t_flow=60, thermal=True, method=2,
+                             supply_temperature=20, occupancy=occupancy)
+    return run
+
+
+def _bench_el_stochastic(size):
+    environment = _create_environment(size)
+    occupancy = occ.Occupancy(environment, number_occupants=3).occupancy
+
+    def run():
+        ed.ElectricalDemand(environment, method=2, total_nb_occupants=3,
+                            randomize_appliances=True, light_configuration=0,
+                            occupancy=occupancy)
+    return run
+
+
+def _bench_zone_model(size):
+    environment = _create_environment(size)
+    timer = environment.timer
+
+    #  Single zone with 100 m^2 floor area and windows in the south. The
+    #  U-values are given per timestep (as in the ASHRAE 140 validation).
+    u_opaque = np.array([0.3, 0.3, 0.3, 0.3, 0.2, 0.3])
+    zone_parameters = zp.ZoneParameters(
+        A_f=100, A_w=np.array([10, 2, 2, 2, 0, 0]), U_w=np.ones(6) * 1.3,
+        g_gln=0.6, epsilon_w=0.9, R_se_w=0.04,
+        A_op=np.array([30, 30, 30, 30, 100, 100]),
+        U_op=np.tile(u_opaque, (timer.timesteps_total, 1)),
+        alpha_Sc=0.6, R_se_op=0.04, epsilon_op=0.9, V=250,
+        sampling_rate=timer.time_discretization, building_class=1)
+    ventilation = np.ones(timer.timesteps_total) * 0.5
+    zone_parameters.updateVentilation(ventilationRate=ventilation,
+                                      ventilationRateMinimum=0.4)
+    zone_inputs = zi.ZoneInputs(environment, zone_parameters, t_m_init=20,
+                                ventilation=ventilation,
+                                appliances=np.ones(timer.timesteps_total) * 300)
+    t_heating_set = np.ones(timer.timesteps_total) * 20
+    t_cooling_set = np.ones(timer.timesteps_total) * 26
+
+    def run():
+        zmodel.calc(zone_parameters=zone_parameters, zone_inputs=zone_inputs,
+                    t_cooling_set=t_cooling_set, t_heating_set=t_heating_set,
+                    beQuiet=True)
+    return run
+
+
+def _bench_photovoltaic(size):
+    environment = _create_environment(size)
+    photovoltaic = pv.PV(environment, method=0, area=30, beta=35, gamma=0)
+
+    def run():
+        photovoltaic.getPower(currentValues=False)
+    return run
+
+
+def _bench_wind_energy_converter(size):
+    environment = _create_environment(size)
+    (velocity, power) = _read_sheet_columns('wind_energy_converters.xlsx',
+                                            'ENERCON_E_126', 4, (1, 2))
+    turbine = wec.WindEnergyConverter(environment, velocity, power * 1000,
+                                      hub_height=135)
+
+    def run():
+        turbine.getPower(currentValues=False)
+    return run
+
+
+def _bench_heat_pump(size):
+    environment = _create_environment(size, full_horizon=True)
+    path = os.path.join(_src_path, 'inputs', 'heat_pumps.xlsx')
+    sheet = openpyxl.load_workbook(path, data_only=True)['Dimplex_LA12TU']
+
+    #  Characteristics as in pycity_base.examples.example_heat_pump
+    nb_flow = sheet.max_column - 2
+    nb_ambient = int((sheet.max_row - 7) / 2)
+    first_row_cop = sheet.max_row - nb_ambient
+    t_flow = np.array([sheet.cell(4, 3 + i).value for i in range(nb_flow)])
+    t_ambient = np.zeros(nb_ambient)
+    q_nominal = np.array([[sheet.cell(5 + row, 3 + col).value
+                           for col in range(nb_flow)]
+                          for row in range(nb_ambient)])
+    cop = np.array([[sheet.cell(first_row_cop + row + 1, 3 + col).value
+                     for col in range(nb_flow)]
+                    for row in range(nb_ambient)])
+    heater = hp.Heatpump(environment, t_ambient, t_flow, q_nominal,
+                         q_nominal / cop, cop, sheet.cell(1, 2).value, 0.5)
+
+    flow_temperature = np.random.RandomState(0).rand(
+        environment.timer.timesteps_horizon) * 20 + 35
+
+    def run():
+        heater.getNominalValues(flow_temperature)
+    return run
+
+
+def _bench_district_aggregation(size):
+    environment = _create_environment(size)
+    timesteps_total = environment.timer.timesteps_total
+    random_state = np.random.RandomState(0)
+
+    city_district = citydist.CityDistrict(environment)
+    for i in range(sizes[size]['nb_buildings']):
+        apartment = apart.Apartment(environment)
+        apartment.addMultipleEntities([
+            ed.ElectricalDemand(environment, method=0,
+                                loadcurve=random_state.rand(timesteps_total)),
+            sh.SpaceHeating(environment, method=0,
+                            loadcurve=random_state.rand(timesteps_total)),
+            dhw.DomesticHotWater(environment, t_flow=60, method=0,
+                                 loadcurve=random_state.rand(timesteps_total))])
+        building = build.Building(environment)
+        building.addEntity(apartment)
+        city_district.addEntity(building, position=point.Point(i, 0))
+
+    def run():
+        city_district.get_aggr_el_power_curve(currentValues=False)
+        city_district.get_aggr_space_heating_power_curve(currentValues=False)
+        city_district.get_aggr_dhw_power_curve(currentValues=False)
+    return run
+
+
+def _bench_city_generator(size):
+    load.clear_shared_profiles()
+
+    def run():
+        citgen.run_city_generator(input_name='test_city_mixed_buildings.txt',
+                                  use_el_slp=True, gen_dhw_profile=True,
+                                  seed=0, verbose=False)
+    return run
+
+
+#  Benchmarks in order of execution: name, setup function and maximum number
+#  of repetitions (long running benchmarks are only run once)
+benchmarks = [('weather_loading', _bench_weather_loading, None),
+              ('sun_geometry', _bench_sun_geometry, None),
+              ('tilted_radiation', _bench_tilted_radiation, None),
+              ('change_resolution', _bench_change_resolution, None),
+              ('slp_electrical', _bench_slp_electrical, None),
+              ('slp_thermal', _bench_slp_thermal, None),
+              ('occupancy', _bench_occupancy, None),
+              ('dhw_stochastic', _bench_dhw_stochastic, None),
+              ('el_stochastic', _bench_el_stochastic, 1),
+              ('zone_model', _bench_zone_model, None),
+              ('photovoltaic', _bench_photovoltaic, None),
+              ('wind_energy_converter', _bench_wind_energy_converter, None),
+              ('heat_pump', _bench_heat_pump, None),
+              ('district_aggregation', _bench_district_aggregation, None),
+              ('city_generator', _bench_city_generator, 1)]
+
+benchmark_names = [name for (name, setup, max_repeat) in benchmarks]
+
+
+def run_benchmark(setup, size='full', repeat=3, memory=True):
+    """
+    Time (and memory-profile) a single benchmark.
+
+    Parameters
+    ----------
+    setup : function
+        Setup function, which is called with the size and returns the
+        function to be timed
+    size : str, optional
+        Problem size, key of sizes (default: 'full')
+    repeat : int, optional
+        Number of timed runs (default: 3). A new setup is made for every run.
+    memory : bool, optional
+        Measure the peak memory in an additional run (default: True)
+
+    Returns
+    -------
+    result : dict
+        Result with the keys 'status' ('ok'), 'times' (durations of all
+        runs in s), 'time' (minimum duration in s), 'time_median' (median
+        duration in s) and 'peak_memory' (peak of traced memory allocations
+        in bytes, only if memory is True)
+    """
+    assert repeat >= 1, 'repeat has to be at least 1.'
+
+    times = []
+    for i in range(repeat):
+        run = setup(size)
+        gc.collect()
+        start = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - start)
+
+    result = {'status': 'ok',
+              'times': times,
+              'time': min(times),
+              'time_median': float(np.median(times))}
+
+    if memory:
+        run = setup(size)
+        gc.collect()
+        tracemalloc.start()
+        try:
+            run()
+            (current, peak) = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        result['peak_memory'] = peak
+
+    return result
+
+
+def run_suite(names=None, size='full', repeat=3, memory=True, verbose=False):
+    """
+    Run the benchmark suite.
+
+    Failing benchmarks (e.g. due to missing input files) do not stop the
+    suite. They are stored with the status 'error' and the error message.
+
+    Parameters
+    ----------
+    names : list of str, optional
+        Names of the benchmarks to run (default: None). If None, all
+        benchmarks are run.
+    size : str, optional
+        Problem size, key of sizes (default: 'full')
+    repeat : int, optional
+        Number of timed runs per benchmark (default: 3)
+    memory : bool, optional
+        Measure the peak memory of each benchmark (default: True)
+    verbose : bool, optional
+        Print progress (default: False)
+
+    Returns
+    -------
+    results : dict
+        Results with the keys 'meta' (dict with size, repeat and versions)
+        and 'results' (dict with benchmark name as key and result of
+        run_benchmark as value)
+    """
+    assert size in sizes, 'Unknown size ' + str(size)
+    if names is None:
+        names = benchmark_names
+    for name in names:
+        assert name in benchmark_names, 'Unknown benchmark ' + str(name)
+
+    results = {}
+    for (name, setup, max_repeat) in benchmarks:
+        if name not in names:
+            continue
+        if verbose:
+            print('Run benchmark', name)
+        nb_repeat = repeat if max_repeat is None else min(repeat, max_repeat)
+        try:
+            results[name] = run_benchmark(setup, size=size, repeat=nb_repeat,
+                                          memory=memory)
+        except Exception as error:
+            results[name] = {'status': 'error',
+                             'message': type(error).__name__ + ': ' +
+                                        str(error)}
+        if verbose:
+            print(format_result(name, results[name]))
+
+    meta = {'size': size,
+            'repeat': repeat,
+            'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'processor': platform.processor()}
+
+    return {'meta': meta, 'results': results}
+
+
+def compare_results(results, baseline, time_tolerance=0.25,
+                    memory_tolerance=0.1, min_time=0.01):
+    """
+    Compare benchmark results with a baseline.
+
+    Only benchmarks, which succeeded in both runs, are compared. The
+    minimum duration is used to reduce the influence of system noise.
+
+    Parameters
+    ----------
+    results : dict
+        Results of run_suite
+    baseline : dict
+        Results of run_suite, which serve as reference. Both results have to
+        be recorded with the same size.
+    time_tolerance : float, optional
+        Allowed relative increase of the duration (default: 0.25)
+    memory_tolerance : float, optional
+        Allowed relative increase of the peak memory (default: 0.1)
+    min_time : float, optional
+        Absolute increase of the duration in s, below which changes are
+        ignored (default: 0.01)
+
+    Returns
+    -------
+    regressions : list of dict
+        Regressions with the keys 'name', 'metric' ('time' or
+        'peak_memory'), 'baseline', 'current' and 'ratio' (current /
+        baseline)
+    """
+    assert results['meta']['size'] == baseline['meta']['size'], \
+        ('The baseline has been recorded with size ' +
+         str(baseline['meta']['size']) + ', but the results with size ' +
+         str(results['meta']['size']) + '.')
+
+    regressions = []
+    for (name, result) in sorted(results['results'].items()):
+        reference = baseline['results'].get(name)
+        if reference is None or result['status'] != 'ok' or \
+                reference['status'] != 'ok':
+            continue
+        for (metric, tolerance, threshold) in \
+                (('time', time_tolerance, min_time),
+                 ('peak_memory', memory_tolerance, 0)):
+            if metric not in result or metric not in reference:
+                continue
+            (current, previous) = (result[metric], reference[metric])
+            if current > previous * (1 + tolerance) and \
+                    current - previous > threshold:
+                regressions.append({'name': name,
+                                    'metric': metric,
+                                    'baseline': previous,
+                                    'current': current,
+                                    'ratio': current / max(previous, 1e-12)})
+    return regressions
+
+
+def save_results(results, path):
+    """
+    Save benchmark results as JSON file.
+    """
+    with open(path, 'w') as file:
+        json.dump(results, file, indent=2, sort_keys=True)
+
+
+def load_results(path):
+    """
+    Load benchmark results from a JSON file.
+    """
+    with open(path, 'r') as file:
+        return json.load(file)
+
+
+def get_baseline_path(size='full'):
+    """
+    Return the default path of the baseline of the given size.
+    """
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                        'baseline_' + size + '.json')
+
+
+def format_result(name, result):
+    """
+    Return a single line summary of a benchmark result.
+    """
+    if result['status'] != 'ok':
+        return '{:<24} {}'.format(name, result['message'])
+    line = '{:<24} {:>10.4f} s (median {:.4f} s)'.format(
+        name, result['time'], result['time_median'])
+    if 'peak_memory' in result:
+        line += ' {:>10.1f} MiB peak'.format(result['peak_memory'] / 2 ** 20)
+    return line
+
+
+def main(argv=None):
+    """
+    Run the benchmark suite from the command line.
+
+    Returns
+    -------
+    exit_code : int
+        1, if a regression has been found, else 0
+    """
+    parser = argparse.ArgumentParser(
+        prog='python -m pycity_base.benchmarks',
+        description='Benchmark suite of pyCity.')
+    parser.add_argument('names', nargs='*', metavar='name',
+                        help='Benchmarks to run (default: all). Choose from: '
+                             + ', '.join(benchmark_names))
+    parser.add_argument('--quick', action='store_true',
+                        help='Use reduced problem sizes')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='Number of timed runs per benchmark')
+    parser.add_argument('--no-memory', action='store_true',
+                        help='Skip the measurement of the peak memory')
+    parser.add_argument('--baseline', default=None,
+                        help='Path of the baseline (default: baseline_<size>'
+                             '.json in the benchmarks folder)')
+    parser.add_argument('--save', action='store_true',
+                        help='Save the results as new baseline')
+    parser.add_argument('--output', default=None,
+                        help='Save the results to this path')
+    parser.add_argument('--time-tolerance', type=float, default=0.25,
+                        help='Allowed relative increase of the duration')
+    parser.add_argument('--memory-tolerance', type=float, default=0.1,
+                        help='Allowed relative increase of the peak memory')
+    parser.add_argument('--min-time', type=float, default=0.01,
+                        help='Increase of the duration in s, below which '
+                             'changes are ignored')
+    args = parser.parse_args(argv)
+
+    unknown = [name for name in args.names if name not in benchmark_names]
+    if unknown:
+        parser.error('Unknown benchmarks: ' + ', '.join(unknown))
+
+    size = 'quick' if args.quick else 'full'
+    baseline_path = args.baseline
+    if baseline_path is None:
+        baseline_path = get_baseline_path(size)
+
+    results = run_suite(names=args.names or None, size=size,
+                        repeat=args.repeat, memory=not args.no_memory,
+                        verbose=True)
+
+    if args.output is not None:
+        save_results(results, args.output)
+
+    exit_code = 0
+    if args.save:
+        save_results(results, baseline_path)
+        print('Saved baseline to', baseline_path)
+    elif os.path.isfile(baseline_path):
+        regressions = compare_results(results, load_results(baseline_path),
+                                      time_tolerance=args.time_tolerance,
+                                      memory_tolerance=args.memory_tolerance,
+                                      min_time=args.min_time)
+        print()
+        if regressions:
+            print('Regressions compared to', baseline_path)
+            for regression in regressions:
+                print('{:<24} {:<12} {:.4g} -> {:.4g} ({:+.1%})'.format(
+                    regression['name'], regression['metric'],
+                    regression['baseline'], regression['current'],
+                    regression['ratio'] - 1))
+            exit_code = 1
+        else:
+            print('No regressions compared to', baseline_path)
+    else:
+        print('No baseline found at', baseline_path,
+              '(use --save to record one)')
+
+    return exit_code
+
+
+if __name__ == '__main__':
+    sys.exit(main())
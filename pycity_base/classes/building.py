@@ -44,9 +44,23 @@ class Building(object):
         
         self.flow_temperature = np.zeros(environment.timer.timesteps_horizon)
 
+        #  Incremented, whenever an entity is added (invalidates the cached
+        #  power curves)
+        self._version = 0
+        #  Cache key and dict with cached full-year power curves
+        self._power_curve_key = None
+        self._power_curves = {}
+
     @property
     def kind(self):
         return self._kind
+
+    def __getstate__(self):
+        #  Cached power curves are not pickled (or deep copied)
+        state = self.__dict__.copy()
+        state['_power_curve_key'] = None
+        state['_power_curves'] = {}
+        return state
     
     def addEntity(self, entity, warn=False):
         """ 
@@ -65,6 +79,8 @@ class Building(object):
         >>> myBuilding = Building(...)
         >>> myBuilding.addEntity(myBes)
         """
+        self._version = getattr(self, '_version', 0) + 1
+
         if entity.kind == "apartment":
             self.apartments.append(entity)
             self.has_apartment = True
@@ -124,6 +140,98 @@ class Building(object):
         bes = self.bes
         return bes
     
+    def _get_cache_key(self):
+        """
+        Return a key, which changes whenever entities are added to the
+        building or to one of its apartments or the load curve of a demand
+        is changed (see Load.version).
+        """
+        return (getattr(self, '_version', 0),) + \
+            tuple((id(apartment), apartment._get_cache_key())
+                  for apartment in self.apartments)
+
+    def invalidate_power_curves(self):
+        """
+        Discard all cached power curves.
+
+        Cached power curves are discarded automatically, when entities are
+        added to the building or to one of its apartments or when load
+        curves are changed via the Load interface. Call this method after
+        modifying arrays, which have been obtained before the change (e.g.
+        a stored reference to ``loadcurve``), in place.
+        """
+        self._version = getattr(self, '_version', 0) + 1
+
+    def _get_cached_power_curve(self, curve):
+        """
+        Return a full-year power curve of the building. The curve is
+        computed on first access and cached as read-only array.
+
+        Parameters
+        ----------
+        curve : str
+            'el' - Electrical demand
+            'sh' - Space heating demand
+            'sc' - Space cooling demand
+            'dhw' - Domestic hot water demand
+            'total_el' - Electrical demand plus electrical dhw demand
+            'total_th_sh' - Space heating demand plus thermal dhw demand
+        """
+        key = self._get_cache_key()
+        if getattr(self, '_power_curve_key', None) != key:
+            self._power_curve_key = key
+            self._power_curves = {}
+
+        if curve not in self._power_curves:
+            power = np.zeros(self.environment.timer.timesteps_total)
+            for apartment in self.apartments:
+                dhw = apartment.demand_domestic_hot_water
+                if curve == 'el':
+                    power += apartment.power_el.get_power(currentValues=False)
+                elif curve == 'sh':
+                    power += apartment.demand_space_heating.get_power(
+                        currentValues=False)
+                elif curve == 'sc':
+                    power += apartment.demand_space_cooling.get_power(
+                        currentValues=False)
+                elif curve == 'dhw':
+                    power += dhw.get_power(currentValues=False,
+                                           returnTemperature=False)
+                elif curve == 'total_el':
+                    if dhw.thermal:
+                        power += apartment.power_el.get_power(
+                            currentValues=False)
+                    else:
+                        power += (apartment.power_el.get_power(
+                            currentValues=False) +
+                            dhw.get_power(currentValues=False,
+                                          returnTemperature=False))
+                elif curve == 'total_th_sh':
+                    if dhw.thermal:
+                        power += (apartment.demand_space_heating.get_power(
+                            currentValues=False) +
+                            dhw.get_power(currentValues=False,
+                                          returnTemperature=False))
+                    else:
+                        power += apartment.demand_space_heating.get_power(
+                            currentValues=False)
+            power.flags.writeable = False
+            self._power_curves[curve] = power
+
+        return self._power_curves[curve]
+
+    def _get_horizon(self, power, currentValues):
+        """
+        Return a view of the current horizon (currentValues=True) or the
+        full power curve (currentValues=False).
+        """
+        if currentValues:
+            initial_position = self.environment.timer.current_timestep
+            final_position = (initial_position +
+                              self.environment.timer.timesteps_horizon)
+            return power[initial_position:final_position]
+        return power
+
     def get_power_curves(self, currentValues=True):
         """
         Get the entire electrical and thermal power curves of all apartments
@@ -145,32 +253,18 @@ class Building(object):
             Thermal space heating (plus domestic hot water) power curve
         resultThermalSpaceCooling:
             Thermal space cooling power curve
+
+        Notes
+        -----
+        The power curves are read-only views of cached arrays. Copy them
+        (e.g. with np.copy) before modifying them.
         """
-        # Initialization
-        # Demands are zero
-        if currentValues:
-            timesteps = self.environment.timer.timesteps_horizon
-        else:
-            timesteps = self.environment.timer.timesteps_total
-        power_el = np.zeros(timesteps)
-        power_th_sh = np.zeros(timesteps)
-        power_th_sc = np.zeros(timesteps)
-        
-        # Add demands of each apartment
-        for apartment in self.apartments:
-            # Get entire electrical, domestic hot water and space heating 
-            # demand
-            (tempEl, tempDhw, tempSh, tempSc) = apartment.get_power_curves(currentValues=currentValues)
-            dhwThermal = apartment.demand_domestic_hot_water.thermal
-            
-            if dhwThermal:
-                power_th_sh += tempSh + tempDhw
-                power_th_sc += tempSc
-                power_el += tempEl
-            else:
-                power_th_sh += tempSh
-                power_th_sc += tempSc
-                power_el += tempEl + tempDhw
+        power_el = self._get_horizon(
+            self._get_cached_power_curve('total_el'), currentValues)
+        power_th_sh = self._get_horizon(
+            self._get_cached_power_curve('total_th_sh'), currentValues)
+        power_th_sc = self._get_horizon(
+            self._get_cached_power_curve('sc'), currentValues)
 
         return (power_el, power_th_sh, power_th_sc)
 
@@ -189,19 +283,12 @@ class Building(object):
         Returns
         -------
         space_heat_power : array-like
-            Space heating power curve in W
+            Space heating power curve in W (read-only view of a cached
+            array, copy it before modifying it)
         """
 
-        #  Initialize array with zeros
-        if currentValues:
-            timesteps = self.environment.timer.timesteps_horizon
-        else:
-            timesteps = self.environment.timer.timesteps_total
-        space_heat_power = np.zeros(timesteps)
-
-        # Get power curves of each apartment
-        for apartment in self.apartments:
-            space_heat_power += apartment.demand_space_heating.get_power(currentValues=currentValues)
+        space_heat_power = self._get_horizon(
+            self._get_cached_power_curve('sh'), currentValues)
 
         return space_heat_power
 
@@ -220,19 +307,12 @@ class Building(object):
         Returns
         -------
         space_heat_power : array-like
-            Space cooling power curve in W
+            Space cooling power curve in W (read-only view of a cached
+            array, copy it before modifying it)
         """
 
-        #  Initialize array with zeros
-        if currentValues:
-            timesteps = self.environment.timer.timesteps_horizon
-        else:
-            timesteps = self.environment.timer.timesteps_total
-        space_cooling_power = np.zeros(timesteps)
-
-        # Get power curves of each apartment
-        for apartment in self.apartments:
-            space_cooling_power += apartment.demand_space_cooling.get_power(currentValues=currentValues)
+        space_cooling_power = self._get_horizon(
+            self._get_cached_power_curve('sc'), currentValues)
 
         return space_cooling_power
 
@@ -251,19 +331,12 @@ class Building(object):
         Returns
         -------
         el_power_curve : array-like
-           Electrical power curve in W
+            Electrical power curve in W (read-only view of a cached
+            array, copy it before modifying it)
         """
 
-        #  Initialize array with zeros
-        if currentValues:
-            timesteps = self.environment.timer.timesteps_horizon
-        else:
-            timesteps = self.environment.timer.timesteps_total
-        el_power_curve = np.zeros(timesteps)
-
-        # Get power curves of each apartment
-        for apartment in self.apartments:
-            el_power_curve += apartment.power_el.get_power(currentValues=currentValues)
+        el_power_curve = self._get_horizon(
+            self._get_cached_power_curve('el'), currentValues)
 
         return el_power_curve
 
@@ -282,20 +355,12 @@ class Building(object):
         Returns
         -------
         dhw_heat_power : array-like
-            DHW power curve in W
+            DHW power curve in W (read-only view of a cached
+            array, copy it before modifying it)
         """
 
-        #  Initialize array with zeros
-        if currentValues:
-            timesteps = self.environment.timer.timesteps_horizon
-        else:
-            timesteps = self.environment.timer.timesteps_total
-        dhw_heat_power = np.zeros(timesteps)
-
-        # Get power curves of each apartment
-        for apartment in self.apartments:
-            dhw_heat_power += apartment.demand_domestic_hot_water.get_power(currentValues=currentValues,
-                                                                            returnTemperature=False)
+        dhw_heat_power = self._get_horizon(
+            self._get_cached_power_curve('dhw'), currentValues)
 
         return dhw_heat_power
         
@@ -9,6 +9,9 @@ uesgraphs can be downloaded on Github: https://github.com/RWTH-EBC/uesgraphs
 from __future__ import division
 
 import numpy as np
+import networkx as nx
+
+from pycity_base.functions import profiling
 
 try:
     import uesgraphs.uesgraph as ues
@@ -24,6 +27,16 @@ class CityDistrict(ues.UESGraph):
     See: https://github.com/RWTH-EBC/uesgraphs for further information
     """
 
+    #  Demand types of the district demand matrix (see get_demand_matrix)
+    #  and the corresponding building methods
+    demand_types = {'el': 'get_electric_power_curve',
+                    'sh': 'get_space_heating_power_curve',
+                    'sc': 'get_space_cooling_power_curve',
+                    'dhw': 'get_dhw_power_curve'}
+
+    #  Quantities of the forecast tensor (see get_forecast_tensor)
+    forecast_quantities = ('el', 'sh', 'sc', 'dhw', 'generation')
+
     def __init__(self, environment=None):
         """
         Constructor of city district object.
@@ -37,6 +50,10 @@ class CityDistrict(ues.UESGraph):
         ----------
         environment : object
             Environment object of pycity (default: None)
+        use_demand_matrix : bool
+            If True, the aggregated power curves of buildings are computed
+            from cached district demand matrices (see get_demand_matrix)
+            (default: False)
 
         Annotations
         -----------
@@ -46,6 +63,15 @@ class CityDistrict(ues.UESGraph):
         method, user has to add environment after initialization.
         """
 
+        #  Entity kind as key and dict with node ids (in order of
+        #  insertion) as keys and None as values
+        self._entity_index = {}
+
+        #  Demand type as key and tuple (node ids, rows, matrix, cache key)
+        #  as value (see get_demand_matrix). Key 'forecast' holds the tuple
+        #  (node ids, tensor, cache key) of get_forecast_tensor.
+        self._demand_matrices = {}
+
         #  Initialize super class
         super(CityDistrict, self).__init__()
 
@@ -56,6 +82,10 @@ class CityDistrict(ues.UESGraph):
         #  when using own entity.kind)
         self.entity_name_list = ['building', 'pv', 'windenergyconverter']
 
+        #  Use the district demand matrices for the aggregated power curves
+        #  of buildings (see get_demand_matrix)
+        self.use_demand_matrix = False
+
         #  Define object type
         self._kind = 'citydistrict'
 
@@ -63,6 +93,295 @@ class CityDistrict(ues.UESGraph):
     def kind(self):
         return self._kind
 
+    def __getstate__(self):
+        #  Demand matrices are not pickled (or deep copied)
+        state = self.__dict__.copy()
+        state['_demand_matrices'] = {}
+        return state
+
+    def _index_node(self, n):
+        """
+        Add node n to the entity index (or move it to the index of its new
+        entity kind).
+        """
+        self.invalidate_demand_matrix()
+
+        attributes = self.nodes[n]
+        if attributes.get('node_type') == 'building' and \
+                attributes.get('entity') is not None:
+            entity_kind = attributes['entity'].kind
+        else:
+            entity_kind = None
+
+        index = self._entity_index
+        for (kind, nodes) in index.items():
+            if kind != entity_kind:
+                nodes.pop(n, None)
+        if entity_kind is not None:
+            #  Keep the position of already indexed nodes
+            index.setdefault(entity_kind, {}).setdefault(n, None)
+
+    def _unindex_node(self, n):
+        """
+        Remove node n from the entity index.
+        """
+        self.invalidate_demand_matrix()
+        for nodes in self._get_entity_index().values():
+            nodes.pop(n, None)
+
+    def rebuild_entity_index(self):
+        """
+        Rebuild the index of entity kinds from scratch.
+
+        The index is maintained automatically, when nodes are added or
+        removed via graph methods. Call this method after changing
+        ``self.nodes[n]['entity']`` directly.
+
+        Returns
+        -------
+        entity_index : dict
+            Entity kind as key and dict with node ids as keys as value
+        """
+        index = {}
+        for n in self.nodes():
+            attributes = self.nodes[n]
+            if attributes.get('node_type') == 'building' and \
+                    attributes.get('entity') is not None:
+                index.setdefault(attributes['entity'].kind, {})[n] = None
+
+        if not nx.is_frozen(self):
+            self._entity_index = index
+            self.invalidate_demand_matrix()
+        return index
+
+    def _get_entity_index(self):
+        """
+        Return the entity index. Graph views (e.g. subgraphs) and objects
+        loaded from pickle files of older versions are indexed on demand.
+        """
+        if '_entity_index' not in self.__dict__ or nx.is_frozen(self):
+            return self.rebuild_entity_index()
+        return self._entity_index
+
+    def _get_entity_nodes(self, entity_name, nodelist=None):
+        """
+        Return the ids of all nodes holding an entity of kind entity_name
+        (in order of insertion). If nodelist is given, only nodes of
+        nodelist are returned (in order of nodelist).
+        """
+        nodes = self._get_entity_index().get(entity_name, {})
+        if nodelist is None:
+            return list(nodes)
+        return [n for n in nodelist if n in nodes]
+
+    def add_node(self, node_for_adding, **attr):
+        super(CityDistrict, self).add_node(node_for_adding, **attr)
+        if '_entity_index' in self.__dict__:
+            self._index_node(node_for_adding)
+
+    def add_nodes_from(self, nodes_for_adding, **attr):
+        nodes_for_adding = list(nodes_for_adding)
+        super(CityDistrict, self).add_nodes_from(nodes_for_adding, **attr)
+        if '_entity_index' in self.__dict__:
+            for n in nodes_for_adding:
+                try:
+                    is_node = n in self._node
+                except TypeError:
+                    is_node = False
+                if not is_node:
+                    #  Node given as (node, attribute dict) tuple
+                    n = n[0]
+                self._index_node(n)
+
+    def remove_node(self, n):
+        if n in self._node:
+            self._unindex_node(n)
+        super(CityDistrict, self).remove_node(n)
+
+    def remove_nodes_from(self, nodes):
+        nodes = list(nodes)
+        for n in nodes:
+            if n in self._node:
+                self._unindex_node(n)
+        super(CityDistrict, self).remove_nodes_from(nodes)
+
+    def clear(self):
+        super(CityDistrict, self).clear()
+        self._entity_index = {}
+        self.invalidate_demand_matrix()
+
+    def invalidate_demand_matrix(self):
+        """
+        Discard all district demand matrices.
+
+        The matrices are rebuilt automatically, when entities are added to
+        or removed from the city district or its buildings. After changing
+        the load curves of existing demand objects, call the
+        invalidate_power_curves method of the affected buildings.
+        """
+        self._demand_matrices = {}
+
+    @profiling.profiled('demand_matrix', 'citydistrict')
+    def get_demand_matrix(self, demand_type, currentValues=False,
+                          nodelist=None):
+        """
+        Returns the demand matrix (buildings x timesteps) of one demand type.
+
+        The matrix of all building entities is built on the first call and
+        reused until entities of the district or its buildings change (see
+        invalidate_demand_matrix). It is read-only.
+
+        Parameters
+        ----------
+        demand_type : str
+            Demand type:
+            'el' - Electrical demand
+            'sh' - Space heating demand
+            'sc' - Space cooling demand
+            'dhw' - Domestic hot water demand
+        currentValues : bool, optional
+            Defines, if only current horizon or all timesteps should be used.
+            (default: False)
+            False - Use complete number of timesteps
+            True - Use horizon
+        nodelist : list (of ints), optional
+            Defines the nodes (and the order of the rows) of the returned
+            matrix (default: None). Nodes without building entity are
+            skipped. If nodelist is None, all nodes with building entities
+            are used (in order of get_list_build_entity_node_ids).
+
+        Returns
+        -------
+        demand_matrix : np.array
+            Power in W (one row per building, one column per timestep).
+            Without nodelist, a view into the cached matrix is returned.
+        """
+        assert demand_type in self.demand_types, ('Unknown demand type ' +
+                                                  str(demand_type))
+
+        matrices = self.__dict__.get('_demand_matrices')
+        if matrices is None or nx.is_frozen(self):
+            #  Objects from older versions or graph views (not cached)
+            matrices = {}
+            if not nx.is_frozen(self):
+                self._demand_matrices = matrices
+
+        nodes = self._get_entity_nodes('building')
+        #  Changes, whenever entities are added to one of the buildings
+        cache_key = tuple(self.node[n]['entity']._get_cache_key()
+                          for n in nodes)
+
+        if demand_type not in matrices or \
+                matrices[demand_type][3] != cache_key:
+            matrix = np.zeros((len(nodes),
+                               self.environment.timer.timesteps_total),
+                              dtype=self.environment.timer.dtype)
+            method = self.demand_types[demand_type]
+            for (row, n) in enumerate(nodes):
+                matrix[row] = getattr(self.node[n]['entity'],
+                                      method)(currentValues=False)
+            matrix.flags.writeable = False
+            rows = {n: row for (row, n) in enumerate(nodes)}
+            matrices[demand_type] = (nodes, rows, matrix, cache_key)
+
+        (nodes, rows, matrix, cache_key) = matrices[demand_type]
+
+        if nodelist is not None:
+            matrix = matrix[[rows[n] for n in nodelist if n in rows]]
+
+        if currentValues:
+            initial_position = self.environment.timer.current_timestep
+            final_position = (initial_position +
+                              self.environment.timer.timesteps_horizon)
+            matrix = matrix[:, initial_position:final_position]
+
+        return matrix
+
+    @profiling.profiled('forecast_tensor', 'citydistrict')
+    def get_forecast_tensor(self, currentValues=True):
+        """
+        Returns the demands and generation of all entities as one tensor
+        (entities x quantities x timesteps).
+
+        The tensor of all timesteps is built on the first call and reused
+        until entities of the district, the load curves of its buildings,
+        the parameters of its generators or the weather change (see
+        invalidate_demand_matrix). It is stored C-contiguous in the layout
+        (entities x quantities x timesteps). The returned horizon tensor is
+        a read-only view of it; no data is copied, when the timer is
+        updated. Each time series of the view is contiguous, but the view
+        as a whole is not C-contiguous (it has the strides of the full
+        tensor). Use np.ascontiguousarray to get a compact copy.
+
+        Parameters
+        ----------
+        currentValues : bool, optional
+            Defines, if only current horizon or all timesteps should be used.
+            (default: True)
+            False - Use complete number of timesteps
+            True - Use horizon
+
+        Returns
+        -------
+        nodes : list (of ints)
+            Node ids of the entities (one per row of the tensor): nodes with
+            building entities (in order of get_list_build_entity_node_ids),
+            followed by nodes with pv and wind energy converter entities
+        tensor : np.array
+            Power in W. Quantities in order of forecast_quantities.
+            Demands of generators and generation of buildings are zero.
+        """
+        matrices = self.__dict__.get('_demand_matrices')
+        if matrices is None or nx.is_frozen(self):
+            #  Objects from older versions or graph views (not cached)
+            matrices = {}
+            if not nx.is_frozen(self):
+                self._demand_matrices = matrices
+
+        building_nodes = self._get_entity_nodes('building')
+        generator_nodes = (self._get_entity_nodes('pv') +
+                           self._get_entity_nodes('windenergyconverter'))
+        cache_key = (tuple(self.node[n]['entity']._get_cache_key()
+                           for n in building_nodes),
+                     tuple((n, self.node[n]['entity']._get_cache_key())
+                           for n in generator_nodes))
+
+        if 'forecast' not in matrices or \
+                matrices['forecast'][2] != cache_key:
+            nodes = building_nodes + generator_nodes
+            timesteps_total = self.environment.timer.timesteps_total
+            tensor = np.zeros((len(nodes), len(self.forecast_quantities),
+                               timesteps_total),
+                              dtype=self.environment.timer.dtype)
+
+            nb_buildings = len(building_nodes)
+            for (column, quantity) in enumerate(self.forecast_quantities):
+                if quantity in self.demand_types:
+                    tensor[:nb_buildings, column] = \
+                        self.get_demand_matrix(quantity)
+            column = self.forecast_quantities.index('generation')
+            for (row, n) in enumerate(generator_nodes):
+                tensor[nb_buildings + row, column] = \
+                    self.node[n]['entity'].getPower(currentValues=False)
+
+            tensor.flags.writeable = False
+            matrices['forecast'] = (nodes, tensor, cache_key)
+
+        (nodes, tensor, cache_key) = matrices['forecast']
+
+        if currentValues:
+            initial_position = self.environment.timer.current_timestep
+            final_position = (initial_position +
+                              self.environment.timer.timesteps_horizon)
+            tensor = tensor[:, :, initial_position:final_position]
+
+        return (list(nodes), tensor)
+
+    def add_building(self, *args, **kwargs):
+        node_number = super(CityDistrict, self).add_building(*args, **kwargs)
+        self._index_node(node_number)
+        return node_number
+
     def addEntity(self, entity, position, name=None,
                   is_supply_electricity=None, is_supply_heating=False,
                   is_supply_cooling=False, is_supply_gas=False,
@@ -235,19 +554,9 @@ class CityDistrict(ues.UESGraph):
         else:
             timesteps = self.environment.timer.timesteps_total
 
-        #  Create empty list of pv entities
-        pv_entities = []
-
-        #  Loop over all nodes
-        for n in self:
-            #  If node holds attribute 'node_type'
-            if 'node_type' in self.node[n]:
-                #  If node_type is building
-                if self.node[n]['node_type'] == 'building':
-                    #  If entity is of type pv
-                    if self.node[n]['entity'].kind == 'pv':
-                        #  Add pv entity to list
-                        pv_entities.append(self.node[n]['entity'])
+        #  List of pv entities
+        pv_entities = [self.node[n]['entity']
+                       for n in self._get_entity_nodes('pv')]
 
         if len(pv_entities) == 0:
             return np.zeros(timesteps)
@@ -277,19 +586,9 @@ class CityDistrict(ues.UESGraph):
         else:
             timesteps = self.environment.timer.timesteps_total
 
-        #  Create empty list of pv entities
-        wind_entities = []
-
-        #  Loop over all nodes
-        for n in self:
-            #  If node holds attribute 'node_type'
-            if 'node_type' in self.node[n]:
-                #  If node_type is building
-                if self.node[n]['node_type'] == 'building':
-                    #  If entity is of type pv
-                    if self.node[n]['entity'].kind == 'windenergyconverter':
-                        #  Add pv entity to list
-                        wind_entities.append(self.node[n]['entity'])
+        #  List of wind energy converter entities
+        wind_entities = [self.node[n]['entity'] for n in
+                         self._get_entity_nodes('windenergyconverter')]
 
         if len(wind_entities) == 0:
             return np.zeros(timesteps)
@@ -325,20 +624,15 @@ class CityDistrict(ues.UESGraph):
         power_el = np.zeros(timesteps)
         power_th = np.zeros(timesteps)
 
-        #  Loop over all nodes
-        for n in self:
-            #  If node holds attribute 'node_type'
-            if 'node_type' in self.node[n]:
-                #  If node_type is building
-                if self.node[n]['node_type'] == 'building':
-                    #  If entity is kind building
-                    if self.node[n]['entity'].kind == 'building':
-                        temp = self.node[n]['entity'].get_power_curves(currentValues=currentValues)
-                        power_el += temp[0]
-                        power_th += temp[1]
+        #  Loop over all nodes holding building entities
+        for n in self._get_entity_nodes('building'):
+            temp = self.node[n]['entity'].get_power_curves(currentValues=currentValues)
+            power_el += temp[0]
+            power_th += temp[1]
 
         return (power_el, power_th)
 
+    @profiling.profiled('aggregation', 'citydistrict')
     def get_aggr_space_heating_power_curve(self, currentValues=False, nodelist=None):
         """
         Returns the aggregated space heating power curve for all buildings
@@ -369,28 +663,27 @@ class CityDistrict(ues.UESGraph):
             size = self.environment.timer.timesteps_total
         agg_th_p_curve = np.zeros(size)
 
-        if nodelist is None:
-            use_nodes = self
-        else:
+        if nodelist is not None:
             for n in nodelist:
                 assert n in self.nodes(), ('Node ' + str(n) + 'is not '
                                            'within city object!')
-            use_nodes = nodelist
 
-        #  Loop over all nodes
-        for n in use_nodes:
-            #  If node holds attribute 'node_type'
-            if 'node_type' in self.node[n]:
-                #  If node_type is building
-                if self.node[n]['node_type'] == 'building':
-                    #  If entity is kind building
-                    if self.node[n]['entity'].kind == 'building':
-                        th_power_curve = self.node[n]['entity']. \
-                            get_space_heating_power_curve(currentValues=currentValues)[0:size]
-                        agg_th_p_curve += th_power_curve
+        if getattr(self, 'use_demand_matrix', False):
+            #  Vectorized sum over the rows of the district demand matrix
+            matrix = self.get_demand_matrix('sh',
+                                            currentValues=currentValues,
+                                            nodelist=nodelist)
+            return matrix.sum(axis=0, dtype=np.float64)
+
+        #  Loop over all nodes holding building entities
+        for n in self._get_entity_nodes('building', nodelist=nodelist):
+            th_power_curve = self.node[n]['entity']. \
+                get_space_heating_power_curve(currentValues=currentValues)[0:size]
+            agg_th_p_curve += th_power_curve
 
         return agg_th_p_curve
 
+    @profiling.profiled('aggregation', 'citydistrict')
     def get_aggr_space_cooling_power_curve(self, currentValues=False, nodelist=None):
         """
         Returns the aggregated space cooling power curve for all buildings
@@ -421,28 +714,27 @@ class CityDistrict(ues.UESGraph):
             size = self.environment.timer.timesteps_total
         agg_th_p_curve = np.zeros(size)
 
-        if nodelist is None:
-            use_nodes = self
-        else:
+        if nodelist is not None:
             for n in nodelist:
                 assert n in self.nodes(), ('Node ' + str(n) + 'is not '
                                            'within city object!')
-            use_nodes = nodelist
 
-        #  Loop over all nodes
-        for n in use_nodes:
-            #  If node holds attribute 'node_type'
-            if 'node_type' in self.node[n]:
-                #  If node_type is building
-                if self.node[n]['node_type'] == 'building':
-                    #  If entity is kind building
-                    if self.node[n]['entity'].kind == 'building':
-                        th_power_curve = self.node[n]['entity']. \
-                            get_space_cooling_power_curve(currentValues=currentValues)[0:size]
-                        agg_th_p_curve += th_power_curve
+        if getattr(self, 'use_demand_matrix', False):
+            #  Vectorized sum over the rows of the district demand matrix
+            matrix = self.get_demand_matrix('sc',
+                                            currentValues=currentValues,
+                                            nodelist=nodelist)
+            return matrix.sum(axis=0, dtype=np.float64)
+
+        #  Loop over all nodes holding building entities
+        for n in self._get_entity_nodes('building', nodelist=nodelist):
+            th_power_curve = self.node[n]['entity']. \
+                get_space_cooling_power_curve(currentValues=currentValues)[0:size]
+            agg_th_p_curve += th_power_curve
 
         return agg_th_p_curve
 
+    @profiling.profiled('aggregation', 'citydistrict')
     def get_aggr_el_power_curve(self, currentValues=False, nodelist=None):
         """
         Returns aggregated electrical power curve for all buildings
@@ -473,28 +765,27 @@ class CityDistrict(ues.UESGraph):
             size = self.environment.timer.timesteps_total
         agg_el_p_curve = np.zeros(size)
 
-        if nodelist is None:
-            use_nodes = self
-        else:
+        if nodelist is not None:
             for n in nodelist:
                 assert n in self.nodes(), ('Node ' + str(n) + 'is not '
                                            'within city object!')
-            use_nodes = nodelist
 
-        #  Loop over all nodes
-        for n in use_nodes:
-            #  If node holds attribute 'node_type'
-            if 'node_type' in self.node[n]:
-                #  If node_type is building
-                if self.node[n]['node_type'] == 'building':
-                    #  If entity is kind building
-                    if self.node[n]['entity'].kind == 'building':
-                        el_power_curve = self.node[n]['entity']. \
-                            get_electric_power_curve(currentValues=currentValues)[0:size]
-                        agg_el_p_curve += el_power_curve
+        if getattr(self, 'use_demand_matrix', False):
+            #  Vectorized sum over the rows of the district demand matrix
+            matrix = self.get_demand_matrix('el',
+                                            currentValues=currentValues,
+                                            nodelist=nodelist)
+            return matrix.sum(axis=0, dtype=np.float64)
+
+        #  Loop over all nodes holding building entities
+        for n in self._get_entity_nodes('building', nodelist=nodelist):
+            el_power_curve = self.node[n]['entity']. \
+                get_electric_power_curve(currentValues=currentValues)[0:size]
+            agg_el_p_curve += el_power_curve
 
         return agg_el_p_curve
 
+    @profiling.profiled('aggregation', 'citydistrict')
     def get_aggr_dhw_power_curve(self, currentValues=False,
                                      nodelist=None):
         """
@@ -526,25 +817,23 @@ class CityDistrict(ues.UESGraph):
             size = self.environment.timer.timesteps_total
         agg_dhw_p_curve = np.zeros(size)
 
-        if nodelist is None:
-            use_nodes = self
-        else:
+        if nodelist is not None:
             for n in nodelist:
                 assert n in self.nodes(), ('Node ' + str(n) + 'is not '
                                            'within city object!')
-            use_nodes = nodelist
 
-        #  Loop over all nodes
-        for n in use_nodes:
-            #  If node holds attribute 'node_type'
-            if 'node_type' in self.node[n]:
-                #  If node_type is building
-                if self.node[n]['node_type'] == 'building':
-                    #  If entity is kind building
-                    if self.node[n]['entity'].kind == 'building':
-                        dhw_power_curve = self.node[n]['entity']. \
-                            get_dhw_power_curve(currentValues=currentValues)[0:size]
-                        agg_dhw_p_curve += dhw_power_curve
+        if getattr(self, 'use_demand_matrix', False):
+            #  Vectorized sum over the rows of the district demand matrix
+            matrix = self.get_demand_matrix('dhw',
+                                            currentValues=currentValues,
+                                            nodelist=nodelist)
+            return matrix.sum(axis=0, dtype=np.float64)
+
+        #  Loop over all nodes holding building entities
+        for n in self._get_entity_nodes('building', nodelist=nodelist):
+            dhw_power_curve = self.node[n]['entity']. \
+                get_dhw_power_curve(currentValues=currentValues)[0:size]
+            agg_dhw_p_curve += dhw_power_curve
 
         return agg_dhw_p_curve
 
@@ -556,17 +845,10 @@ class CityDistrict(ues.UESGraph):
         timesteps = self.environment.timer.timesteps_horizon
         flow_temperature = np.zeros(timesteps)
 
-        #  Loop over all nodes
-        for n in self:
-            #  If node holds attribute 'node_type'
-            if 'node_type' in self.node[n]:
-                #  If node_type is building
-                if self.node[n]['node_type'] == 'building':
-                    #  If entity is kind building
-                    if self.node[n]['entity'].kind == 'building':
-                        flow_temp = self.node[n]['entity'].getFlowTemperature()
-                        flow_temperature = np.maximum(flow_temperature,
-                                                     flow_temp)
+        #  Loop over all nodes holding building entities
+        for n in self._get_entity_nodes('building'):
+            flow_temp = self.node[n]['entity'].getFlowTemperature()
+            flow_temperature = np.maximum(flow_temperature, flow_temp)
 
         return flow_temperature
 
@@ -587,17 +869,7 @@ class CityDistrict(ues.UESGraph):
         """
         assert entity_name in self.entity_name_list
 
-        nb_of_entities = 0
-
-        for n in self:
-            #  If node holds attribute 'node_type'
-            if 'node_type' in self.node[n]:
-                #  If node_type is building
-                if self.node[n]['node_type'] == 'building':
-                    if 'entity' in self.node[n]:
-                        #  If entity is of kind entity_name
-                        if self.node[n]['entity'].kind == entity_name:
-                            nb_of_entities += 1
+        nb_of_entities = len(self._get_entity_index().get(entity_name, {}))
         return nb_of_entities
 
     def get_node_numbers_of_entities(self, entity_name):
@@ -617,17 +889,7 @@ class CityDistrict(ues.UESGraph):
         """
         assert entity_name in self.entity_name_list
 
-        node_nb_list = []
-
-        for n in self:
-            #  If node holds attribute 'node_type'
-            if 'node_type' in self.node[n]:
-                #  If node_type is building
-                if self.node[n]['node_type'] == 'building':
-                    if 'entity' in self.node[n]:
-                        #  If entity is of kind entity_name
-                        if self.node[n]['entity'].kind == entity_name:
-                            node_nb_list.append(n)
+        node_nb_list = self._get_entity_nodes(entity_name)
         return node_nb_list
 
     def get_nb_of_building_entities(self):
@@ -55,10 +55,26 @@ class Apartment(object):
                                                            specific_demand=0)
         self.rooms = []
 
+        #  Incremented, whenever an entity is added (used by buildings to
+        #  invalidate cached power curves)
+        self._version = 0
+
     @property
     def kind(self):
         return self._kind
 
+    def _get_cache_key(self):
+        """
+        Return a key, which changes whenever entities are added to the
+        apartment or the load curve of one of its demands is changed.
+        """
+        return ((getattr(self, '_version', 0),) +
+                tuple((id(load), load.version)
+                      for load in (self.power_el,
+                                   self.demand_domestic_hot_water,
+                                   self.demand_space_heating,
+                                   self.demand_space_cooling)))
+
     def addEntity(self, entity, warn=False):
         """
         Add an entity to apartment.
@@ -83,6 +99,8 @@ class Apartment(object):
         >>> myApartment.addDevice(myDHW)
         """
 
+        self._version = getattr(self, '_version', 0) + 1
+
         if entity.kind == "electricaldemand":
             self.power_el = entity
 
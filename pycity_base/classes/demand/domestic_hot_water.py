@@ -13,6 +13,7 @@ import numpy as np
 import pycity_base.classes.demand.load
 from pycity_base.functions import change_resolution as chres
 from pycity_base.functions import dhw_stochastical as dhw_sto
+from pycity_base.functions import profiling
 
 
 class DomesticHotWater(pycity_base.classes.demand.load.Load):
@@ -34,7 +35,8 @@ class DomesticHotWater(pycity_base.classes.demand.load.Load):
                  loadcurve=[],
                  daily_consumption=0,
                  supply_temperature=0,
-                 occupancy=[]):
+                 occupancy=[],
+                 lazy=False):
         """
         Parameters
         ----------
@@ -59,6 +61,11 @@ class DomesticHotWater(pycity_base.classes.demand.load.Load):
             Supply temperature in degree Celsius. This parameter is necessary
             to compute the heat load that results from each liter consumption.
             This parameter is required when using ``method=1``.
+        lazy : bool, optional
+            Defer the generation of the load curve until it is accessed
+            for the first time (default: False). The inputs are recorded
+            and the load curve is generated by the first call of get_power,
+            generate or the loadcurve attribute.
 
         Info
         ----
@@ -66,6 +73,35 @@ class DomesticHotWater(pycity_base.classes.demand.load.Load):
         http://www.ecbcs.org/annexes/annex42.htm
         """
         self.method = method
+
+        inputs = dict(method=method,
+                      loadcurve=loadcurve,
+                      t_flow=t_flow,
+                      daily_consumption=daily_consumption,
+                      supply_temperature=supply_temperature,
+                      occupancy=occupancy)
+        if lazy:
+            #  Record the inputs and generate the load curve on first
+            #  access
+            super(DomesticHotWater, self).__init__(environment)
+            self._pending = inputs
+        else:
+            self._generate(environment, **inputs)
+
+        self._kind = "domestichotwater"
+        self.t_flow = t_flow
+        self.thermal = thermal
+
+    @property
+    def kind(self):
+        return self._kind
+
+    @profiling.profiled('generate', 'domestichotwater')
+    def _generate(self, environment, method, loadcurve, t_flow,
+                  daily_consumption, supply_temperature, occupancy):
+        """
+        Generate the load curve (see __init__ for the parameters).
+        """
         if method == 0:
             super(DomesticHotWater, self).__init__(environment, loadcurve)
         elif method == 1:
@@ -93,19 +129,32 @@ class DomesticHotWater(pycity_base.classes.demand.load.Load):
 
             # Compute tap water profile (based on average daily consumption)
             if daily_consumption <= 150:
-                tapProfile = a42[:, 0] * daily_consumption / 100
+                (column, reference) = (0, 100)
             elif daily_consumption <= 250 and daily_consumption > 150:
-                tapProfile = a42[:, 1] * daily_consumption / 200
+                (column, reference) = (1, 200)
             elif daily_consumption > 250:
-                tapProfile = a42[:, 2] * daily_consumption / 300
+                (column, reference) = (2, 300)
 
-            # Compute equivalent heat demand in Watt
+            # Compute equivalent heat demand in Watt per l/d and K (shared
+            # by all objects with the same Annex 42 profile)
             c_water = 4180  # J/kgK
             flowFactor = 1 / 3600  # l/h -> kg/s
+            get_shared_profile = \
+                pycity_base.classes.demand.load.get_shared_profile
+            base_profile = get_shared_profile(
+                ('annex42', column, timeDis),
+                lambda: c_water * a42[:, column] / reference * flowFactor,
+                dtype=pycity_base.classes.demand.load.get_dtype(environment))
+
             deltaTemperature = t_flow - supply_temperature
-            loadcurve = c_water * tapProfile * flowFactor * deltaTemperature
-            super(DomesticHotWater, self).__init__(environment, loadcurve)
+            super(DomesticHotWater, self).__init__(
+                environment, base_profile=base_profile,
+                scale=daily_consumption * deltaTemperature)
         elif method == 2:
+            if getattr(occupancy, 'kind', None) == 'occupancy':
+                #  Occupancy object (profile might be generated on demand)
+                occupancy = occupancy.occupancy
+
             # Load profiles
             if not DomesticHotWater.loaded_dhw_sto:
                 src_path = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
@@ -115,7 +164,9 @@ class DomesticHotWater(pycity_base.classes.demand.load.Load):
 
             # Compute dhw demand
             profiles = DomesticHotWater.dhw_sto_profiles
-            initial_day = environment.timer.current_day
+            #  The occupancy profile has 144 values per day
+            initial_day = environment.timer.get_weekday_indexes(
+                nb_days=len(occupancy) // 144)
             timeDis = environment.timer.time_discretization
             tempDiff = t_flow - supply_temperature
             (water, heat) = dhw_sto.full_year_computation(occupancy, profiles,
@@ -125,14 +176,6 @@ class DomesticHotWater(pycity_base.classes.demand.load.Load):
             self.water = water
             super(DomesticHotWater, self).__init__(environment, heat)
 
-        self._kind = "domestichotwater"
-        self.t_flow = t_flow
-        self.thermal = thermal
-
-    @property
-    def kind(self):
-        return self._kind
-
     def get_power(self, currentValues=True, returnTemperature=True):
         """
         Get the domestic hot water power curve
@@ -11,6 +11,7 @@ import pycity_base.classes.demand.load
 from pycity_base.functions import slp_electrical as slp_el
 from pycity_base.functions import change_resolution as chres
 from pycity_base.functions import load_el_profiles as eloader
+from pycity_base.functions import profiling
 from richardsonpy.classes import electric_load as eload
 
 
@@ -49,7 +50,7 @@ class ElectricalDemand(pycity_base.classes.demand.load.Load):
                  do_normalization=False, method_3_type=None,
                  method_4_type=None, prev_heat_dev=False, app_filename=None,
                  light_filename=None, season_light_mod=False,
-                 light_mod_fac=0.25):
+                 light_mod_fac=0.25, lazy=False):
         """
         Parameters
         ----------
@@ -92,7 +93,9 @@ class ElectricalDemand(pycity_base.classes.demand.load.Load):
             There are 100 light bulb configurations predefined for the
             Stochastic model. Select one by entering an integer in [0, ..., 99]
         occupancy : Array-like (optional, but recommended in method 2)
-            Occupancy given at 10-minute intervals for a full year
+            Occupancy given at 10-minute intervals for a full year. An
+            Occupancy object may be given instead (its profile is read, when
+            the load curve is generated).
         do_normalization : bool, optional
             Defines, if stochastic profile (method=2) should be
             normalized to given annual_demand value (default: False).
@@ -136,6 +139,11 @@ class ElectricalDemand(pycity_base.classes.demand.load.Load):
             Define factor, related to maximal lighting power, which is used
             to implement seasonal influence (default: 0.25). Only relevant,
             if season_light_mod == True
+        lazy : bool, optional
+            Defer the generation of the load curve until it is accessed
+            for the first time (default: False). The inputs are recorded
+            and the load curve is generated by the first call of get_power,
+            generate or the loadcurve attribute.
 
         Info
         ----
@@ -146,6 +154,48 @@ class ElectricalDemand(pycity_base.classes.demand.load.Load):
         http://www.die-stromsparinitiative.de/fileadmin/bilder/Stromspiegel/
         Brosch%C3%BCre/Stromspiegel2014web_final.pdf
         """
+        inputs = dict(method=method,
+                      loadcurve=loadcurve,
+                      annual_demand=annual_demand,
+                      profile_type=profile_type,
+                      single_family_house=single_family_house,
+                      total_nb_occupants=total_nb_occupants,
+                      randomize_appliances=randomize_appliances,
+                      light_configuration=light_configuration,
+                      occupancy=occupancy,
+                      do_normalization=do_normalization,
+                      method_3_type=method_3_type,
+                      method_4_type=method_4_type,
+                      prev_heat_dev=prev_heat_dev,
+                      app_filename=app_filename,
+                      light_filename=light_filename,
+                      season_light_mod=season_light_mod,
+                      light_mod_fac=light_mod_fac)
+        if lazy:
+            #  Record the inputs and generate the load curve on first
+            #  access
+            super(ElectricalDemand, self).__init__(environment)
+            self._pending = inputs
+        else:
+            self._generate(environment, **inputs)
+
+        self._kind = "electricaldemand"
+        self.method = method
+
+    @property
+    def kind(self):
+        return self._kind
+
+    @profiling.profiled('generate', 'electricaldemand')
+    def _generate(self, environment, method, loadcurve, annual_demand,
+                  profile_type, single_family_house, total_nb_occupants,
+                  randomize_appliances, light_configuration, occupancy,
+                  do_normalization, method_3_type, method_4_type,
+                  prev_heat_dev, app_filename, light_filename,
+                  season_light_mod, light_mod_fac):
+        """
+        Generate the load curve (see __init__ for the parameters).
+        """
         src_path = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
 
         if method == 0:
@@ -160,15 +210,29 @@ class ElectricalDemand(pycity_base.classes.demand.load.Load):
                 ElectricalDemand.slp = slp_el.load(filename)
                 ElectricalDemand.loaded_slp = True
 
-            loadcurve = slp_el.get_demand(annual_demand,
+            #  The SLP is proportional to the annual demand. Thus, all
+            #  objects with the same profile type share one base profile.
+            get_shared_profile = \
+                pycity_base.classes.demand.load.get_shared_profile
+            base_profile = get_shared_profile(
+                ('slp_electrical', profile_type,
+                 environment.timer.time_discretization),
+                lambda: slp_el.get_demand(1,
                                           ElectricalDemand.slp[profile_type],
-                                          environment.timer.time_discretization)
+                                          environment.timer.time_discretization),
+                dtype=pycity_base.classes.demand.load.get_dtype(environment))
 
-            super(ElectricalDemand, self).__init__(environment, loadcurve)
+            super(ElectricalDemand, self).__init__(environment,
+                                                   base_profile=base_profile,
+                                                   scale=annual_demand)
 
         #  Usage of stochastic, el. profile generator for residential buildings
         elif method == 2:
 
+            if getattr(occupancy, 'kind', None) == 'occupancy':
+                #  Occupancy object (profile might be generated on demand)
+                occupancy = occupancy.occupancy
+
             #  Extract radiation values of weather
             q_direct = environment.weather.q_direct
             q_diffuse = environment.weather.q_diffuse
@@ -180,25 +244,26 @@ class ElectricalDemand(pycity_base.classes.demand.load.Load):
             timestep = environment.timer.time_discretization
 
             #  Generate Richadsonpy el. load object instance
-            electr_lodad = \
-                eload.ElectricLoad(occ_profile=occupancy,
-                                   total_nb_occ=total_nb_occupants,
-                                   q_direct=q_direct,
-                                   q_diffuse=q_diffuse,
-                                   annual_demand=annual_demand,
-                                   is_sfh=single_family_house,
-                                   path_app=app_filename,
-                                   path_light=light_filename,
-                                   randomize_appliances=randomize_appliances,
-                                   prev_heat_dev=prev_heat_dev,
-                                   light_config=light_configuration,
-                                   timestep=timestep,
-                                   initial_day=initial_day,
-                                   season_light_mod=season_light_mod,
-                                   light_mod_fac=light_mod_fac,
-                                   do_normalization=do_normalization,
-                                   calc_profile=True,
-                                   save_app_light=False)
+            with profiling.span('richardsonpy', 'electricaldemand'):
+                electr_lodad = \
+                    eload.ElectricLoad(occ_profile=occupancy,
+                                       total_nb_occ=total_nb_occupants,
+                                       q_direct=q_direct,
+                                       q_diffuse=q_diffuse,
+                                       annual_demand=annual_demand,
+                                       is_sfh=single_family_house,
+                                       path_app=app_filename,
+                                       path_light=light_filename,
+                                       randomize_appliances=randomize_appliances,
+                                       prev_heat_dev=prev_heat_dev,
+                                       light_config=light_configuration,
+                                       timestep=timestep,
+                                       initial_day=initial_day,
+                                       season_light_mod=season_light_mod,
+                                       light_mod_fac=light_mod_fac,
+                                       do_normalization=do_normalization,
+                                       calc_profile=True,
+                                       save_app_light=False)
 
             # if app_filename is None:   # Use default
             #     pathApps = os.path.join(src_path, 'inputs',
@@ -357,7 +422,7 @@ class ElectricalDemand(pycity_base.classes.demand.load.Load):
             loadcurve = eloader.gen_annual_el_load(
                 ElectricalDemand.weekly_data,
                 type=method_3_type,
-                start_wd=environment.timer.current_weekday,
+                start_wd=int(environment.timer.day_weekday[0]),
                 annual_demand=annual_demand)
 
             loadcurve = chres.changeResolution(loadcurve,
@@ -380,23 +445,28 @@ class ElectricalDemand(pycity_base.classes.demand.load.Load):
                     eloader.load_non_res_load_data_annual(fpath)
                 ElectricalDemand.load_ann_data = True
 
-            loadcurve = eloader.get_annual_el_load(
-                ElectricalDemand.ann_data,
-                type=method_4_type,
-                annual_demand=annual_demand)
+            #  Measured profile, normalized to an annual demand of 1 kWh
+            #  (shared by all objects of the same type)
+            def generate():
+                loadcurve = eloader.get_annual_el_load(
+                    ElectricalDemand.ann_data,
+                    type=method_4_type,
+                    annual_demand=1)
+
+                return chres.changeResolution(loadcurve,
+                                              oldResolution=900,
+                                              newResolution=environment.timer.time_discretization)
+
+            get_shared_profile = \
+                pycity_base.classes.demand.load.get_shared_profile
+            base_profile = get_shared_profile(
+                ('measured_electrical', method_4_type,
+                 environment.timer.time_discretization), generate,
+                dtype=pycity_base.classes.demand.load.get_dtype(environment))
 
-            loadcurve = chres.changeResolution(loadcurve,
-                                               oldResolution=900,
-                                               newResolution=environment.timer.time_discretization)
-
-            super(ElectricalDemand, self).__init__(environment, loadcurve)
-
-        self._kind = "electricaldemand"
-        self.method = method
-
-    @property
-    def kind(self):
-        return self._kind
+            super(ElectricalDemand, self).__init__(environment,
+                                                   base_profile=base_profile,
+                                                   scale=annual_demand)
 
     def get_power(self, currentValues=True):
         """
@@ -8,15 +8,143 @@ Created on Sat Feb 07 07:09:12 2015
 
 from __future__ import division
 
+import weakref
 import numpy as np
 
+from pycity_base.functions import profiling
+from pycity_base.functions import lazy_generation
+
+
+#  Shared base profiles, which do not depend on other objects (key as key and
+#  profile as value)
+_shared_profiles = {}
+
+#  Shared base profiles, which depend on an object (e.g. weather), with
+#  the object as key and dict (key as key and profile as value) as value
+_owned_profiles = weakref.WeakKeyDictionary()
+
+#  Keys of shared base profiles (profile ID as key and tuple (weak reference
+#  to profile, key, dtype, weak reference to owner or None) as value). Entries
+#  are removed, when the profile is deleted.
+_shared_profile_keys = {}
+
+
+def get_dtype(environment):
+    """
+    Return the data type of stored time series (see Timer.dtype).
+    """
+    timer = getattr(environment, 'timer', None)
+    return getattr(timer, 'dtype', np.dtype(np.float64))
+
+
+def get_shared_profile(key, generate, owner=None, dtype=np.float64):
+    """
+    Return a shared, read-only base profile.
+
+    The profile is generated on the first call with a key and returned by
+    all further calls with the same key. Demand objects with identical
+    (or proportional) load curves can thus share one array.
+
+    Parameters
+    ----------
+    key : tuple
+        Hashable key, which identifies the profile (including all inputs of
+        generate)
+    generate : function
+        Function without arguments, which returns the profile
+    owner : object, optional
+        Object the profile depends on, e.g. a Weather object (default: None).
+        The profile is discarded, when the owner is deleted.
+    dtype : numpy dtype, optional
+        Data type of the profile (default: np.float64). Profiles of
+        different data types are stored separately.
+
+    Returns
+    -------
+    profile : np.array
+        Read-only profile
+    """
+    if owner is None:
+        profiles = _shared_profiles
+    else:
+        profiles = _owned_profiles.setdefault(owner, {})
+
+    key = (key, np.dtype(dtype).str)
+    if key in profiles:
+        profiling.increment('shared_profile_hit')
+    else:
+        profiling.increment('shared_profile_miss')
+        profile = np.array(generate(), dtype=dtype)
+        profile.flags.writeable = False
+        profiles[key] = profile
+        _shared_profile_keys[id(profile)] = (
+            weakref.ref(profile, lambda ref, profile_id=id(profile):
+                        _shared_profile_keys.pop(profile_id, None)),
+            key[0], key[1],
+            None if owner is None else weakref.ref(owner))
+    return profiles[key]
+
+
+def find_shared_profile(profile):
+    """
+    Return key, data type and owner of a shared base profile (see
+    get_shared_profile).
+
+    Parameters
+    ----------
+    profile : object
+        Any object (e.g. an array)
+
+    Returns
+    -------
+    result_tuple : tuple (key, dtype, owner) or None
+        Arguments of get_shared_profile, which return ``profile``, or None,
+        if ``profile`` is not a shared base profile.
+    """
+    entry = _shared_profile_keys.get(id(profile))
+    if entry is None or entry[0]() is not profile:
+        return None
+    owner = None
+    if entry[3] is not None:
+        owner = entry[3]()
+        if owner is None:
+            return None
+    return (entry[1], np.dtype(entry[2]), owner)
+
+
+def clear_shared_profiles():
+    """
+    Discard all shared base profiles. Demand objects, which already use a
+    shared profile, keep it.
+    """
+    _shared_profiles.clear()
+    _owned_profiles.clear()
+
 
 class Load(object):
     """
     This class holds a load curve and is able to return it or parts of it.
+
+    The load curve is either held by the object itself or given by a shared,
+    read-only base profile and a scale factor (see get_shared_profile).
+    Shared base profiles are copied (copy-on-write), when the ``loadcurve``
+    attribute is accessed, because the returned array may be modified.
+    ``get_power`` always returns read-only arrays: views without copies or,
+    for scaled base profiles, the scaled values.
+
+    Subclasses may defer the generation of the load curve (see the ``lazy``
+    argument of the demand classes): the generator inputs are recorded and
+    passed to ``_generate`` on first access. Deferred objects may carry a
+    seed of the random number generators (see
+    pycity_base.functions.lazy_generation.assign_seeds).
+
+    Every change of the load curve increments the ``version`` counter, which
+    is used by buildings to invalidate cached power curves. Accessing the
+    (writable) ``loadcurve`` attribute counts as a change.
     """
     
-    def __init__(self, environment, loadcurve):
+    def __init__(self, environment, loadcurve=None, base_profile=None,
+                 scale=1):
         """
         Parameters
         ----------
@@ -24,26 +152,180 @@ class Load(object):
             Common to all other objects. Includes time and weather instances
         loadcurve: Array like
             Load curve for all time steps
+        base_profile : np.array, optional
+            Shared base profile for all time steps (default: None). Only
+            used, if loadcurve is None. The array is not copied and should
+            not be modified (see get_shared_profile).
+        scale : float, optional
+            Scale factor of base_profile (default: 1)
         """
         self._kind = "load"
         self.environment = environment
-        
-        self.loadcurve = np.array(loadcurve)
+
+        #  Recorded generator inputs of deferred load curves (or None)
+        self._pending = None
+        #  Incremented, whenever the load curve is changed
+        self._version = 0
+
+        if loadcurve is None and base_profile is not None:
+            self._loadcurve = None
+            self._base_profile = base_profile
+            self._scale = scale
+        else:
+            if loadcurve is None:
+                loadcurve = []
+            self.loadcurve = np.array(loadcurve, dtype=get_dtype(environment))
 
     @property
     def kind(self):
         return self._kind
+
+    @property
+    def loadcurve(self):
+        """
+        Load curve for all time steps. A shared base profile is copied into
+        a private array on first access (copy-on-write). The returned array
+        may be modified in place, hence every access increments ``version``.
+        """
+        self.generate()
+        if self._loadcurve is None:
+            self._loadcurve = self._base_profile * self._scale
+            self._base_profile = None
+            self._scale = 1
+        self._increment_version()
+        return self._loadcurve
+
+    @loadcurve.setter
+    def loadcurve(self, loadcurve):
+        self._loadcurve = loadcurve
+        self._base_profile = None
+        self._scale = 1
+        self._increment_version()
+
+    @property
+    def version(self):
+        """
+        Counter, which is incremented whenever the load curve is changed.
+        """
+        return self.__dict__.get('_version', 0)
+
+    def _increment_version(self):
+        self._version = self.__dict__.get('_version', 0) + 1
+
+    @property
+    def is_shared(self):
+        """
+        True, if the load curve is given by a shared base profile.
+        """
+        return self._loadcurve is None
+
+    @property
+    def is_pending(self):
+        """
+        True, if the generation of the load curve has been deferred and the
+        load curve has not been accessed yet.
+        """
+        return self.__dict__.get('_pending') is not None
+
+    def generate(self):
+        """
+        Generate a deferred load curve. Nothing is done, if the load curve
+        has already been generated.
+        """
+        inputs = self.__dict__.get('_pending')
+        if inputs is not None:
+            self._pending = None
+            kind = self._kind
+            with lazy_generation.seeded_random(self.__dict__.get('_seed')):
+                self._generate(self.environment, **inputs)
+            self._kind = kind
+            self._increment_version()
+
+    def set_base_profile(self, base_profile, scale=1):
+        """
+        Use a shared base profile as load curve (without copying).
+
+        Parameters
+        ----------
+        base_profile : np.array
+            Shared base profile for all time steps. The array should not be
+            modified (e.g. a read-only row of a profile pool).
+        scale : float, optional
+            Scale factor of base_profile (default: 1)
+        """
+        self._pending = None
+        self._loadcurve = None
+        self._base_profile = base_profile
+        self._scale = scale
+        self._increment_version()
+
+    def set_dtype(self, dtype):
+        """
+        Convert the stored load curve to another data type (e.g. np.float32
+        to save memory). A shared base profile is replaced by a converted,
+        read-only copy (see set_base_profile), which is not shared.
+
+        Parameters
+        ----------
+        dtype : numpy dtype
+            Data type of the load curve
+        """
+        self.generate()
+        if self._loadcurve is None:
+            if self._base_profile.dtype != dtype:
+                base_profile = self._base_profile.astype(dtype)
+                base_profile.flags.writeable = False
+                self.set_base_profile(base_profile, self._scale)
+        elif np.asarray(self._loadcurve).dtype != dtype:
+            self.loadcurve = np.asarray(self._loadcurve, dtype=dtype)
+
+    def get_base_profile(self):
+        """
+        Return the base profile and scale factor of the load curve without
+        copying.
+
+        Returns
+        -------
+        result_tuple : tuple (base_profile, scale)
+            Shared, read-only base profile and scale factor or (if the load
+            curve is not shared) load curve and 1
+        """
+        self.generate()
+        if self._loadcurve is None:
+            return (self._base_profile, self._scale)
+        return (self._loadcurve, 1)
+
+    def __setstate__(self, state):
+        #  Objects pickled by older versions store the load curve directly
+        if 'loadcurve' in state:
+            state['_loadcurve'] = state.pop('loadcurve')
+        state.setdefault('_base_profile', None)
+        state.setdefault('_scale', 1)
+        state.setdefault('_pending', None)
+        state.setdefault('_version', 0)
+        self.__dict__.update(state)
         
     def _getLoadcurve(self, currentValues=True):
         """
         Return the load curve for the upcoming scheduling period 
         (currentValues==True) or return the entire load curve 
         (currentValues==False)
+
+        The returned array is read-only, whether the load curve is shared or
+        not. Scaled base profiles are multiplied on every call; use
+        get_base_profile to avoid the copy. Modify the load curve via the
+        ``loadcurve`` attribute.
         """
+        (profile, scale) = self.get_base_profile()
+        profile = np.asarray(profile)
         if currentValues:
             initial_position = self.environment.timer.current_timestep
             timesteps_horizon = self.environment.timer.timesteps_horizon
             final_position = initial_position + timesteps_horizon
-            return self.loadcurve[initial_position:final_position]
+            profile = profile[initial_position:final_position]
+        if scale != 1:
+            profile = profile * scale
         else:
-            return self.loadcurve
+            profile = profile.view()
+        profile.flags.writeable = False
+        return profile
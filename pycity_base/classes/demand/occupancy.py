@@ -8,16 +8,20 @@ occupancy profile.
 from __future__ import division
 
 import copy
+import numpy as np
 
 import richardsonpy.classes.occupancy as occ
 from pycity_base.functions import change_resolution as chres
+from pycity_base.functions import profiling
+from pycity_base.functions import lazy_generation
 
 
 class Occupancy(object):
     """
     """
 
-    def __init__(self, environment, number_occupants, initial_day=1, nb_days=365, do_profile=True):
+    def __init__(self, environment, number_occupants, initial_day=1, nb_days=365, do_profile=True,
+                 lazy=False):
         """
         Constructor of occupancy object.
 
@@ -42,6 +46,9 @@ class Occupancy(object):
             Defines, if user profile should be generated (default: True).
             If set to False, only number of occupants is saved and no
             profile is generated.
+        lazy : bool, optional
+            Defer the generation of the profile until the occupancy
+            attribute is accessed for the first time (default: False).
         """
 
         assert number_occupants > 0, ('At least 1 person has to be defined ' +
@@ -58,23 +65,82 @@ class Occupancy(object):
         self.number_occupants = number_occupants
         self.initial_day = initial_day
         self.nb_days = nb_days
-        self.occupancy = None  # Occupancy profile
+        self._occupancy = None  # Occupancy profile
 
-        if do_profile:
-            occupancy = occ.Occupancy(number_occupants=number_occupants,
-                                      initial_day=initial_day,
-                                      nb_days=nb_days,
-                                      do_profile=do_profile)
+        #  True, if the generation of the profile has been deferred
+        self._pending = do_profile and lazy
 
-            occupancy.gen_occ_profile(nb_days=nb_days)
-
-            #  Save occupancy profile
-            self.occupancy = copy.copy(occupancy.occupancy)
+        if do_profile and not lazy:
+            self._generate()
 
     @property
     def kind(self):
         return self._kind
 
+    @property
+    def occupancy(self):
+        """
+        Occupancy profile with a timestep of 600 seconds (None, if no
+        profile has been generated).
+        """
+        self.generate()
+        return self._occupancy
+
+    @occupancy.setter
+    def occupancy(self, occupancy):
+        self._pending = False
+        self._occupancy = self._as_int_dtype(occupancy)
+
+    @property
+    def is_pending(self):
+        """
+        True, if the generation of the profile has been deferred and the
+        profile has not been accessed yet.
+        """
+        return self.__dict__.get('_pending', False)
+
+    def __setstate__(self, state):
+        #  Objects pickled by older versions store the profile directly
+        if 'occupancy' in state:
+            state['_occupancy'] = state.pop('occupancy')
+        state.setdefault('_pending', False)
+        self.__dict__.update(state)
+
+    def generate(self):
+        """
+        Generate a deferred occupancy profile. Nothing is done, if the
+        profile has already been generated. The random number generators
+        are seeded with the recorded seed, if any (see
+        pycity_base.functions.lazy_generation.assign_seeds).
+        """
+        if self.is_pending:
+            self._pending = False
+            with lazy_generation.seeded_random(self.__dict__.get('_seed')):
+                self._generate()
+
+    @profiling.profiled('generate', 'occupancy')
+    def _generate(self):
+        occupancy = occ.Occupancy(number_occupants=self.number_occupants,
+                                  initial_day=self.initial_day,
+                                  nb_days=self.nb_days,
+                                  do_profile=True)
+
+        occupancy.gen_occ_profile(nb_days=self.nb_days)
+
+        #  Save occupancy profile
+        self._occupancy = self._as_int_dtype(copy.copy(occupancy.occupancy))
+
+    def _as_int_dtype(self, occupancy):
+        """
+        Convert an occupancy profile to the timer's data type of
+        integer-valued series (see Timer.int_dtype).
+        """
+        timer = getattr(self.environment, 'timer', None)
+        int_dtype = getattr(timer, 'int_dtype', None)
+        if int_dtype is None or occupancy is None:
+            return occupancy
+        return np.asarray(occupancy, dtype=int_dtype)
+
     def get_occ_profile_in_curr_timestep(self, timestep=None, int_con=False):
         """
         Returns occupancy profile in current timestep (as occupancy profile
@@ -74,7 +74,13 @@ class SpaceCooling(pycity_base.classes.demand.load.Load):
             if living_area > 0 or specific_demand > 0:
                 warnings.warn("SLP functionality for space cooling objects not implemented yet."
                               "Using a zero cooling load profile instead.")
-            super(SpaceCooling, self).__init__(environment, np.zeros(environment.timer.timesteps_total))
+            timesteps_total = environment.timer.timesteps_total
+            base_profile = pycity_base.classes.demand.load.get_shared_profile(
+                ('zeros', timesteps_total),
+                lambda: np.zeros(timesteps_total),
+                dtype=pycity_base.classes.demand.load.get_dtype(environment))
+            super(SpaceCooling, self).__init__(environment,
+                                               base_profile=base_profile)
 
         self._kind = "spacecooling"
 
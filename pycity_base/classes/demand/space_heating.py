@@ -8,13 +8,13 @@ Created on Sat Feb 14 09:12:35 2015
 
 from __future__ import division
 import os
-import copy
 import numpy as np
 import pycity_base.classes.demand.load
 import pycity_base.classes.demand.zone_inputs as zi
 from pycity_base.functions import slp_thermal as slp_th
 from pycity_base.functions import zone_model as zmodel
 from pycity_base.functions import change_resolution as chres
+from pycity_base.functions import profiling
 
 
 class SpaceHeating(pycity_base.classes.demand.load.Load):
@@ -34,7 +34,7 @@ class SpaceHeating(pycity_base.classes.demand.load.Load):
                  living_area=0, specific_demand=0, profile_type='HEF',
                  zone_parameters=None, t_m_init=None, ventilation=0,
                  t_cooling_set=200, t_heating_set=-50, occupancy=0,
-                 appliances=0, lighting=0):
+                 appliances=0, lighting=0, lazy=False):
         """
         Parameters
         ----------
@@ -98,6 +98,11 @@ class SpaceHeating(pycity_base.classes.demand.load.Load):
         lighting : Array-like, optional
             Internal gains from lighting in Watt.
             Requires ``method=2``.
+        lazy : bool, optional
+            Defer the generation of the load curve until it is accessed
+            for the first time (default: False). The inputs are recorded
+            and the load curve is generated by the first call of get_power,
+            generate or the loadcurve attribute.
 
         Info
         ----
@@ -110,6 +115,41 @@ class SpaceHeating(pycity_base.classes.demand.load.Load):
         """
         self.method = method
 
+        inputs = dict(method=method,
+                      loadcurve=loadcurve,
+                      living_area=living_area,
+                      specific_demand=specific_demand,
+                      profile_type=profile_type,
+                      zone_parameters=zone_parameters,
+                      t_m_init=t_m_init,
+                      ventilation=ventilation,
+                      t_cooling_set=t_cooling_set,
+                      t_heating_set=t_heating_set,
+                      occupancy=occupancy,
+                      appliances=appliances,
+                      lighting=lighting)
+        if lazy:
+            #  Record the inputs and generate the load curve on first
+            #  access
+            super(SpaceHeating, self).__init__(environment)
+            self._pending = inputs
+        else:
+            self._generate(environment, **inputs)
+
+        self._kind = "spaceheating"
+
+    @property
+    def kind(self):
+        return self._kind
+
+    @profiling.profiled('generate', 'spaceheating')
+    def _generate(self, environment, method, loadcurve, living_area,
+                  specific_demand, profile_type, zone_parameters, t_m_init,
+                  ventilation, t_cooling_set, t_heating_set, occupancy,
+                  appliances, lighting):
+        """
+        Generate the load curve (see __init__ for the parameters).
+        """
         if method == 0:
             #  Hand over own power curve
             super(SpaceHeating, self).__init__(environment, loadcurve)
@@ -132,14 +172,30 @@ class SpaceHeating(pycity_base.classes.demand.load.Load):
             annual_demand = living_area * specific_demand  # kWh
             profile = 1
 
-            loadcurve = slp_th.calculate(environment.weather.t_ambient,
-                                         environment.timer.current_day,
-                                         SpaceHeating.slp_prof[profile_type][profile],
-                                         SpaceHeating.slp_week[profile_type],
-                                         SpaceHeating.slp_hour[profile_type],
-                                         annual_demand)
-
-            super(SpaceHeating, self).__init__(environment, loadcurve)
+            #  The SLP is proportional to the annual demand. Thus, all
+            #  objects with the same profile type share one base profile.
+            weekdays = environment.timer.get_weekday_indexes(
+                nb_days=len(environment.weather.t_ambient) * timeDis // 86400)
+
+            def generate():
+                return slp_th.calculate(environment.weather.t_ambient,
+                                        weekdays,
+                                        SpaceHeating.slp_prof[profile_type][profile],
+                                        SpaceHeating.slp_week[profile_type],
+                                        SpaceHeating.slp_hour[profile_type],
+                                        1)
+
+            get_shared_profile = \
+                pycity_base.classes.demand.load.get_shared_profile
+            base_profile = get_shared_profile(
+                ('slp_thermal', profile_type, profile, weekdays.tobytes(),
+                 timeDis),
+                generate, owner=environment.weather,
+                dtype=pycity_base.classes.demand.load.get_dtype(environment))
+
+            super(SpaceHeating, self).__init__(environment,
+                                               base_profile=base_profile,
+                                               scale=annual_demand)
 
         elif method == 2:
             #  Generate thermal load with ISO model
@@ -186,24 +242,27 @@ class SpaceHeating(pycity_base.classes.demand.load.Load):
 
             annual_demand = living_area * specific_demand  # kWh
 
-            #  Extract first profile
-            loadcurve = copy.deepcopy(SpaceHeating.sim_prof_data[:, 1])
-
-            #  Rescale profile to annual_demand
-            con_factor = (1000 * annual_demand) / sum(loadcurve)
-            loadcurve *= con_factor
+            #  Extract first profile, normalized to an annual demand of
+            #  1 Wh (shared by all objects)
+            def generate():
+                loadcurve = SpaceHeating.sim_prof_data[:, 1]
+                loadcurve = loadcurve / sum(loadcurve)
 
-            #  Change resolution
-            loadcurve = chres.changeResolution(loadcurve, oldResolution=3600,
-                                               newResolution=environment.timer.time_discretization)
-
-            super(SpaceHeating, self).__init__(environment, loadcurve)
+                #  Change resolution
+                return chres.changeResolution(loadcurve, oldResolution=3600,
+                                              newResolution=environment.timer.time_discretization)
 
-        self._kind = "spaceheating"
+            get_shared_profile = \
+                pycity_base.classes.demand.load.get_shared_profile
+            base_profile = get_shared_profile(
+                ('modelica_thermal', environment.timer.time_discretization),
+                generate,
+                dtype=pycity_base.classes.demand.load.get_dtype(environment))
 
-    @property
-    def kind(self):
-        return self._kind
+            #  Rescale profile to annual_demand
+            super(SpaceHeating, self).__init__(environment,
+                                               base_profile=base_profile,
+                                               scale=1000 * annual_demand)
 
     def get_power(self, currentValues=True):
         """
@@ -0,0 +1,406 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Asynchronous weather forecast providers.
+
+A forecast provider delivers the weather forecast of a horizon (start
+timestep and number of timesteps) with the coroutine fetch. The
+ForecastPrefetcher runs the providers in a background event loop, so that
+the forecasts of the next horizons can be fetched while the current horizon
+is being optimized. Weather objects use a prefetcher, if a provider is set
+with Weather.set_forecast_provider.
+
+ForecastServer is a local stand-in for a web-based forecast service. It
+serves the (file-based) data of a Weather object via TCP and is used with
+RemoteForecastProvider, e.g. in tests.
+"""
+
+from __future__ import division
+
+import json
+import time
+import asyncio
+import threading
+import collections
+
+import numpy as np
+
+import pycity_base.classes.weather
+
+
+class ForecastProvider(object):
+    """
+    Base class of the forecast providers.
+    """
+
+    def __init__(self):
+        self._kind = "forecastprovider"
+
+    @property
+    def kind(self):
+        return self._kind
+
+    async def fetch(self, start, length):
+        """
+        Fetch the weather forecast of a horizon.
+
+        Parameters
+        ----------
+        start : int
+            First timestep of the horizon
+        length : int
+            Number of timesteps of the horizon
+
+        Returns
+        -------
+        forecast : dict
+            Quantity (see pycity_base.classes.weather.quantities) as key and
+            array as value. The arrays are shorter than length, if the
+            horizon exceeds the available data.
+        """
+        raise NotImplementedError
+
+    async def close(self):
+        """
+        Release the resources (e.g. connections) of the provider.
+        """
+        pass
+
+
+class LocalForecastProvider(ForecastProvider):
+    """
+    Forecast provider, which serves the data of a Weather object (or a dict
+    with arrays) in the same process.
+    """
+
+    def __init__(self, weather, latency=0.0):
+        """
+        Parameters
+        ----------
+        weather : Weather object or dict
+            Weather object or dict with quantity as key and array (one value
+            per timestep) as value
+        latency : float, optional
+            Simulated latency of every request in s (default: 0.0)
+        """
+        super(LocalForecastProvider, self).__init__()
+        self.data = _get_weather_data(weather)
+        self.latency = latency
+
+    async def fetch(self, start, length):
+        if self.latency > 0:
+            await asyncio.sleep(self.latency)
+        return {quantity: np.array(values[start:start + length])
+                for (quantity, values) in self.data.items()}
+
+
+class RemoteForecastProvider(ForecastProvider):
+    """
+    Forecast provider, which requests the forecasts from a forecast service
+    (e.g. ForecastServer) via TCP.
+
+    Requests and responses are single lines of JSON:
+    {"start": 0, "length": 192} is answered with
+    {"start": 0, "data": {"t_ambient": [...], ...}} or {"error": "..."}.
+    """
+
+    def __init__(self, host, port, timeout=10.0):
+        """
+        Parameters
+        ----------
+        host : str
+            Host name or address of the forecast service
+        port : int
+            Port of the forecast service
+        timeout : float, optional
+            Timeout of a single request in s (default: 10.0)
+        """
+        super(RemoteForecastProvider, self).__init__()
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self._connection = None
+        self._lock = None
+
+    async def fetch(self, start, length):
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if self._connection is None:
+                self._connection = await asyncio.open_connection(self.host,
+                                                                 self.port)
+            (reader, writer) = self._connection
+            request = {'start': int(start), 'length': int(length)}
+            try:
+                writer.write((json.dumps(request) + '\n').encode('utf-8'))
+                await writer.drain()
+                line = await asyncio.wait_for(reader.readline(), self.timeout)
+                if not line:
+                    raise ConnectionError(
+                        'Connection closed by forecast service')
+                response = json.loads(line.decode('utf-8'))
+                if 'error' not in response and \
+                        response.get('start') != request['start']:
+                    raise ValueError('Forecast service answered start ' +
+                                     str(response.get('start')) +
+                                     ' instead of ' + str(request['start']))
+            except (asyncio.TimeoutError, asyncio.CancelledError, OSError,
+                    ValueError):
+                #  A pending (or unexpected) response would be read by the
+                #  next request, hence the connection is not reused
+                self._connection = None
+                writer.close()
+                raise
+        if 'error' in response:
+            raise ValueError(response['error'])
+        return {quantity: np.array(values)
+                for (quantity, values) in response['data'].items()}
+
+    async def close(self):
+        if self._connection is not None:
+            (reader, writer) = self._connection
+            self._connection = None
+            writer.close()
+            await writer.wait_closed()
+
+
+class ForecastServer(object):
+    """
+    Local stand-in for a web-based forecast service.
+
+    The server runs in a background thread and answers the requests of
+    RemoteForecastProvider with the data of a Weather object.
+
+    Examples
+    --------
+    >>> with ForecastServer(weather, latency=0.05) as server:
+    ...     provider = RemoteForecastProvider(server.host, server.port)
+    ...     weather.set_forecast_provider(provider)
+    """
+
+    def __init__(self, weather, latency=0.0, host='127.0.0.1', port=0):
+        """
+        Parameters
+        ----------
+        weather : Weather object or dict
+            Weather object (e.g. read from a TRY file) or dict with quantity
+            as key and array as value
+        latency : float, optional
+            Simulated latency of every request in s (default: 0.0)
+        host : str, optional
+            Address of the server (default: '127.0.0.1')
+        port : int, optional
+            Port of the server (default: 0). If 0, a free port is chosen.
+        """
+        self._kind = "forecastserver"
+        self.data = {quantity: [float(value) for value in values]
+                     for (quantity, values)
+                     in _get_weather_data(weather).items()}
+        self.latency = latency
+        self.host = host
+        self.port = port
+        self.nb_requests = 0
+        self._loop = None
+        self._server = None
+        self._thread = None
+        #  Tasks of the open client connections
+        self._tasks = set()
+
+    @property
+    def kind(self):
+        return self._kind
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+        return False
+
+    async def _handle(self, reader, writer):
+        task = asyncio.current_task()
+        self._tasks.add(task)
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                self.nb_requests += 1
+                try:
+                    request = json.loads(line.decode('utf-8'))
+                    (start, length) = (int(request['start']),
+                                       int(request['length']))
+                    assert start >= 0 and length >= 0, \
+                        'start and length have to be non-negative.'
+                    response = {'start': start,
+                                'data': {quantity: values[start:start + length]
+                                         for (quantity, values)
+                                         in self.data.items()}}
+                except Exception as error:
+                    response = {'error': type(error).__name__ + ': ' +
+                                         str(error)}
+                if self.latency > 0:
+                    await asyncio.sleep(self.latency)
+                writer.write((json.dumps(response) + '\n').encode('utf-8'))
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+            self._tasks.discard(task)
+
+    def start(self):
+        """
+        Start the server in a background thread.
+        """
+        assert self._thread is None, 'The server is already running.'
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever,
+                                        daemon=True)
+        self._thread.start()
+        future = asyncio.run_coroutine_threadsafe(
+            asyncio.start_server(self._handle, self.host, self.port),
+            self._loop)
+        self._server = future.result()
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    def stop(self):
+        """
+        Stop the server.
+        """
+        if self._thread is None:
+            return
+
+        async def close():
+            self._server.close()
+            #  Close the open client connections (their tasks would be
+            #  destroyed pending with the event loop otherwise)
+            tasks = list(self._tasks)
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            await self._server.wait_closed()
+
+        asyncio.run_coroutine_threadsafe(close(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+        (self._loop, self._server, self._thread) = (None, None, None)
+
+
+class ForecastPrefetcher(object):
+    """
+    Buffer of the forecasts of a provider with prefetching.
+
+    The provider is run in an event loop in a background thread. Requested
+    and prefetched horizons are kept in a cache of recent horizons.
+    """
+
+    def __init__(self, provider, cache_size=4, timeout=None):
+        """
+        Parameters
+        ----------
+        provider : ForecastProvider object
+            Forecast provider
+        cache_size : int, optional
+            Number of horizons, which are kept in the cache (default: 4)
+        timeout : float, optional
+            Maximum time in s to wait for a forecast (default: None)
+        """
+        assert cache_size >= 1, 'cache_size has to be at least 1.'
+        self._kind = "forecastprefetcher"
+        self.provider = provider
+        self.cache_size = cache_size
+        self.timeout = timeout
+
+        #  Statistics: requests served from the cache (fetched or pending)
+        #  and total time spent waiting for forecasts in s
+        self.hits = 0
+        self.misses = 0
+        self.wait_time = 0.0
+
+        #  (start, length) as key and concurrent future as value (most
+        #  recently used last)
+        self._cache = collections.OrderedDict()
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever,
+                                        daemon=True)
+        self._thread.start()
+
+    @property
+    def kind(self):
+        return self._kind
+
+    def _request(self, start, length):
+        key = (int(start), int(length))
+        future = self._cache.pop(key, None)
+        if future is None or (future.done() and
+                              future.exception() is not None):
+            future = asyncio.run_coroutine_threadsafe(
+                self.provider.fetch(*key), self._loop)
+            hit = False
+        else:
+            hit = True
+        self._cache[key] = future
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return (future, hit)
+
+    def prefetch(self, start, length):
+        """
+        Start fetching a horizon in the background (if not cached yet).
+        """
+        self._request(start, length)
+
+    def get(self, start, length):
+        """
+        Return the forecast of a horizon. Waits, if the forecast has not
+        been fetched yet.
+
+        Returns
+        -------
+        forecast : dict
+            Quantity as key and array as value (see ForecastProvider.fetch)
+        """
+        (future, hit) = self._request(start, length)
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+        start_time = time.perf_counter()
+        try:
+            return future.result(self.timeout)
+        finally:
+            self.wait_time += time.perf_counter() - start_time
+
+    def close(self):
+        """
+        Close the provider and stop the background event loop.
+        """
+        if self._loop.is_closed():
+            return
+        for future in self._cache.values():
+            future.cancel()
+        self._cache.clear()
+        asyncio.run_coroutine_threadsafe(self.provider.close(),
+                                         self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+
+
+def _get_weather_data(weather):
+    """
+    Return the weather data of a Weather object (or dict) as dict.
+    """
+    if isinstance(weather, dict):
+        return {quantity: np.asarray(values)
+                for (quantity, values) in weather.items()}
+    timesteps_total = weather.timer.timesteps_total
+    data = {}
+    for quantity in pycity_base.classes.weather.quantities:
+        values = getattr(weather, quantity, None)
+        if values is not None:
+            data[quantity] = np.asarray(values[:timesteps_total])
+    return data
@@ -11,6 +11,8 @@ from __future__ import division
 import numpy as np
 import math
 
+from pycity_base.functions import profiling
+
 
 class Sun(object):
     """
@@ -90,6 +92,7 @@ class Sun(object):
         """
         self.computeGeometry(allTimeSteps=not currentValues)
     
+    @profiling.profiled('sun_geometry', 'sun')
     def computeGeometry(self, allTimeSteps=False):
         """
         This function computes hour angle, declination, zenith angle of the 
@@ -300,6 +303,7 @@ class Sun(object):
         # Return incidence angle
         return theta
         
+    @profiling.profiled('tilted_radiation', 'sun')
     def getTotalRadiationTiltedSurface(self, beamRadiation, diffuseRadiation, 
                                        beta, gamma, albedo=0.3, update=False, currentValues=True):
         """
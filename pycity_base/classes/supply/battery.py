@@ -47,12 +47,18 @@ class Battery(object):
         timesteps_total = environment.timer.timesteps_total
         timesteps_used_horizon = environment.timer.timesteps_used_horizon
         
-        self.total_soc = np.zeros(timesteps_total)
-        self.total_p_charge = np.zeros(timesteps_total)
-        self.total_p_discharge = np.zeros(timesteps_total)
-        self.current_soc = np.zeros(timesteps_used_horizon)
-        self.current_p_charge = np.zeros(timesteps_used_horizon)
-        self.current_p_discharge = np.zeros(timesteps_used_horizon)
+        self.total_soc = np.zeros(timesteps_total,
+                                  dtype=environment.timer.dtype)
+        self.total_p_charge = np.zeros(timesteps_total,
+                                       dtype=environment.timer.dtype)
+        self.total_p_discharge = np.zeros(timesteps_total,
+                                          dtype=environment.timer.dtype)
+        self.current_soc = np.zeros(timesteps_used_horizon,
+                                    dtype=environment.timer.dtype)
+        self.current_p_charge = np.zeros(timesteps_used_horizon,
+                                         dtype=environment.timer.dtype)
+        self.current_p_discharge = np.zeros(timesteps_used_horizon,
+                                            dtype=environment.timer.dtype)
 
     @property
     def kind(self):
@@ -8,6 +8,10 @@ Created on Mon Feb 09 12:26:24 2015
 
 from __future__ import division
 
+import numpy as np
+
+from pycity_base.functions import dispatch
+
 
 class BES(object):
     """
@@ -219,3 +223,42 @@ class BES(object):
                 result += (self.has_tes,)
         
         return result
+
+    def dispatch(self, q_demand, p_demand=None, t_flow=55, strategy="heat",
+                 save_results=True):
+        """
+        Compute a rule-based dispatch of the BES' heat generators and thermal
+        storage for the current horizon.
+
+        See pycity_base.functions.dispatch.dispatch_bes for the rules and
+        for the dispatch of many BES at once.
+
+        Parameters
+        ----------
+        q_demand : array-like
+            Heat demand in W (timesteps_horizon)
+        p_demand : array-like, optional
+            Electrical demand in W (timesteps_horizon). Required for
+            electricity-led operation (default: None).
+        t_flow : float or array-like, optional
+            Required flow temperature in °C (default: 55)
+        strategy : str, optional
+            - ``"heat"`` : heat-led operation (default)
+            - ``"electricity"`` : electricity-led operation of the CHP unit
+        save_results : bool, optional
+            Save the results with the devices' setResults methods
+            (default: True)
+
+        Returns
+        -------
+        results : dict
+            Results of the BES with one array (timesteps_horizon) per key
+        """
+        if p_demand is not None:
+            p_demand = [p_demand]
+        if not np.isscalar(t_flow):
+            t_flow = [t_flow]
+        results = dispatch.dispatch_bes([self], [q_demand], p_demand=p_demand,
+                                        t_flow=t_flow, strategy=strategy,
+                                        save_results=save_results)
+        return {key: value[0] for (key, value) in results.items()}
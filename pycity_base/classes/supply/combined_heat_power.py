@@ -57,8 +57,10 @@ class CHP(HeatingDevice.HeatingDevice):
         
         self._kind = "chp"
 
-        self.total_p_output = np.zeros(environment.timer.timesteps_total)
-        self.current_p_output = np.zeros(environment.timer.timesteps_used_horizon)
+        self.total_p_output = np.zeros(environment.timer.timesteps_total,
+                                       dtype=environment.timer.dtype)
+        self.current_p_output = np.zeros(environment.timer.timesteps_used_horizon,
+                                         dtype=environment.timer.dtype)
 
     @property
     def kind(self):
@@ -0,0 +1,385 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Catalogue of heat pump, PV module and wind energy converter data sheets.
+"""
+
+from __future__ import division
+
+import os
+import numpy as np
+
+
+#  Spreadsheets in the inputs folder (device as key, file name as value)
+source_files = {"heatpump": "heat_pumps.xlsx",
+                "pv": "photovoltaic_modules.xlsx",
+                "windenergyconverter": "wind_energy_converters.xlsx"}
+
+#  Prefix of the catalogue arrays of each device
+prefixes = {"heatpump": "hp", "pv": "pv", "windenergyconverter": "wec"}
+
+#  Labels (column B) of the PV data sheets and the corresponding arrays
+pv_labels = {"Area": "pv_area",
+             "Efficiency": "pv_eta_noct",
+             "T_cell": "pv_t_cell_noct",
+             "alpha": "pv_alpha_noct",
+             "Power": "pv_power_noct",
+             "G": "pv_radiation_noct",
+             "T_amb": "pv_t_ambient_noct"}
+
+_default_catalogue = None
+
+
+def get_catalogue():
+    """
+    Return the catalogue of the data sheets in pycity_base/inputs.
+
+    The catalogue is created on the first call and shared afterwards.
+
+    Returns
+    -------
+    catalogue : DeviceCatalogue object
+    """
+    global _default_catalogue
+    if _default_catalogue is None:
+        _default_catalogue = DeviceCatalogue()
+    return _default_catalogue
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+class DeviceCatalogue(object):
+    """
+    Data sheets of heat pumps, PV modules and wind energy converters.
+
+    The spreadsheets are parsed once into flat numpy arrays. Data of
+    different size per model (e.g. wind power curves) is concatenated and
+    indexed by offset arrays: the data of model ``i`` is stored in
+    ``values[offsets[i]:offsets[i+1]]``. The arrays are cached in a
+    compressed .npz file, which is refreshed whenever a spreadsheet changes.
+    """
+
+    def __init__(self, path=None, cache_file=None, use_cache=True):
+        """
+        Parameters
+        ----------
+        path : str, optional
+            Folder with the spreadsheets (default: None). If None,
+            pycity_base/inputs is used.
+        cache_file : str, optional
+            Path of the binary cache (default: None). If None,
+            device_catalogue.npz in ``path`` is used.
+        use_cache : bool, optional
+            Read and write the binary cache (default: True)
+        """
+        self._kind = "devicecatalogue"
+
+        if path is None:
+            src_path = os.path.dirname(os.path.dirname(os.path.dirname(
+                os.path.abspath(__file__))))
+            path = os.path.join(src_path, "inputs")
+        if cache_file is None:
+            cache_file = os.path.join(path, "device_catalogue.npz")
+
+        self.path = path
+        self.cache_file = cache_file
+        self.use_cache = use_cache
+
+        #  Array name as key and array as value (loaded on first access)
+        self._data = None
+
+    @property
+    def kind(self):
+        return self._kind
+
+    @property
+    def data(self):
+        """
+        Return all catalogue arrays (array name as key).
+        """
+        if self._data is None:
+            self.load()
+        return self._data
+
+    def load(self):
+        """
+        Load the catalogue from the cache or, if the cache is missing or
+        outdated, from the spreadsheets.
+        """
+        mtimes = np.array([os.path.getmtime(os.path.join(self.path,
+                                                         source_files[key]))
+                           for key in sorted(source_files)])
+
+        data = None
+        if self.use_cache:
+            data = self._read_cache(mtimes)
+
+        if data is None:
+            data = self._parse()
+            data["mtimes"] = mtimes
+            if self.use_cache:
+                self._write_cache(data)
+
+        self._data = data
+
+    def _read_cache(self, mtimes):
+        """
+        Return the cached arrays, if the cache is up to date. Otherwise,
+        return None.
+        """
+        try:
+            with np.load(self.cache_file, allow_pickle=False) as cache:
+                data = {key: cache[key] for key in cache.files}
+        except (OSError, ValueError, KeyError):
+            return None
+
+        if ("mtimes" not in data or data["mtimes"].shape != mtimes.shape or
+                not np.all(data["mtimes"] == mtimes)):
+            return None
+        return data
+
+    def _write_cache(self, data):
+        """
+        Write the arrays to the cache. Read-only installations are skipped
+        silently.
+        """
+        try:
+            with open(self.cache_file, "wb") as cache:
+                np.savez_compressed(cache, **data)
+        except OSError:  # pragma: no cover
+            pass
+
+    def _parse(self):
+        """
+        Parse all spreadsheets.
+        """
+        import openpyxl
+
+        data = {}
+        for (device, filename) in sorted(source_files.items()):
+            workbook = openpyxl.load_workbook(os.path.join(self.path,
+                                                           filename),
+                                              read_only=True, data_only=True)
+            sheets = [(name, list(workbook[name].iter_rows(values_only=True)))
+                      for name in workbook.sheetnames]
+            workbook.close()
+
+            if device == "heatpump":
+                data.update(self._parse_heatpumps(sheets))
+            elif device == "pv":
+                data.update(self._parse_pv_modules(sheets))
+            else:
+                data.update(self._parse_wind_energy_converters(sheets))
+        return data
+
+    @staticmethod
+    def _offsets(lengths):
+        return np.concatenate(([0], np.cumsum(list(lengths)))).astype(np.int64)
+
+    def _parse_heatpumps(self, sheets):
+        """
+        Heat pump sheets: maximum flow temperature in cell B1, followed by
+        two tables (heat output in W and COP) with the flow temperatures in
+        the header row and the ambient temperatures in column B.
+        """
+        t_max = []
+        t_ambient = []
+        t_flow = []
+        heat = []
+        cop = []
+        for (name, rows) in sheets:
+            t_max.append(rows[0][1])
+            tables = []
+            for (i, row) in enumerate(rows):
+                if len(row) > 2 and _is_number(row[2]) and \
+                        isinstance(row[1], str):
+                    #  Header row of a table
+                    flow = [value for value in row[2:] if _is_number(value)]
+                    ambient = []
+                    values = []
+                    for table_row in rows[i + 1:]:
+                        if len(table_row) < 2 or \
+                                not _is_number(table_row[1]):
+                            break
+                        ambient.append(table_row[1])
+                        values.append(table_row[2:2 + len(flow)])
+                    tables.append((flow, ambient, values))
+
+            assert len(tables) == 2, ('Heat pump sheet ' + name +
+                                      ' must contain two tables.')
+            ((flow, ambient, heat_table), (_, _, cop_table)) = tables
+            t_flow.append(np.array(flow, dtype=float))
+            t_ambient.append(np.array(ambient, dtype=float))
+            heat.append(np.array(heat_table, dtype=float).ravel())
+            cop.append(np.array(cop_table, dtype=float).ravel())
+
+        return {"hp_names": np.array([name for (name, rows) in sheets]),
+                "hp_t_max": np.array(t_max, dtype=float),
+                "hp_t_ambient": np.concatenate(t_ambient),
+                "hp_ambient_offsets": self._offsets(map(len, t_ambient)),
+                "hp_t_flow": np.concatenate(t_flow),
+                "hp_flow_offsets": self._offsets(map(len, t_flow)),
+                "hp_heat": np.concatenate(heat),
+                "hp_cop": np.concatenate(cop),
+                "hp_map_offsets": self._offsets(map(len, heat))}
+
+    def _parse_pv_modules(self, sheets):
+        """
+        PV sheets: parameter names in column B and values in column C.
+        """
+        data = {key: np.zeros(len(sheets)) for key in pv_labels.values()}
+        for (i, (name, rows)) in enumerate(sheets):
+            for row in rows:
+                if len(row) > 2 and row[1] in pv_labels:
+                    data[pv_labels[row[1]]][i] = row[2]
+        data["pv_names"] = np.array([name for (name, rows) in sheets])
+        return data
+
+    def _parse_wind_energy_converters(self, sheets):
+        """
+        Wind energy converter sheets: hub height in cell B1, power curve
+        (wind velocity in m/s, power in kW) from row 4 on.
+        """
+        hub_height = []
+        velocity = []
+        power = []
+        for (name, rows) in sheets:
+            hub_height.append(rows[0][1])
+            curve = np.array([row[:2] for row in rows[3:]
+                              if _is_number(row[0]) and _is_number(row[1])],
+                             dtype=float).reshape(-1, 2)
+            velocity.append(curve[:, 0])
+            power.append(curve[:, 1] * 1000)
+
+        return {"wec_names": np.array([name for (name, rows) in sheets]),
+                "wec_hub_height": np.array(hub_height, dtype=float),
+                "wec_velocity": np.concatenate(velocity),
+                "wec_power": np.concatenate(power),
+                "wec_offsets": self._offsets(map(len, velocity))}
+
+    def get_models(self, device):
+        """
+        Return the model names of one kind of device.
+
+        Parameters
+        ----------
+        device : str
+            Kind of device: "heatpump", "pv" or "windenergyconverter"
+
+        Returns
+        -------
+        models : list (of str)
+            Model names in the order of their model IDs
+        """
+        return [str(name) for name in
+                self.data[prefixes[device] + "_names"]]
+
+    def get_index(self, device, model):
+        """
+        Return the model ID of a model.
+
+        Parameters
+        ----------
+        device : str
+            Kind of device: "heatpump", "pv" or "windenergyconverter"
+        model : int or str
+            Model ID or model name (name of the spreadsheet's sheet)
+
+        Returns
+        -------
+        index : int
+            Model ID
+        """
+        names = self.data[prefixes[device] + "_names"]
+        if isinstance(model, str):
+            indexes = np.flatnonzero(names == model)
+            assert len(indexes) > 0, ('Unknown ' + device + ' model ' +
+                                      model)
+            return int(indexes[0])
+        index = int(model)
+        assert 0 <= index < len(names), ('Unknown ' + device + ' model ' +
+                                         str(model))
+        return index
+
+    def get_heatpump_parameters(self, model):
+        """
+        Return the data sheet of a heat pump.
+
+        Parameters
+        ----------
+        model : int or str
+            Model ID or model name, e.g. "Dimplex_LA12TU"
+
+        Returns
+        -------
+        parameters : dict
+            Input parameters of the Heatpump class (t_ambient, t_flow, heat,
+            power, cop and t_max)
+        """
+        data = self.data
+        i = self.get_index("heatpump", model)
+        ambient = slice(data["hp_ambient_offsets"][i],
+                        data["hp_ambient_offsets"][i + 1])
+        flow = slice(data["hp_flow_offsets"][i],
+                     data["hp_flow_offsets"][i + 1])
+        maps = slice(data["hp_map_offsets"][i], data["hp_map_offsets"][i + 1])
+
+        t_ambient = data["hp_t_ambient"][ambient]
+        t_flow = data["hp_t_flow"][flow]
+        shape = (len(t_ambient), len(t_flow))
+        heat = data["hp_heat"][maps].reshape(shape)
+        cop = data["hp_cop"][maps].reshape(shape)
+
+        return {"t_ambient": t_ambient,
+                "t_flow": t_flow,
+                "heat": heat,
+                "power": heat / cop,
+                "cop": cop,
+                "t_max": float(data["hp_t_max"][i])}
+
+    def get_pv_parameters(self, model):
+        """
+        Return the data sheet of a PV module.
+
+        Parameters
+        ----------
+        model : int or str
+            Model ID or model name, e.g. "SolarWorld_SW290"
+
+        Returns
+        -------
+        parameters : dict
+            Module area in m^2 (area), efficiency (eta_noct), radiation
+            (radiation_noct), cell temperature (t_cell_noct), ambient
+            temperature (t_ambient_noct), temperature coefficient
+            (alpha_noct) and power output in W (power_noct), all at NOCT
+            conditions
+        """
+        data = self.data
+        i = self.get_index("pv", model)
+        return {key[len("pv_"):]: float(data[key][i])
+                for key in pv_labels.values()}
+
+    def get_wind_energy_converter_parameters(self, model):
+        """
+        Return the data sheet of a wind energy converter.
+
+        Parameters
+        ----------
+        model : int or str
+            Model ID or model name, e.g. "ENERCON_E_126"
+
+        Returns
+        -------
+        parameters : dict
+            Input parameters of the WindEnergyConverter class (velocity in
+            m/s, power in W and hub_height in m)
+        """
+        data = self.data
+        i = self.get_index("windenergyconverter", model)
+        curve = slice(data["wec_offsets"][i], data["wec_offsets"][i + 1])
+        return {"velocity": data["wec_velocity"][curve],
+                "power": data["wec_power"][curve],
+                "hub_height": float(data["wec_hub_height"][i])}
@@ -50,8 +50,10 @@ class ElectricalHeater(HeatingDevice.HeatingDevice):
         timesteps_total = environment.timer.timesteps_total
         timesteps_used_horizon = environment.timer.timesteps_used_horizon
         
-        self.total_p_consumption = np.zeros(timesteps_total)
-        self.current_p_consumption = np.zeros(timesteps_used_horizon)
+        self.total_p_consumption = np.zeros(timesteps_total,
+                                            dtype=environment.timer.dtype)
+        self.current_p_consumption = np.zeros(timesteps_used_horizon,
+                                              dtype=environment.timer.dtype)
 
     @property
     def kind(self):
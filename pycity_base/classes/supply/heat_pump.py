@@ -9,8 +9,10 @@ Created on Thu Feb 19 16:45:15 2015
 from __future__ import division
 
 import pycity_base.classes.supply.heating_device as HeatingDevice
+import pycity_base.classes.supply.device_catalogue as device_catalogue
 import numpy as np
 from pycity_base.functions import handle_data as handleData
+from pycity_base.functions import profiling
 
 
 class Heatpump(HeatingDevice.HeatingDevice):
@@ -63,13 +65,45 @@ class Heatpump(HeatingDevice.HeatingDevice):
         
         timesteps_total = environment.timer.timesteps_total
         timesteps_used_horizon = environment.timer.timesteps_used_horizon
-        self.total_p_consumption = np.zeros(timesteps_total)
-        self.current_p_consumption = np.zeros(timesteps_used_horizon)
+        self.total_p_consumption = np.zeros(timesteps_total,
+                                            dtype=environment.timer.dtype)
+        self.current_p_consumption = np.zeros(timesteps_used_horizon,
+                                              dtype=environment.timer.dtype)
 
     @property
     def kind(self):
         return self._kind
+
+    @classmethod
+    def from_catalogue(cls, environment, model, lower_activation_limit=1,
+                       catalogue=None):
+        """
+        Create a heat pump from the device catalogue.
+
+        Parameters
+        ----------
+        environment : environment object
+            Common to all other objects. Includes time and weather instances.
+        model : int or str
+            Model ID or model name, e.g. "Dimplex_LA12TU"
+        lower_activation_limit : float (0 <= lower_activation_limit <= 1)
+            Define the lower activation limit (default: 1)
+        catalogue : DeviceCatalogue object, optional
+            Catalogue to be used (default: None). If None, the shared
+            catalogue of pycity_base/inputs is used.
+
+        Examples
+        --------
+        >>> heater = Heatpump.from_catalogue(environment, "Dimplex_LA12TU")
+        """
+        if catalogue is None:
+            catalogue = device_catalogue.get_catalogue()
+        parameters = catalogue.get_heatpump_parameters(model)
+        return cls(environment,
+                   lower_activation_limit=lower_activation_limit,
+                   **parameters)
         
+    @profiling.profiled('nominal_values', 'heatpump')
     def getNominalValues(self, t_flow):
         """
         Return the nominal electricity consumption, heat output and lower 
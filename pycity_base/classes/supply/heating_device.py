@@ -44,10 +44,14 @@ class HeatingDevice(object):
         self.q_nominal = q_nominal
         self.t_max = t_max
         self.lower_activation_limit = lower_activation_limit
-        self.total_q_output = np.zeros(timesteps_total)
-        self.total_device_schedule = np.zeros(timesteps_total)
-        self.current_q_output = np.zeros(timesteps_used_horizon)
-        self.current_device_schedule = np.zeros(timesteps_used_horizon)
+        self.total_q_output = np.zeros(timesteps_total,
+                                       dtype=environment.timer.dtype)
+        self.total_device_schedule = np.zeros(timesteps_total,
+                                              dtype=environment.timer.dtype)
+        self.current_q_output = np.zeros(timesteps_used_horizon,
+                                         dtype=environment.timer.dtype)
+        self.current_device_schedule = np.zeros(timesteps_used_horizon,
+                                                dtype=environment.timer.dtype)
 
     @property
     def kind(self):
@@ -40,10 +40,14 @@ class Inverter(object):
         timesteps_total = environment.timer.timesteps_total
         timesteps_used_horizon = environment.timer.timesteps_used_horizon
         
-        self.total_p_input = np.zeros(timesteps_total)
-        self.total_p_output = np.zeros(timesteps_total)
-        self.current_p_input = np.zeros(timesteps_used_horizon)
-        self.current_p_output = np.zeros(timesteps_used_horizon)
+        self.total_p_input = np.zeros(timesteps_total,
+                                      dtype=environment.timer.dtype)
+        self.total_p_output = np.zeros(timesteps_total,
+                                       dtype=environment.timer.dtype)
+        self.current_p_input = np.zeros(timesteps_used_horizon,
+                                        dtype=environment.timer.dtype)
+        self.current_p_output = np.zeros(timesteps_used_horizon,
+                                         dtype=environment.timer.dtype)
 
     @property
     def kind(self):
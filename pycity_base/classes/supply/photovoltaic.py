@@ -10,6 +10,9 @@ from __future__ import division
 
 import numpy as np
 
+import pycity_base.classes.supply.device_catalogue as device_catalogue
+from pycity_base.functions import profiling
+
 
 class PV(object):
     """
@@ -86,14 +89,66 @@ class PV(object):
         self.gamma = gamma
         self.tau_alpha = tau_alpha
         
-        self.total_power = np.zeros(environment.timer.timesteps_total)
-        self.total_radiation = np.zeros(environment.timer.timesteps_total)
-        self.current_power = np.zeros(environment.timer.timesteps_horizon)
+        self.total_power = np.zeros(environment.timer.timesteps_total,
+                                    dtype=environment.timer.dtype)
+        self.total_radiation = np.zeros(environment.timer.timesteps_total,
+                                        dtype=environment.timer.dtype)
+        self.current_power = np.zeros(environment.timer.timesteps_horizon,
+                                      dtype=environment.timer.dtype)
 
     @property
     def kind(self):
         return self._kind
 
+    def _get_cache_key(self):
+        """
+        Return a key, which changes whenever the parameters of the unit or
+        the weather are changed (used by CityDistrict to cache the
+        generation).
+        """
+        return (self.method, self.area, self.peak_power, self.eta_noct,
+                self.radiation_noct, self.t_cell_noct, self.t_ambient_noct,
+                self.alpha_noct, self.beta, self.gamma, self.tau_alpha,
+                self.environment.weather._get_cache_key())
+
+    @classmethod
+    def from_catalogue(cls, environment, model, number_modules=1, beta=0,
+                       gamma=0, catalogue=None):
+        """
+        Create a PV unit (method 0) from the device catalogue.
+
+        Parameters
+        ----------
+        environment : environment object
+            Common to all other objects. Includes time and weather instances
+        model : int or str
+            Model ID or model name, e.g. "SolarWorld_SW290"
+        number_modules : int, optional
+            Number of installed modules (default: 1)
+        beta : float, optional
+            Slope of the PV unit in degree (default: 0)
+        gamma : float, optional
+            Surface azimuth angle in degree (default: 0)
+        catalogue : DeviceCatalogue object, optional
+            Catalogue to be used (default: None). If None, the shared
+            catalogue of pycity_base/inputs is used.
+
+        Examples
+        --------
+        >>> pv_unit = PV.from_catalogue(environment, "SolarWorld_SW290", 20)
+        """
+        if catalogue is None:
+            catalogue = device_catalogue.get_catalogue()
+        parameters = catalogue.get_pv_parameters(model)
+        return cls(environment, method=0,
+                   area=parameters["area"] * number_modules,
+                   eta_noct=parameters["eta_noct"],
+                   radiation_noct=parameters["radiation_noct"],
+                   t_cell_noct=parameters["t_cell_noct"],
+                   t_ambient_noct=parameters["t_ambient_noct"],
+                   alpha_noct=parameters["alpha_noct"],
+                   beta=beta, gamma=gamma)
+
     def getNominalValues(self):
         """
         Return collector's area, efficiency, nominal cell temperature and 
@@ -239,6 +294,7 @@ class PV(object):
 
         return (power, radiation[0])
     
+    @profiling.profiled('power', 'pv')
     def getPower(self, currentValues=True, updatePower=True):
         """ 
         Get the PV generation. 
@@ -0,0 +1,332 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Columnar result store for supply devices.
+"""
+
+from __future__ import division
+
+import os
+import numpy as np
+
+
+class ResultStore(object):
+    """
+    Shared result storage for many supply devices.
+
+    Every result quantity (e.g. ``q_output``, ``device_schedule`` or ``soc``)
+    is held in one contiguous 2-D block with one row per registered device
+    and one column per timestep. The ``total_*`` attributes of registered
+    devices are replaced by row views into these blocks, so that results
+    saved with ``handle_data.saveResult`` are written directly into the
+    store.
+    """
+
+    def __init__(self, environment, nb_devices=16, dtype=None,
+                 path=None):
+        """
+        Parameters
+        ----------
+        environment : Environment object
+            Common to all other objects. Includes time and weather instances
+        nb_devices : int, optional
+            Number of rows initially reserved per quantity (default: 16).
+            The blocks grow automatically, if more devices are registered.
+        dtype : numpy dtype, optional
+            Data type of the stored results (default: None). If None, the
+            timer's data type is used (see Timer.dtype). Use np.float32 to
+            halve the memory footprint of long runs.
+        path : str, optional
+            Folder for memory-mapped backing files (default: None).
+            If None, all results are kept in RAM.
+        """
+        self._kind = "resultstore"
+
+        self.environment = environment
+        self.nb_devices = max(int(nb_devices), 1)
+        if dtype is None:
+            dtype = environment.timer.dtype
+        self.dtype = np.dtype(dtype)
+        self.path = path
+
+        #  Quantity as key; 2-D block (devices x timesteps) as value
+        self.data = {}
+        #  Quantity as key; list of registered devices (in row order) as value
+        self.devices = {}
+        #  Quantity as key; path to backing file as value (memory mapped only)
+        self.files = {}
+        #  Quantity as key; dict with id(device) as key and row as value
+        self._rows = {}
+
+        if path is not None and not os.path.exists(path):
+            os.makedirs(path)
+
+    @property
+    def kind(self):
+        return self._kind
+
+    def register(self, device):
+        """
+        Register a supply device.
+
+        All one-dimensional ``total_*`` arrays of the device, that span all
+        timesteps, are copied into the store. Afterwards, the device's
+        attributes point to the corresponding rows of the store.
+
+        Parameters
+        ----------
+        device : object
+            Supply device, e.g. Boiler, CHP, Heatpump or Battery
+
+        Returns
+        -------
+        rows : dict
+            Quantity as key and row index of the device as value
+
+        Examples
+        --------
+        >>> myBoiler = Boiler(...)
+        >>> myStore = ResultStore(...)
+        >>> myStore.register(myBoiler)
+        {'device_schedule': 0, 'q_output': 0}
+        """
+        timesteps_total = self.environment.timer.timesteps_total
+
+        rows = {}
+        for attribute in sorted(vars(device)):
+            if not attribute.startswith("total_"):
+                continue
+            values = getattr(device, attribute)
+            if not isinstance(values, np.ndarray) or values.ndim != 1:
+                continue
+            if len(values) != timesteps_total:
+                continue
+
+            quantity = attribute[len("total_"):]
+            if id(device) in self._rows.get(quantity, {}):
+                #  Device has already been registered
+                rows[quantity] = self._rows[quantity][id(device)]
+                continue
+
+            row = self._add_row(quantity, device)
+            block = self.data[quantity]
+            block[row] = values
+            setattr(device, attribute, block[row])
+            rows[quantity] = row
+
+        return rows
+
+    def register_multiple(self, devices):
+        """
+        Register multiple supply devices.
+
+        Parameters
+        ----------
+        devices : List-like
+            List (or tuple) of devices that are added to the store
+        """
+        for device in devices:
+            self.register(device)
+
+    def _add_row(self, quantity, device):
+        """
+        Reserve a new row for ``device`` in the block of ``quantity``.
+        """
+        if quantity not in self.data:
+            self.data[quantity] = self._allocate(quantity, self.nb_devices)
+            self.devices[quantity] = []
+            self._rows[quantity] = {}
+
+        row = len(self.devices[quantity])
+        if row >= self.data[quantity].shape[0]:
+            self._grow(quantity, 2 * self.data[quantity].shape[0])
+
+        self.devices[quantity].append(device)
+        self._rows[quantity][id(device)] = row
+        return row
+
+    def _allocate(self, quantity, nb_rows):
+        """
+        Allocate a zero-initialized block for ``quantity`` with ``nb_rows``
+        rows. The block is memory mapped, if a path has been defined.
+        """
+        shape = (nb_rows, self.environment.timer.timesteps_total)
+
+        if self.path is None:
+            return np.zeros(shape, dtype=self.dtype)
+
+        filename = os.path.join(self.path,
+                                quantity + "_" + str(nb_rows) + ".npy")
+        self.files[quantity] = filename
+        return np.lib.format.open_memmap(filename, mode="w+",
+                                         dtype=self.dtype, shape=shape)
+
+    def _grow(self, quantity, nb_rows):
+        """
+        Move the block of ``quantity`` to a larger block and let all devices
+        point to the new rows.
+        """
+        old_block = self.data[quantity]
+        old_file = self.files.get(quantity)
+
+        new_block = self._allocate(quantity, nb_rows)
+        new_block[:old_block.shape[0]] = old_block
+        self.data[quantity] = new_block
+
+        self._rebind(quantity)
+
+        del old_block
+        if old_file is not None:
+            try:
+                os.remove(old_file)
+            except OSError:  # pragma: no cover
+                #  File is still mapped (e.g. on Windows); keep it
+                pass
+
+    def _rebind(self, quantity):
+        """
+        Let the ``total_<quantity>`` attributes of all registered devices
+        point to their rows in the current block.
+        """
+        block = self.data[quantity]
+        attribute = "total_" + quantity
+        for (row, device) in enumerate(self.devices[quantity]):
+            setattr(device, attribute, block[row])
+
+    def get_quantities(self):
+        """
+        Return the names of all stored quantities.
+
+        Returns
+        -------
+        quantities : list (of str)
+            Stored quantities, e.g. ['device_schedule', 'q_output']
+        """
+        return sorted(self.data.keys())
+
+    def get_devices(self, quantity):
+        """
+        Return the devices holding ``quantity`` (in row order).
+
+        Parameters
+        ----------
+        quantity : str
+            Name of the quantity, e.g. 'q_output'
+
+        Returns
+        -------
+        devices : list
+            Devices in row order
+        """
+        return list(self.devices.get(quantity, []))
+
+    def get_results(self, quantity, currentValues=False):
+        """
+        Return the results of all devices for one quantity.
+
+        Parameters
+        ----------
+        quantity : str
+            Name of the quantity, e.g. 'q_output'
+        currentValues : bool, optional
+            - True : Return only values for the current scheduling period
+            - False : Return values for all scheduling periods (default)
+
+        Returns
+        -------
+        results : np.ndarray
+            2-D view (devices x timesteps) into the store
+        """
+        nb_rows = len(self.devices[quantity])
+        block = self.data[quantity][:nb_rows]
+
+        if currentValues:
+            timer = self.environment.timer
+            initial_position = timer.current_timestep
+            final_position = initial_position + timer.timesteps_used_horizon
+            return block[:, initial_position:final_position]
+        else:
+            return block
+
+    def flush(self):
+        """
+        Write all memory-mapped blocks to disk.
+        """
+        for block in self.data.values():
+            if isinstance(block, np.memmap):
+                block.flush()
+
+
+class ResultRecorder(ResultStore):
+    """
+    Append-only, disk-backed result store for long rolling-horizon runs.
+
+    In contrast to the ResultStore, every quantity is stored time-major
+    (timesteps x devices) in a memory-mapped file. The results of one
+    accepted horizon (``timesteps_used_horizon``) thus form one contiguous
+    region of the file. Calling ``commit`` after each horizon flushes this
+    region to disk and remaps the files, so that only the current horizon
+    stays resident. Past results remain readable through the devices'
+    ``getResults(currentValues=False)`` methods.
+    """
+
+    def __init__(self, environment, path, nb_devices=16, dtype=None):
+        """
+        Parameters
+        ----------
+        environment : Environment object
+            Common to all other objects. Includes time and weather instances
+        path : str
+            Folder for the memory-mapped backing files
+        nb_devices : int, optional
+            Number of columns initially reserved per quantity (default: 16).
+            The files grow automatically, if more devices are registered.
+        dtype : numpy dtype, optional
+            Data type of the stored results (default: None). If None, the
+            timer's data type is used.
+        """
+        super(ResultRecorder, self).__init__(environment,
+                                             nb_devices=nb_devices,
+                                             dtype=dtype,
+                                             path=path)
+        self._kind = "resultrecorder"
+
+        #  All results before this timestep have been written to disk
+        self.committed_timestep = 0
+
+    @property
+    def kind(self):
+        return self._kind
+
+    def _allocate(self, quantity, nb_rows):
+        """
+        Allocate a time-major memory-mapped file for ``quantity`` and return
+        its transposed view (devices x timesteps).
+        """
+        shape = (self.environment.timer.timesteps_total, nb_rows)
+
+        filename = os.path.join(self.path,
+                                quantity + "_" + str(nb_rows) + ".npy")
+        self.files[quantity] = filename
+        block = np.lib.format.open_memmap(filename, mode="w+",
+                                          dtype=self.dtype, shape=shape)
+        return block.T
+
+    def commit(self):
+        """
+        Write the accepted horizon to disk and release the mapped pages.
+
+        Call this method after all devices have saved the results of the
+        current horizon and before the timer is updated.
+        """
+        timer = self.environment.timer
+
+        self.flush()
+        self.committed_timestep = (timer.current_timestep +
+                                   timer.timesteps_used_horizon)
+
+        #  Remap all files. Dropping the old maps releases their pages.
+        for quantity in self.data:
+            block = np.load(self.files[quantity], mmap_mode="r+")
+            self.data[quantity] = block.T
+            self._rebind(quantity)
@@ -51,8 +51,10 @@ class ThermalEnergyStorage(object):
         self.k_losses = k_losses
         self.t_init = t_init
         
-        self.total_t_sto = np.zeros(environment.timer.timesteps_total)
-        self.current_t_sto = np.zeros(environment.timer.timesteps_used_horizon)
+        self.total_t_sto = np.zeros(environment.timer.timesteps_total,
+                                    dtype=environment.timer.dtype)
+        self.current_t_sto = np.zeros(environment.timer.timesteps_used_horizon,
+                                      dtype=environment.timer.dtype)
 
     @property
     def kind(self):
@@ -10,6 +10,8 @@ from __future__ import division
 
 import numpy as np
 from pycity_base.functions import handle_data
+import pycity_base.classes.supply.device_catalogue as device_catalogue
+from pycity_base.functions import profiling
 
 
 class WindEnergyConverter(object):
@@ -50,12 +52,51 @@ class WindEnergyConverter(object):
         self.hub_height = hub_height
         self.roughness = roughness
         
-        self.total_power = np.zeros(environment.timer.timesteps_total)
-        self.current_power = np.zeros(environment.timer.timesteps_horizon)
+        self.total_power = np.zeros(environment.timer.timesteps_total,
+                                    dtype=environment.timer.dtype)
+        self.current_power = np.zeros(environment.timer.timesteps_horizon,
+                                      dtype=environment.timer.dtype)
 
     @property
     def kind(self):
         return self._kind
+
+    def _get_cache_key(self):
+        """
+        Return a key, which changes whenever the parameters of the unit or
+        the weather are changed (used by CityDistrict to cache the
+        generation).
+        """
+        return (np.asarray(self.velocity).tobytes(),
+                np.asarray(self.power).tobytes(), self.hub_height,
+                self.roughness, self.environment.weather._get_cache_key())
+
+    @classmethod
+    def from_catalogue(cls, environment, model, roughness=0.1,
+                       catalogue=None):
+        """
+        Create a wind energy converter from the device catalogue.
+
+        Parameters
+        ----------
+        environment : environment object
+            Common to all other objects. Includes time and weather instances
+        model : int or str
+            Model ID or model name, e.g. "ENERCON_E_126"
+        roughness : float, optional
+            Roughness length (default: 0.1)
+        catalogue : DeviceCatalogue object, optional
+            Catalogue to be used (default: None). If None, the shared
+            catalogue of pycity_base/inputs is used.
+
+        Examples
+        --------
+        >>> turbine = WindEnergyConverter.from_catalogue(environment, 0)
+        """
+        if catalogue is None:
+            catalogue = device_catalogue.get_catalogue()
+        parameters = catalogue.get_wind_energy_converter_parameters(model)
+        return cls(environment, roughness=roughness, **parameters)
     
     def _logWindProfile(self, velocity):
         """
@@ -69,6 +110,7 @@ class WindEnergyConverter(object):
         h1 = self.environment.weather.height_velocity_measurement
         return (velocity * np.log(h2 / z0) / np.log(h1 / z0))
     
+    @profiling.profiled('power', 'windenergyconverter')
     def getPower(self, currentValues=True, updatePower=True):
         """
         Get the expected power output of the wind energy converter for the 
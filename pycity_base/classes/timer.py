@@ -8,12 +8,24 @@ Created on Fri Feb 06 17:05:44 2015
 
 from __future__ import division
 
+import datetime
+import numpy as np
+
 
 class Timer(object):
     """
     This class just holds the time discretization and the total number of time
     steps. Both are important to initialize the result-storing arrays of most
     other classes.
+
+    Additionally, the timer holds precomputed calendar arrays, which can be
+    used for vectorized masking (e.g. ``demand[timer.timestep_weekend]``):
+
+    - Per timestep: timestep_day (day index, starting with 0),
+      timestep_weekday (1 - Monday, ..., 7 - Sunday), timestep_weekend,
+      timestep_holiday and timestep_hour (hour of the day, 0 - 23)
+    - Per day: day_weekday, day_weekend, day_holiday and (if start_date is
+      given) day_date
     """
 
     def __init__(self, 
@@ -21,7 +33,11 @@ class Timer(object):
                  timesteps_horizon=192,
                  timesteps_used_horizon=96,
                  timesteps_total=35040,
-                 initial_day=1):
+                 initial_day=1,
+                 start_date=None,
+                 holidays=None,
+                 dtype=np.float64,
+                 int_dtype=None):
         """
         Parameters
         ----------
@@ -41,6 +57,22 @@ class Timer(object):
         initial_day : Integer, optional
             Define the initial weekday (`Monday` corresponds to 
             ``initial_day==1``, `Sunday` corresponds to ``initial_day==7``)
+        start_date : datetime.date or str, optional
+            Date of the first timestep, e.g. "2017-01-01" (default: None).
+            If given, the initial weekday is derived from start_date and
+            initial_day is ignored.
+        holidays : array-like, optional
+            Holidays as day indexes (0 is the first day) or, if start_date is
+            given, as dates (default: None)
+        dtype : numpy dtype, optional
+            Data type of stored time series, e.g. load curves, weather data
+            and device results (default: np.float64). np.float32 halves the
+            memory footprint. Aggregates (e.g. of buildings and city
+            districts) are still computed with np.float64.
+        int_dtype : numpy dtype, optional
+            Data type of integer-valued time series, e.g. occupancy profiles
+            (default: None). If None, np.uint8 is used, if dtype is
+            np.float32. Otherwise, the generators' data type is kept.
         """
         self._kind = "timer"        
         
@@ -53,14 +85,121 @@ class Timer(object):
         self.current_timestep = 0  # max. 365 * 24 * 3600 / time_discretization
         self.current_day = 0  # max. 365
 
-        self.initial_day = initial_day
-        self.current_weekday = initial_day
+        self._init_calendar(initial_day, start_date, holidays)
+        self.set_dtype(dtype, int_dtype)
+
+        self.current_weekday = self.initial_day
         self.current_day_weekend = self._setWeekend()
 
     @property
     def kind(self):
         return self._kind
 
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if "timestep_day" not in state:
+            #  Objects from older versions (without calendar arrays)
+            self._init_calendar(state.get("initial_day", 1))
+        if "dtype" not in state:
+            self.set_dtype(np.float64)
+
+    def set_dtype(self, dtype=np.float64, int_dtype=None):
+        """
+        Set the data types of stored time series. Only objects, which are
+        created afterwards, use the new data types.
+
+        Parameters
+        ----------
+        dtype : numpy dtype, optional
+            Data type of stored time series (default: np.float64)
+        int_dtype : numpy dtype, optional
+            Data type of integer-valued time series (default: None). If
+            None, np.uint8 is used, if dtype is np.float32.
+        """
+        self.dtype = np.dtype(dtype)
+        assert self.dtype.kind == "f", "dtype has to be a float type"
+        if int_dtype is None and self.dtype.itemsize < 8:
+            int_dtype = np.uint8
+        self.int_dtype = None if int_dtype is None else np.dtype(int_dtype)
+
+    def _init_calendar(self, initial_day, start_date=None, holidays=None):
+        """
+        Compute the calendar arrays of all timesteps and days.
+        """
+        if start_date is not None:
+            if isinstance(start_date, str):
+                start_date = datetime.datetime.strptime(start_date,
+                                                        "%Y-%m-%d").date()
+            elif isinstance(start_date, datetime.datetime):
+                start_date = start_date.date()
+            initial_day = start_date.isoweekday()
+        assert initial_day in [1, 2, 3, 4, 5, 6, 7], ('initial_day has to ' +
+                                                      'be between 1 and 7')
+        self.initial_day = initial_day
+        self.start_date = start_date
+
+        #  Start time of each timestep in seconds
+        seconds = np.arange(self.timesteps_total) * self.time_discretization
+        self.timestep_day = (seconds // 86400).astype(int)
+        self.timestep_hour = ((seconds % 86400) // 3600).astype(int)
+
+        nb_days = int(np.ceil(self.timesteps_total * self.time_discretization /
+                              86400))
+        days = np.arange(nb_days)
+        self.day_weekday = (initial_day - 1 + days) % 7 + 1
+        self.day_weekend = self.day_weekday >= 6
+
+        if start_date is None:
+            self.day_date = None
+        else:
+            self.day_date = np.datetime64(start_date, "D") + days
+
+        self.day_holiday = np.zeros(nb_days, dtype=bool)
+        if holidays is not None and len(holidays) > 0:
+            holidays = np.asarray(holidays)
+            if holidays.dtype.kind in "iu":
+                indexes = holidays
+            else:
+                assert self.day_date is not None, ('Holidays given as dates ' +
+                                                   'require a start_date')
+                indexes = (holidays.astype("datetime64[D]") -
+                           self.day_date[0]).astype(int)
+            indexes = indexes[(indexes >= 0) & (indexes < nb_days)]
+            self.day_holiday[indexes] = True
+
+        self.timestep_weekday = self.day_weekday[self.timestep_day]
+        self.timestep_weekend = self.day_weekend[self.timestep_day]
+        self.timestep_holiday = self.day_holiday[self.timestep_day]
+
+    def get_weekday_indexes(self, holidays_as_sundays=True, nb_days=None):
+        """
+        Return the weekday of each day as index (0 - Monday, ...,
+        6 - Sunday), as used by the standard load profile generators.
+
+        Parameters
+        ----------
+        holidays_as_sundays : bool, optional
+            Treat holidays as Sundays (default: True)
+        nb_days : int, optional
+            Number of days (default: None, i.e. the days of the timer). The
+            generators usually process a full year of data, which may be
+            longer than the timer. Days after the timer's last day continue
+            the week cycle and are no holidays.
+
+        Returns
+        -------
+        weekdays : np.array (of ints)
+            Weekday index of each day
+        """
+        weekdays = self.day_weekday - 1
+        if holidays_as_sundays:
+            weekdays[self.day_holiday] = 6
+        if nb_days is not None:
+            days = np.arange(len(weekdays), nb_days)
+            weekdays = np.concatenate(
+                (weekdays, (self.initial_day - 1 + days) % 7))[:nb_days]
+        return weekdays
+
     def _setWeekend(self):
         """ Determine if the currend day of the week is on a weekend """
         if self.current_weekday < 6:
@@ -68,17 +207,17 @@ class Timer(object):
         else:
             return True
 
+    def _setCurrentDay(self):
+        """ Set current day and weekday according to current_timestep """
+        self.current_day = int(self.current_timestep *
+                               self.time_discretization // 86400)
+        self.current_weekday = (self.initial_day - 1 + self.current_day) % 7 + 1
+        self.current_day_weekend = self._setWeekend()
+
     def update(self):
         """ Increase current_day and current_timestep """
         self.current_timestep += self.timesteps_used_horizon
-        newDay = int(self.current_timestep * 150 / self.time_discretization)
-        # 150 = 3600 / 24
-        if newDay > self.current_day:
-            self.current_day += 1
-            self.current_weekday += 1
-            if self.current_weekday > 7:
-                self.current_weekday = 1
-            self.current_day_weekend = self._setWeekend()
+        self._setCurrentDay()
         
     def setCurrentValues(self, current_day, current_timestep):
         """
@@ -86,6 +225,8 @@ class Timer(object):
         """
         self.current_day = current_day
         self.current_timestep = current_timestep
+        self.current_weekday = (self.initial_day - 1 + current_day) % 7 + 1
+        self.current_day_weekend = self._setWeekend()
     
     def reinit(self, 
                time_discretization,
@@ -93,7 +234,9 @@ class Timer(object):
                timesteps_used_horizon,
                timesteps_total,
                initial_day,
-               overwriteCurrentValues=True):
+               overwriteCurrentValues=True,
+               start_date=None,
+               holidays=None):
         """ 
         Reset the timer's attributes
             
@@ -118,16 +261,22 @@ class Timer(object):
         overwriteCurrentValues : Boolean, optional
             If True: reset current_day and current_timestep to 0
             If False: keep values for current_day and current_timestep
+        start_date : datetime.date or str, optional
+            Date of the first timestep (default: None). If given, initial_day
+            is ignored.
+        holidays : array-like, optional
+            Holidays as day indexes or dates (default: None)
         """
         
         self.time_discretization = time_discretization
         self.timesteps_horizon = timesteps_horizon
         self.timesteps_used_horizon = timesteps_used_horizon
         self.timesteps_total = timesteps_total
-        self.current_weekday = initial_day
         self.total_days = int(timesteps_total * time_discretization / 86400)
-        self._setWeekend()
+        self._init_calendar(initial_day, start_date, holidays)
         
         if overwriteCurrentValues:
             self.current_day = 0
             self.current_timestep = 0
+        self.current_weekday = (self.initial_day - 1 + self.current_day) % 7 + 1
+        self.current_day_weekend = self._setWeekend()
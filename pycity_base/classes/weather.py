@@ -9,18 +9,296 @@ Created on Fri Feb 06 17:11:19 2015
 from __future__ import division
 
 import os
+import functools
 import numpy as np
 import pycity_base.classes.sun
+import pycity_base.classes.forecast_provider
 from pycity_base.functions import change_resolution as chres
+from pycity_base.functions import profiling
+
+
+#  Time series attributes of Weather objects
+quantities = ('t_ambient', 'q_direct', 'q_diffuse', 'v_wind', 'phi_ambient',
+              'p_ambient', 'cloudiness', 'rad_sky', 'rad_earth')
+
+#  Header lines and columns of the quantities in TRY files (before and
+#  after 2017)
+try_format = {False: (38, {'p_ambient': 9, 'phi_ambient': 11,
+                           'q_direct': 13, 'q_diffuse': 14, 't_ambient': 8,
+                           'v_wind': 7, 'cloudiness': 5, 'rad_sky': 16,
+                           'rad_earth': 17}),
+              True: (34, {'p_ambient': 6, 'phi_ambient': 11, 'q_direct': 12,
+                          'q_diffuse': 13, 't_ambient': 5, 'v_wind': 8,
+                          'cloudiness': 9, 'rad_sky': 14, 'rad_earth': 15})}
+
+
+def read_try(path_TRY, new_try=False, nb_rows=None, start=0):
+    """
+    Read the weather data of a TRY file.
+
+    Parameters
+    ----------
+    path_TRY : str
+        Path to the TRY file
+    new_try : bool, optional
+        Defines, if TRY dataset has been generated after 2017
+        (default: False)
+    nb_rows : int, optional
+        Number of rows, which should be read (default: None). If None, all
+        rows are read.
+    start : int, optional
+        Index of the first data row, which should be read (default: 0)
+
+    Returns
+    -------
+    data : dict
+        Quantity (see quantities) as key and array as value
+    """
+    (skip_header, columns) = try_format[new_try]
+    try_data = np.genfromtxt(path_TRY, skip_header=skip_header + start,
+                             max_rows=nb_rows, encoding="utf-8", ndmin=2)
+    return {quantity: try_data[:, column]
+            for (quantity, column) in columns.items()}
+
+
+def _count_try_rows(path_TRY, new_try=False, time_discretization=3600):
+    """
+    Return the number of data rows of a TRY file (without parsing it),
+    which belong to complete days.
+    """
+    skip_header = try_format[new_try][0]
+    with open(path_TRY, "rb") as data:
+        nb_rows = sum(1 for (i, line) in enumerate(data)
+                      if i >= skip_header and line.strip())
+    rows_per_day = int(86400 / time_discretization)
+    return nb_rows // rows_per_day * rows_per_day
+
+
+def _get_try_chunks(path_TRY, nb_rows, rows_per_year):
+    """
+    Split the rows of a TRY file into chunks of one year. The last chunk
+    holds the remaining rows (e.g. the leap day of a leap year).
+
+    Returns
+    -------
+    chunks : list
+        One tuple (path_TRY, start, nb_rows) per chunk
+    """
+    starts = list(range(0, max(nb_rows - rows_per_year, 0) + 1,
+                        rows_per_year))
+    stops = starts[1:] + [nb_rows]
+    return [(path_TRY, start, stop - start)
+            for (start, stop) in zip(starts, stops)]
+
+
+def _load_try_chunk(path_TRY, new_try, nb_rows, time_discretization,
+                    new_time_discretization, start=0):
+    """
+    Read (a part of) a TRY file and convert it to the timer's time
+    discretization.
+    """
+    data = read_try(path_TRY, new_try, nb_rows, start)
+    if time_discretization != new_time_discretization:
+        data = {quantity: chres.changeResolution(values,
+                                                 time_discretization,
+                                                 new_time_discretization)
+                for (quantity, values) in data.items()}
+    return data
+
+
+class WeatherSource(object):
+    """
+    Weather data, which is split into chunks (e.g. one chunk per year).
+
+    Chunks are loaded on first access. Only the ``cache_size`` most
+    recently used chunks are kept in memory. With ``cyclic=True``, the
+    chunks are repeated, until ``length`` timesteps are reached.
+    """
+
+    def __init__(self, loaders, lengths, length=None, cyclic=False,
+                 cache_size=2, dtype=np.float64):
+        """
+        Parameters
+        ----------
+        loaders : list
+            One entry per chunk: Either a function without arguments or a
+            dict (quantity as key, array as value). Functions have to return
+            a dict with the chunk's data.
+        lengths : list (of ints)
+            Number of timesteps of each chunk
+        length : int, optional
+            Total number of timesteps (default: None). If None, the sum of
+            lengths is used.
+        cyclic : bool, optional
+            Repeat the chunks cyclically, if length exceeds the sum of
+            lengths (default: False)
+        cache_size : int, optional
+            Maximum number of chunks loaded from functions, which are kept
+            in memory (default: 2)
+        dtype : numpy dtype, optional
+            Data type of the loaded chunks (default: np.float64)
+        """
+        self._kind = "weathersource"
+
+        assert len(loaders) == len(lengths) > 0, ('One length per chunk ' +
+                                                  'is required')
+        self.loaders = list(loaders)
+        self.offsets = np.concatenate(([0], np.cumsum(lengths))).astype(int)
+        self.period = int(self.offsets[-1])
+        if length is None:
+            length = self.period
+        assert cyclic or length <= self.period, ('Weather data is shorter ' +
+                                                 'than requested length')
+        self.length = int(length)
+        self.cyclic = cyclic
+        self.cache_size = max(int(cache_size), 1)
+        self.dtype = np.dtype(dtype)
+
+        #  Chunk index as key and data as value (most recently used last)
+        self._cache = {}
+
+    @property
+    def kind(self):
+        return self._kind
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_cache'] = {}
+        return state
+
+    def get_chunk(self, index):
+        """
+        Return the data of one chunk.
+
+        Parameters
+        ----------
+        index : int
+            Index of the chunk
+
+        Returns
+        -------
+        data : dict
+            Quantity as key and (read-only) array as value
+        """
+        loader = self.loaders[index]
+        if isinstance(loader, dict):
+            return loader
+
+        if index in self._cache:
+            data = self._cache.pop(index)
+        else:
+            profiling.increment('chunk_load', 'weathersource')
+            data = {}
+            for (quantity, values) in loader().items():
+                values = np.asarray(values, dtype=self.dtype)
+                values.flags.writeable = False
+                data[quantity] = values
+            while len(self._cache) >= self.cache_size:
+                del self._cache[next(iter(self._cache))]
+        self._cache[index] = data
+        return data
+
+    def get_values(self, quantity, start, stop):
+        """
+        Return the values of one quantity between two timesteps.
+
+        A view of the chunk is returned, if the timesteps are part of one
+        chunk. Otherwise, the values are concatenated.
+        """
+        pieces = []
+        position = start
+        while position < stop:
+            (cycle, position_period) = divmod(position, self.period)
+            index = int(np.searchsorted(self.offsets, position_period,
+                                        side='right')) - 1
+            chunk_start = self.offsets[index]
+            chunk_stop = min(self.offsets[index + 1],
+                             position_period + stop - position)
+            values = self.get_chunk(index)[quantity]
+            pieces.append(values[position_period - chunk_start:
+                                 chunk_stop - chunk_start])
+            position += chunk_stop - position_period
+
+        if len(pieces) == 1:
+            return pieces[0]
+        elif len(pieces) == 0:
+            return np.zeros(0)
+        return np.concatenate(pieces)
+
+
+class WeatherSeries(np.lib.mixins.NDArrayOperatorsMixin):
+    """
+    Read-only, array-like time series of one quantity of a WeatherSource.
+
+    Slices are served chunk by chunk (see WeatherSource.get_values). Numpy
+    functions and arithmetic operations materialize the complete series.
+    """
+
+    def __init__(self, source, quantity):
+        """
+        Parameters
+        ----------
+        source : WeatherSource object
+        quantity : str
+            Weather quantity, e.g. 't_ambient'
+        """
+        self.source = source
+        self.quantity = quantity
+
+    def __len__(self):
+        return self.source.length
+
+    @property
+    def shape(self):
+        return (self.source.length,)
+
+    @property
+    def ndim(self):
+        return 1
+
+    @property
+    def dtype(self):
+        return self.source.dtype
+
+    def __getitem__(self, key):
+        length = self.source.length
+        if isinstance(key, slice):
+            (start, stop, step) = key.indices(length)
+            if step == 1:
+                return self.source.get_values(self.quantity, start,
+                                              max(start, stop))
+            return np.asarray(self)[key]
+        elif isinstance(key, (int, np.integer)):
+            if key < 0:
+                key += length
+            if not 0 <= key < length:
+                raise IndexError('Index out of range')
+            return self.source.get_values(self.quantity, key, key + 1)[0]
+        return np.asarray(self)[key]
+
+    def __iter__(self):
+        return iter(self[:])
+
+    def __array__(self, dtype=None, copy=None):
+        values = self[:]
+        if dtype is not None:
+            values = values.astype(dtype)
+        return values
+
+    def __array_ufunc__(self, ufunc, method, *inputs, **kwargs):
+        inputs = [np.asarray(value) if isinstance(value, WeatherSeries)
+                  else value for value in inputs]
+        return getattr(ufunc, method)(*inputs, **kwargs)
 
 
 class Weather(pycity_base.classes.sun.Sun):
     """
     Weather class keeps track of the weather data.
     In a real world setting, this would be the interface to a web-based
-    weather forecast.
+    weather forecast (see set_forecast_provider).
     """
 
+    @profiling.profiled('load', 'weather')
     def __init__(self, timer,
                  path_TRY=None, path_TMY3=None, new_try=False,
                  path_temperature="", path_direct_radiation="",
@@ -29,7 +307,7 @@ class Weather(pycity_base.classes.sun.Sun):
                  time_discretization=3600, delimiter="\t",
                  use_TRY=True, use_TMY3=False,
                  location=(50.76, 6.07), height_velocity_measurement=10,
-                 altitude=152.0, time_zone=1):
+                 altitude=152.0, time_zone=1, cyclic=False, cache_size=2):
         """
         Parameters
         ----------
@@ -39,6 +317,11 @@ class Weather(pycity_base.classes.sun.Sun):
             Path to a standard Test Reference Year file
             Default value is None. If default value is set, TRY2010_05_Jahr.dat is used.
             Example: "inputs/weather/TRY2010_05_Jahr.dat"
+            A list of paths chains several TRY files (e.g. one file per
+            year, including leap years). Chained files, files with more
+            than one year of data, which are needed for the timer's
+            timesteps_total, and cyclically extended files are loaded year
+            by year on first access (see cache_size).
         path_TMY3 : String, optional if use_TMY3=False.
             Path to a standard Test Reference Year file
             Default value is None. If default value is set, data for New York 
@@ -86,10 +369,27 @@ class Weather(pycity_base.classes.sun.Sun):
         time_zone : integer, optional
             Shift between the location's time and GMT in hours. CET is 1.
             Daylight savings time is neglected.
+        cyclic : bool, optional
+            Repeat the weather data cyclically, if the timer's
+            timesteps_total exceeds the data (default: False). E.g. one TRY
+            is used for every year of a multi-year simulation. The data is
+            not copied.
+        cache_size : int, optional
+            Number of years of TRY data, which are kept in memory (default:
+            2)
+
+        Annotations
+        -----------
+        For chained, multi-year or cyclically extended data, the weather
+        attributes (t_ambient, q_direct, ...) are WeatherSeries objects
+        instead of arrays. Slices (e.g. the forecasts of the current
+        horizon) are served chunk by chunk.
         """
 
         super(Weather, self).__init__(timer, location, time_zone, altitude)
         self._kind = "weather"
+        self._forecast_prefetcher = None
+        self._forecast_prefetch = 0
         self.weather_dataset_name = ""
         self.try_number = "00"
 
@@ -106,63 +406,76 @@ class Weather(pycity_base.classes.sun.Sun):
         self.current_rad_sky = np.zeros(timer.timesteps_horizon)
         self.current_rad_earth = np.zeros(timer.timesteps_horizon)
 
-        #  Calculate number of rows, which should be loaded into weather class
-        nb_rows = int(8760 * 3600 / time_discretization)
-
-        if use_TRY:
-
-            if new_try is False:
-                # Generate TRY path (if path is None) and use TRY2010_05_Jahr.dat
-                if path_TRY is None:
-                    src_path = os.path.dirname(os.path.dirname(__file__))
-                    path_TRY = os.path.join(src_path,
-                                            'inputs',
-                                            'weather',
-                                            'TRY2010_05_Jahr.dat')
-
-                # Read TRY data
-                TRYData = np.genfromtxt(path_TRY, skip_header=38, encoding="utf-8")
-
-                # Save relevant weather data (only extract row 0 to 8760)
-                self.p_ambient = TRYData[0:nb_rows, 9]
-                self.phi_ambient = TRYData[0:nb_rows, 11]
-                self.q_direct = TRYData[0:nb_rows, 13]
-                self.q_diffuse = TRYData[0:nb_rows, 14]
-                self.t_ambient = TRYData[0:nb_rows, 8]
-                self.v_wind = TRYData[0:nb_rows, 7]
-                self.cloudiness = TRYData[0:nb_rows, 5]
-                self.rad_sky = TRYData[0:nb_rows, 16]
-                self.rad_earth = TRYData[0:nb_rows, 17]
-
-                # Read TRY number
-                with open(path_TRY, "rb") as data:
-                    first_line = data.readline()
-                self.try_number = first_line[3] + first_line[4]
-
+        #  Number of rows of one year of data
+        rows_per_year = int(8760 * 3600 / time_discretization)
+        nb_rows = rows_per_year
+
+        if use_TRY and path_TRY is None:
+            if new_try:
+                msg = 'path_TRY cannot be None.'
+                raise AssertionError(msg)
+            # Use TRY2010_05_Jahr.dat
+            src_path = os.path.dirname(os.path.dirname(__file__))
+            path_TRY = os.path.join(src_path, 'inputs', 'weather',
+                                    'TRY2010_05_Jahr.dat')
+
+        #  Length of the weather data in timesteps of the timer
+        length = timer.timesteps_total
+        if use_TRY and not isinstance(path_TRY, (list, tuple)):
+            #  Single TRY file: more than one year of data is only loaded
+            #  (year by year), if the timer requires it
+            nb_rows = _count_try_rows(path_TRY, new_try, time_discretization)
+            rows_required = int(np.ceil(timer.timesteps_total *
+                                        timer.time_discretization /
+                                        time_discretization))
+            if cyclic or min(nb_rows, rows_required) > rows_per_year:
+                path_TRY = [path_TRY]
+                if not cyclic:
+                    length = min(length, int(nb_rows * time_discretization /
+                                             timer.time_discretization))
             else:
-                #  New TRY dataset (after 2017)
-                if path_TRY is None:
-                    msg = 'path_TRY cannot be None.'
-                    raise AssertionError(msg)
-
-                # Read TRY data
-                TRYData = np.genfromtxt(path_TRY, skip_header=34, encoding="utf-8")
-
-                # Save relevant weather data (only extract row 0 to 8760)
-                self.p_ambient = TRYData[0:nb_rows, 6]
-                self.phi_ambient = TRYData[0:nb_rows, 11]
-                self.q_direct = TRYData[0:nb_rows, 12]
-                self.q_diffuse = TRYData[0:nb_rows, 13]
-                self.t_ambient = TRYData[0:nb_rows, 5]
-                self.v_wind = TRYData[0:nb_rows, 8]
-                self.cloudiness = TRYData[0:nb_rows,9]
-                self.rad_sky = TRYData[0:nb_rows, 14]
-                self.rad_earth = TRYData[0:nb_rows, 15]
-
-                # Read TRY number
-                with open(path_TRY, "rb") as data:
-                    first_line = data.readline()
-                self.try_number = first_line[3] + first_line[4]
+                nb_rows = min(nb_rows, rows_per_year)
+
+        chained = use_TRY and isinstance(path_TRY, (list, tuple))
+        dtype = getattr(timer, 'dtype', np.dtype(np.float64))
+
+        if chained:
+            #  Chained TRY files (loaded year by year on first access)
+            chunks = []
+            for path in path_TRY:
+                chunks.extend(_get_try_chunks(
+                    path, _count_try_rows(path, new_try, time_discretization),
+                    rows_per_year))
+            loaders = [functools.partial(_load_try_chunk, path, new_try, rows,
+                                         time_discretization,
+                                         self.timer.time_discretization,
+                                         start)
+                       for (path, start, rows) in chunks]
+            lengths = [int(rows * time_discretization /
+                           self.timer.time_discretization)
+                       for (path, start, rows) in chunks]
+            source = WeatherSource(loaders, lengths, length=length,
+                                   cyclic=cyclic, cache_size=cache_size,
+                                   dtype=dtype)
+            for quantity in quantities:
+                setattr(self, quantity, WeatherSeries(source, quantity))
+
+            with open(path_TRY[0], "rb") as data:
+                first_line = data.readline()
+            self.try_number = first_line[3] + first_line[4]
+            self.weather_dataset_name = \
+                ((str(path_TRY[0]).replace('\\', '/')).split("/")[-1]).split(".")[0]
+
+        elif use_TRY:
+            # Read TRY data (at most one year)
+            for (quantity, values) in read_try(path_TRY, new_try,
+                                               nb_rows).items():
+                setattr(self, quantity, values)
+
+            # Read TRY number
+            with open(path_TRY, "rb") as data:
+                first_line = data.readline()
+            self.try_number = first_line[3] + first_line[4]
 
             self.weather_dataset_name = ((str(path_TRY).replace('\\', '/')).split("/")[-1]).split(".")[0]
 
@@ -220,7 +533,8 @@ class Weather(pycity_base.classes.sun.Sun):
             self.p_ambient = readTXT(path_pressure, delimiter)
             self.cloudiness = readTXT(path_cloudiness, delimiter)
 
-        if not time_discretization == self.timer.time_discretization:
+        if not chained and \
+                not time_discretization == self.timer.time_discretization:
             # If there is a difference between the standard time discretization
             # and the discretization of the input data, convert the inputs
             # to the desired time discretization
@@ -247,10 +561,93 @@ class Weather(pycity_base.classes.sun.Sun):
                                            time_discretization,
                                            self.timer.time_discretization)
 
+        if not chained and dtype != np.float64:
+            #  Store the data with the timer's data type
+            for quantity in quantities:
+                if hasattr(self, quantity):
+                    setattr(self, quantity,
+                            np.asarray(getattr(self, quantity), dtype=dtype))
+
+        if cyclic and not chained and \
+                len(self.t_ambient) < timer.timesteps_total:
+            #  Repeat the data (one chunk held in memory)
+            data = {quantity: getattr(self, quantity) for quantity in
+                    quantities if hasattr(self, quantity)}
+            for values in data.values():
+                values.flags.writeable = False
+            source = WeatherSource([data], [len(self.t_ambient)],
+                                   length=timer.timesteps_total, cyclic=True,
+                                   dtype=dtype)
+            for quantity in data:
+                setattr(self, quantity, WeatherSeries(source, quantity))
+
     @property
     def kind(self):
         return self._kind
 
+    def _get_cache_key(self):
+        """
+        Return a key, which changes whenever the location or a weather time
+        series is replaced (used by CityDistrict to cache the generation of
+        pv and wind energy converters). Time series, which are modified in
+        place, are not detected.
+        """
+        return ((id(self), self.latitude, self.longitude, self.altitude,
+                 self.time_zone) +
+                tuple(id(getattr(self, quantity, None))
+                      for quantity in quantities))
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        #  Background threads of the forecast provider cannot be pickled
+        state['_forecast_prefetcher'] = None
+        return state
+
+    def set_forecast_provider(self, provider, prefetch=1, cache_size=None,
+                              timeout=None):
+        """
+        Use a forecast provider for the forecasts of the current horizon.
+
+        The forecasts are fetched in a background event loop. Whenever the
+        forecast of the current horizon is requested (getWeatherForecast
+        with currentValues=True), the next horizons are prefetched, so that
+        fetching overlaps with the computations of the current horizon.
+
+        Parameters
+        ----------
+        provider : ForecastProvider object
+            Forecast provider (see pycity_base.classes.forecast_provider).
+            If None, the current provider is closed and the forecasts are
+            taken from the weather data again.
+        prefetch : int, optional
+            Number of following horizons, which are prefetched (default: 1)
+        cache_size : int, optional
+            Number of horizons, which are kept in the cache (default: None).
+            If None, prefetch + 2 horizons are kept.
+        timeout : float, optional
+            Maximum time in s to wait for a forecast (default: None)
+        """
+        prefetcher = getattr(self, '_forecast_prefetcher', None)
+        if prefetcher is not None:
+            prefetcher.close()
+            self._forecast_prefetcher = None
+
+        if provider is not None:
+            if cache_size is None:
+                cache_size = prefetch + 2
+            self._forecast_prefetcher = \
+                pycity_base.classes.forecast_provider.ForecastPrefetcher(
+                    provider, cache_size=cache_size, timeout=timeout)
+            self._forecast_prefetch = prefetch
+
+    @property
+    def forecast_prefetcher(self):
+        """
+        ForecastPrefetcher of the forecast provider (None, if no provider is
+        set).
+        """
+        return getattr(self, '_forecast_prefetcher', None)
+
     def getRadiationTiltedSurface(self, beta, gamma, albedo=0.3, update=False,
                                   currentValues=True):
         """
@@ -400,6 +797,24 @@ class Weather(pycity_base.classes.sun.Sun):
         if currentValues:
             currentPosition = self.timer.current_timestep
             finalPosition = currentPosition + self.timer.timesteps_horizon
+
+            prefetcher = self.forecast_prefetcher
+            if prefetcher is not None:
+                horizon = self.timer.timesteps_horizon
+                forecast = prefetcher.get(currentPosition, horizon)
+                for i in range(1, self._forecast_prefetch + 1):
+                    start = (currentPosition +
+                             i * self.timer.timesteps_used_horizon)
+                    if start < self.timer.timesteps_total:
+                        prefetcher.prefetch(start, horizon)
+                requests = ((getTAmbient, 't_ambient'),
+                            (getQDirect, 'q_direct'),
+                            (getQDiffuse, 'q_diffuse'),
+                            (getVWind, 'v_wind'),
+                            (getPhiAmbient, 'phi_ambient'),
+                            (getPAmbient, 'p_ambient'))
+                return tuple(forecast[quantity]
+                             for (request, quantity) in requests if request)
         else:
             currentPosition = 0
             finalPosition = self.timer.timesteps_total
@@ -7,12 +7,14 @@ sampling rate.
 
 from __future__ import division
 from pycity_base.functions import slp_electrical
+from pycity_base.functions import profiling
 
 import os
 import numpy as np
 import math
 
 
+@profiling.profiled('change_resolution')
 def changeResolution(values, oldResolution, newResolution, method="mean"):
     """
     Change the temporal resolution of averages that have a constant sampling rate
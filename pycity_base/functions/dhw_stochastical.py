@@ -14,6 +14,7 @@ import openpyxl
 import math
 import random
 from pycity_base.functions import change_resolution as chres
+from pycity_base.functions import profiling
 
 
 def load_profiles(filename):
@@ -112,6 +113,7 @@ def compute_daily_demand(probability_profiles, average_profile, occupancy,
     return (water, heat)
 
 
+@profiling.profiled('dhw_stochastic')
 def full_year_computation(occupancy, 
                           profiles, 
                           time_dis=3600,
@@ -130,7 +132,7 @@ def full_year_computation(occupancy,
             - Within `we` and `wd`: [`1`, `2`, `3`, `4`, `5`, `6`] (integers)
     time_dis : integer
         Time discretization in seconds.
-    initial_day : integer
+    initial_day : integer or array-like
         - 0 : Monday
         - 1 : Tuesday
         - 2 : Wednesday
@@ -138,6 +140,8 @@ def full_year_computation(occupancy,
         - 4 : Friday
         - 5 : Saturday
         - 6 : Sunday
+        Alternatively, an array with the weekday of each day (same indexes,
+        see Timer.get_weekday_indexes).
     temperature_difference : float
         How much does the tap water has to be heated up? Either enter a float
         or an array with the same dimension as probability_profiles.
@@ -156,10 +160,16 @@ def full_year_computation(occupancy,
     
     water = np.zeros(len(occupancy) * 10)
     heat = np.zeros(len(occupancy) * 10)
+
+    # Weekend days
+    weekdays = np.asarray(initial_day, dtype=int)
+    if weekdays.ndim == 0:
+        weekdays = (weekdays + np.arange(number_days)) % 7
+    weekend = weekdays >= 5
     
     for day in range(number_days):
         # Is the current day on a weekend?
-        if (day + initial_day) % 7 >= 5:
+        if weekend[day]:
             probability_profiles = profiles["we"]
             average_profile = profiles["we_mw"]
         else:
@@ -0,0 +1,391 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Rule-based dispatch of the heat generators and thermal storages of many
+building energy systems (BES).
+
+All buildings are simulated at once: the kernel loops over the timesteps of
+the horizon and computes each timestep for all buildings with numpy
+operations.
+
+Rules (applied for every timestep and building):
+
+1. Base load units (CHP unit, then heat pump) cover the heat demand. If
+   their lower activation limit exceeds the demand, they run at the lower
+   limit, if the surplus fits into the thermal storage. Otherwise, they stay
+   switched off. In electricity-led operation, the CHP unit follows the
+   electrical demand instead of the heat demand, as far as the surplus heat
+   can be stored.
+2. The thermal storage covers the remaining demand, as long as its
+   temperature stays above the required flow temperature.
+3. Peak load units (boiler, then electrical heater) cover the rest. If the
+   demand is below their lower activation limit and the surplus can not be
+   stored, the units cycle within the timestep, i.e. their mean output
+   equals the demand.
+4. Demand that can not be met by any unit is reported as unmet demand.
+"""
+
+from __future__ import division
+
+import numpy as np
+
+from pycity_base.classes.supply.thermal_energy_storage import \
+    ThermalEnergyStorage
+
+
+#  Heat capacity of water in J/(kgK)
+c_water = ThermalEnergyStorage.c_water
+
+#  Heat generators in order of priority
+generators = ("chp", "heatpump", "boiler", "electricalheater")
+
+#  Generators that are switched off, if their lower activation limit can not
+#  be met
+base_load_generators = ("chp", "heatpump")
+
+
+def _broadcast(values, shape):
+    """
+    Return ``values`` as float array of ``shape``. One dimensional arrays
+    always hold one entry per building and are broadcast along the time
+    axis. Time-varying values require arrays (buildings x timesteps).
+    """
+    values = np.asarray(values, dtype=float)
+    if values.ndim == 1:
+        assert values.shape[0] == shape[0], ('One value per building is '
+                                             'required (use an array '
+                                             '(buildings x timesteps) for '
+                                             'time-varying values).')
+        values = values[:, np.newaxis]
+    return np.broadcast_to(values, shape)
+
+
+def dispatch_heat(q_demand, q_max, q_min, time_discretization,
+                  tes_capacity=0, t_init=0, t_max=0, t_min=0,
+                  t_surroundings=20, k_losses=0, strategy="heat",
+                  p_demand=None, sigma=None):
+    """
+    Compute the heat output of all generators and the storage temperatures
+    of many buildings.
+
+    Parameters
+    ----------
+    q_demand : array-like
+        Heat demand in W (buildings x timesteps)
+    q_max : dict
+        Kind of generator ("chp", "heatpump", "boiler", "electricalheater")
+        as key and maximum heat output in W as value. Values are either
+        scalars, one value per building (one dimensional arrays) or arrays
+        (buildings x timesteps). Use 0 for buildings without this
+        generator.
+    q_min : dict
+        Kind of generator as key and heat output at the lower activation
+        limit in W as value (same shapes as q_max). Missing kinds are
+        treated as linear (q_min = 0).
+    time_discretization : int
+        Timestep length in seconds
+    tes_capacity : float or array-like, optional
+        Storage mass in kg, one value per building (default: 0). Use 0 for
+        buildings without thermal storage.
+    t_init : float or array-like, optional
+        Initial storage temperature in °C (default: 0)
+    t_max : float or array-like, optional
+        Maximum storage temperature in °C (default: 0)
+    t_min : float or array-like, optional
+        Minimum temperature in °C down to which the storage can be
+        discharged, e.g. the required flow temperature (default: 0). Either
+        one value per building or an array (buildings x timesteps).
+    t_surroundings : float or array-like, optional
+        Temperature of the storage's surroundings in °C (default: 20)
+    k_losses : float or array-like, optional
+        Storage's loss factor in W/K (default: 0)
+    strategy : str, optional
+        - ``"heat"`` : heat-led operation (default)
+        - ``"electricity"`` : electricity-led operation of the CHP unit
+    p_demand : array-like, optional
+        Electrical demand in W (buildings x timesteps). Required for
+        electricity-led operation.
+    sigma : float or array-like, optional
+        Power to heat ratio of the CHP units, one value per building.
+        Required for electricity-led operation.
+
+    Returns
+    -------
+    q_output : dict
+        Kind of generator as key and heat output in W (buildings x
+        timesteps) as value
+    t_sto : np.ndarray
+        Storage temperature in °C at the end of each timestep (buildings x
+        timesteps)
+    q_unmet : np.ndarray
+        Heat demand in W that could not be covered (buildings x timesteps)
+    """
+    assert strategy in ("heat", "electricity"), ('Unknown strategy ' +
+                                                 str(strategy))
+
+    q_demand = np.atleast_2d(np.asarray(q_demand, dtype=float))
+    shape = q_demand.shape
+    (nb_buildings, timesteps) = shape
+    dt = time_discretization
+
+    kinds = [kind for kind in generators if kind in q_max]
+    q_upper = {kind: _broadcast(q_max[kind], shape) for kind in kinds}
+    q_lower = {kind: _broadcast(q_min.get(kind, 0), shape) for kind in kinds}
+
+    if strategy == "electricity" and "chp" in kinds:
+        assert p_demand is not None and sigma is not None, \
+            'Electricity-led operation requires p_demand and sigma.'
+        sigma = np.broadcast_to(np.asarray(sigma, dtype=float),
+                                (nb_buildings,))
+        chp_target = (np.atleast_2d(np.asarray(p_demand, dtype=float)) /
+                      np.where(sigma > 0, sigma, 1)[:, np.newaxis])
+        chp_target[sigma <= 0] = 0
+
+    #  Storage parameters (one value per building)
+    capacity = np.broadcast_to(np.asarray(tes_capacity, dtype=float) *
+                               c_water, (nb_buildings,))
+    has_tes = capacity > 0
+    safe_capacity = np.where(has_tes, capacity, 1)
+    t_max = np.broadcast_to(np.asarray(t_max, dtype=float), (nb_buildings,))
+    t_min = _broadcast(t_min, shape)
+    t_surroundings = np.broadcast_to(np.asarray(t_surroundings, dtype=float),
+                                     (nb_buildings,))
+    k_losses = np.where(has_tes,
+                        np.broadcast_to(np.asarray(k_losses, dtype=float),
+                                        (nb_buildings,)),
+                        0)
+    temperature = np.array(np.broadcast_to(np.asarray(t_init, dtype=float),
+                                           (nb_buildings,)))
+
+    #  Initialize results
+    q_output = {kind: np.zeros(shape) for kind in kinds}
+    t_sto = np.zeros(shape)
+    q_unmet = np.zeros(shape)
+
+    for t in range(timesteps):
+        losses = k_losses * (temperature - t_surroundings)
+
+        #  Heat that can be stored in or drawn from the storage
+        q_charge_max = np.maximum(capacity * (t_max - temperature) / dt +
+                                  losses, 0)
+        q_discharge_max = np.maximum(capacity *
+                                     (temperature - t_min[:, t]) / dt -
+                                     losses, 0)
+
+        residual = q_demand[:, t].copy()
+        surplus = np.zeros(nb_buildings)
+        q_discharge = None
+
+        for kind in kinds:
+            is_base_load = kind in base_load_generators
+
+            if not is_base_load and q_discharge is None:
+                #  Discharge the storage before using peak load units
+                q_discharge = np.minimum(residual, q_discharge_max)
+                residual -= q_discharge
+
+            #  Storage capacity that is still available for surplus heat
+            headroom = residual + q_charge_max - surplus
+
+            if kind == "chp" and strategy == "electricity":
+                target = np.maximum(chp_target[:, t], 0)
+            else:
+                target = residual
+
+            q_max_t = q_upper[kind][:, t]
+            q_min_t = q_lower[kind][:, t]
+            q = np.minimum(target, q_max_t)
+            if is_base_load:
+                q = np.minimum(q, headroom)
+            part_load = (q > 0) & (q < q_min_t)
+            fits = q_min_t <= headroom
+            if is_base_load:
+                q = np.where(part_load, np.where(fits, q_min_t, 0), q)
+            else:
+                q = np.where(part_load & fits, q_min_t, q)
+
+            q_output[kind][:, t] = q
+            surplus += np.maximum(q - residual, 0)
+            residual = np.maximum(residual - q, 0)
+
+        if q_discharge is None:
+            q_discharge = np.minimum(residual, q_discharge_max)
+            residual -= q_discharge
+
+        #  Update the storage temperature
+        q_net = surplus - q_discharge - losses
+        temperature = np.where(has_tes,
+                               np.minimum(temperature +
+                                          q_net * dt / safe_capacity,
+                                          np.maximum(t_max, temperature)),
+                               temperature)
+
+        t_sto[:, t] = temperature
+        q_unmet[:, t] = residual
+
+    return (q_output, t_sto, q_unmet)
+
+
+def dispatch_bes(bes_units, q_demand, p_demand=None, t_flow=55,
+                 strategy="heat", save_results=True):
+    """
+    Compute the rule-based dispatch of many building energy systems for the
+    current horizon.
+
+    Only the first unit of each kind (CHP unit, heat pump, boiler,
+    electrical heater and thermal storage) of each BES is considered.
+
+    Parameters
+    ----------
+    bes_units : list
+        List of BES objects. All BES have to share the same timer.
+    q_demand : array-like
+        Heat demand in W (buildings x timesteps_horizon)
+    p_demand : array-like, optional
+        Electrical demand in W (buildings x timesteps_horizon). Required for
+        electricity-led operation (default: None).
+    t_flow : float or array-like, optional
+        Required flow temperature in °C (default: 55). Either a scalar, one
+        value per building or an array (buildings x timesteps_horizon).
+        The heat pumps' nominal values are evaluated at this temperature,
+        and the storages can only be discharged down to it.
+    strategy : str, optional
+        - ``"heat"`` : heat-led operation (default)
+        - ``"electricity"`` : electricity-led operation of the CHP units
+    save_results : bool, optional
+        Save the results with the devices' setResults methods
+        (default: True)
+
+    Returns
+    -------
+    results : dict
+        Arrays (buildings x timesteps_horizon) with the keys:
+
+        - ``"q_<kind>"`` : heat output in W of each kind of generator
+        - ``"schedule_<kind>"`` : operational schedule of each kind
+        - ``"p_chp"`` : electricity output of the CHP units in W
+        - ``"p_heatpump"`` : electricity consumption of the heat pumps in W
+        - ``"p_electricalheater"`` : electricity consumption of the
+          electrical heaters in W
+        - ``"fuel"`` : fuel consumption of boilers and CHP units in W
+        - ``"p_consumption"`` : total electricity consumption in W
+        - ``"t_sto"`` : storage temperature in °C
+        - ``"q_unmet"`` : uncovered heat demand in W
+
+    Examples
+    --------
+    >>> results = dispatch_bes([myBes1, myBes2], q_demand)
+    >>> results["q_boiler"].shape
+    (2, 96)
+    """
+    bes_units = list(bes_units)
+    timer = bes_units[0].environment.timer
+    time_discretization = timer.time_discretization
+    timesteps = timer.timesteps_horizon
+    nb_buildings = len(bes_units)
+    shape = (nb_buildings, timesteps)
+
+    q_demand = np.atleast_2d(np.asarray(q_demand, dtype=float))
+    assert q_demand.shape == shape, ('q_demand must have the shape ' +
+                                     str(shape))
+    t_flow = _broadcast(t_flow, shape)
+
+    #  Collect device parameters
+    q_max = {kind: np.zeros(shape) for kind in generators}
+    q_min = {kind: np.zeros(shape) for kind in generators}
+    sigma = np.zeros(nb_buildings)
+    omega = np.ones(nb_buildings)
+    cop = np.ones(shape)
+    eta_boiler = np.ones(nb_buildings)
+    eta_heater = np.ones(nb_buildings)
+    tes_capacity = np.zeros(nb_buildings)
+    t_init = np.zeros(nb_buildings)
+    t_max = np.zeros(nb_buildings)
+    t_surroundings = np.zeros(nb_buildings)
+    k_losses = np.zeros(nb_buildings)
+
+    for (i, bes) in enumerate(bes_units):
+        if bes.has_chp:
+            chp = bes.chp_units[0]
+            q_max["chp"][i] = chp.q_nominal
+            q_min["chp"][i] = chp.q_nominal * chp.lower_activation_limit
+            sigma[i] = chp.sigma
+            omega[i] = chp.omega
+
+        if bes.has_heatpump:
+            heatpump = bes.heatpumps[0]
+            (p_nominal, q_nominal, t_max_hp, lal) = \
+                heatpump.getNominalValues(t_flow[i])
+            q_max["heatpump"][i] = q_nominal
+            q_min["heatpump"][i] = q_nominal * lal
+            cop[i] = np.where(p_nominal > 0,
+                              q_nominal / np.where(p_nominal > 0,
+                                                   p_nominal, 1),
+                              1)
+
+        if bes.has_boiler:
+            boiler = bes.boilers[0]
+            q_max["boiler"][i] = boiler.q_nominal
+            q_min["boiler"][i] = (boiler.q_nominal *
+                                  boiler.lower_activation_limit)
+            eta_boiler[i] = boiler.eta
+
+        if bes.has_electrical_heater:
+            heater = bes.electrical_heaters[0]
+            q_max["electricalheater"][i] = heater.q_nominal
+            q_min["electricalheater"][i] = (heater.q_nominal *
+                                            heater.lower_activation_limit)
+            eta_heater[i] = heater.eta
+
+        if bes.has_tes:
+            tes = bes.tes_units[0]
+            tes_capacity[i] = tes.capacity
+            t_init[i] = tes.t_init
+            t_max[i] = tes.t_max
+            t_surroundings[i] = tes.t_surroundings
+            k_losses[i] = tes.k_losses
+
+    (q_output, t_sto, q_unmet) = dispatch_heat(
+        q_demand, q_max, q_min, time_discretization,
+        tes_capacity=tes_capacity, t_init=t_init, t_max=t_max, t_min=t_flow,
+        t_surroundings=t_surroundings, k_losses=k_losses, strategy=strategy,
+        p_demand=p_demand, sigma=sigma)
+
+    results = {}
+    for kind in generators:
+        results["q_" + kind] = q_output[kind]
+        results["schedule_" + kind] = (q_output[kind] > 0).astype(float)
+    results["p_chp"] = q_output["chp"] * sigma[:, np.newaxis]
+    results["p_heatpump"] = q_output["heatpump"] / cop
+    results["p_electricalheater"] = (q_output["electricalheater"] /
+                                     eta_heater[:, np.newaxis])
+    results["fuel"] = (q_output["boiler"] / eta_boiler[:, np.newaxis] +
+                       (q_output["chp"] + results["p_chp"]) /
+                       omega[:, np.newaxis])
+    results["p_consumption"] = (results["p_heatpump"] +
+                                results["p_electricalheater"])
+    results["t_sto"] = t_sto
+    results["q_unmet"] = q_unmet
+
+    if save_results:
+        for (i, bes) in enumerate(bes_units):
+            if bes.has_chp:
+                bes.chp_units[0].setResults(results["p_chp"][i],
+                                            results["q_chp"][i],
+                                            results["schedule_chp"][i])
+            if bes.has_heatpump:
+                bes.heatpumps[0].setResults(results["p_heatpump"][i],
+                                            results["q_heatpump"][i],
+                                            results["schedule_heatpump"][i])
+            if bes.has_boiler:
+                bes.boilers[0].setResults(results["q_boiler"][i],
+                                          results["schedule_boiler"][i])
+            if bes.has_electrical_heater:
+                bes.electrical_heaters[0].setResults(
+                    results["p_electricalheater"][i],
+                    results["q_electricalheater"][i],
+                    results["schedule_electricalheater"][i])
+            if bes.has_tes:
+                bes.tes_units[0].setResults(t_sto[i])
+
+    return results
@@ -0,0 +1,442 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Columnar file format for CityDistrict objects.
+
+A district is stored in a folder:
+
+- ``metadata.pkl``: Format version, array stacks and index of all entities
+- ``environment.pkl``: Timer, weather and prices
+- ``district.pkl``: Graph topology and node attributes (without entities)
+- ``entities.pkl``: Pickled node entities (e.g. buildings), one after another
+- ``arrays/``: Time series, one stack (rows x shape) per dtype and shape
+
+All numeric arrays with at least ``min_size`` entries (load curves, weather
+data, device results) are written to the array stacks instead of the
+pickles. Arrays shared by several objects are stored once. Uncompressed
+stacks are memory mapped on loading, so only the pages of the data that is
+actually read are loaded from disk.
+"""
+
+from __future__ import division
+
+import io
+import os
+import pickle
+import numpy as np
+
+
+#  Version of the file format
+format_version = 1
+
+#  Demand types and the corresponding apartment attribute and profile
+#  attribute (see DistrictStore.load_profiles)
+profile_attributes = {'el': ('power_el', 'loadcurve'),
+                      'sh': ('demand_space_heating', 'loadcurve'),
+                      'sc': ('demand_space_cooling', 'loadcurve'),
+                      'dhw': ('demand_domestic_hot_water', 'loadcurve'),
+                      'occupancy': ('occupancy', 'occupancy')}
+
+_environment_attributes = ('timer', 'weather', 'prices')
+
+
+def _get_stack_key(array):
+    """
+    Return the name of the stack, which holds arrays of the same dtype and
+    shape as array.
+    """
+    return '_'.join([array.dtype.name] + [str(size) for size in array.shape])
+
+
+class _StackWriter(object):
+    """
+    Append arrays to raw stack files.
+    """
+
+    def __init__(self, path, min_size):
+        self.path = path
+        self.min_size = min_size
+        #  Stack key as key and [dtype name, shape, number of rows] as value
+        self.stacks = {}
+        self._files = {}
+        #  id(array) as key and (stack key, row) as value
+        self._refs = {}
+        #  Keeps the written arrays alive (their ids are used as keys)
+        self._arrays = []
+
+    def is_stored(self, obj):
+        return (isinstance(obj, np.ndarray) and obj.dtype.kind in 'biufc' and
+                obj.size >= self.min_size)
+
+    def add(self, array):
+        """
+        Write array to its stack (unless it has been written before) and
+        return the tuple (stack key, row).
+        """
+        if id(array) in self._refs:
+            return self._refs[id(array)]
+
+        data = np.ascontiguousarray(array,
+                                    dtype=array.dtype.newbyteorder('='))
+        key = _get_stack_key(data)
+        if key not in self.stacks:
+            self.stacks[key] = [data.dtype.name, data.shape, 0]
+            self._files[key] = open(os.path.join(self.path, key + '.bin'),
+                                    'wb')
+        self._files[key].write(data.tobytes())
+
+        ref = (key, self.stacks[key][2])
+        self.stacks[key][2] += 1
+        self._refs[id(array)] = ref
+        self._arrays.append(array)
+        return ref
+
+    def get_ref(self, array):
+        return self._refs.get(id(array))
+
+    def close(self, compress=False):
+        """
+        Close all stack files. If compress is True, the raw stacks are
+        replaced by compressed .npz files.
+        """
+        for stack_file in self._files.values():
+            stack_file.close()
+        self._files = {}
+
+        if compress:
+            for (key, (dtype, shape, nb_rows)) in self.stacks.items():
+                raw_path = os.path.join(self.path, key + '.bin')
+                stack = np.fromfile(raw_path, dtype=dtype).reshape(
+                    (nb_rows,) + tuple(shape))
+                np.savez_compressed(os.path.join(self.path, key + '.npz'),
+                                    stack=stack)
+                del stack
+                os.remove(raw_path)
+
+
+class _DistrictPickler(pickle.Pickler):
+    """
+    Pickler, which replaces large arrays by references into the array stacks,
+    the environment by tokens and (optionally) node entities by node ids.
+    """
+
+    def __init__(self, file, writer, environment, entities=None):
+        pickle.Pickler.__init__(self, file, pickle.HIGHEST_PROTOCOL)
+        self.writer = writer
+        self.shared_objects = {}
+        if environment is not None:
+            self.shared_objects[id(environment)] = ('environment', None)
+            for name in _environment_attributes:
+                self.shared_objects[id(getattr(environment, name))] = \
+                    ('environment', name)
+        if entities is not None:
+            for (n, entity) in entities.items():
+                self.shared_objects[id(entity)] = ('entity', n)
+
+    def persistent_id(self, obj):
+        pid = self.shared_objects.get(id(obj))
+        if pid is not None:
+            return pid
+        if self.writer.is_stored(obj):
+            return ('array',) + self.writer.add(obj)
+        return None
+
+
+class _DistrictUnpickler(pickle.Unpickler):
+    """
+    Unpickler, which resolves the references of _DistrictPickler.
+    """
+
+    def __init__(self, file, store):
+        pickle.Unpickler.__init__(self, file)
+        self.store = store
+
+    def persistent_load(self, pid):
+        if pid[0] == 'array':
+            return self.store.get_array(pid[1], pid[2])
+        elif pid[0] == 'environment':
+            environment = self.store.load_environment()
+            if pid[1] is None:
+                return environment
+            return getattr(environment, pid[1])
+        elif pid[0] == 'entity':
+            return self.store.load_entity(pid[1])
+        raise pickle.UnpicklingError('Unknown persistent id ' + str(pid))
+
+
+def _dump(obj, writer, environment, entities=None):
+    buffer = io.BytesIO()
+    _DistrictPickler(buffer, writer, environment, entities).dump(obj)
+    return buffer.getvalue()
+
+
+def save_city_district(city_district, path, compress=False, min_size=100):
+    """
+    Save a city district in the columnar file format.
+
+    Parameters
+    ----------
+    city_district : CityDistrict object
+        City district, which should be saved
+    path : str
+        Output folder (is created, if it does not exist). Existing files of
+        a previously saved district are overwritten.
+    compress : bool, optional
+        Compress the array stacks (default: False). Compressed stacks need
+        less disk space, but cannot be memory mapped. They are decompressed
+        completely on first access.
+    min_size : int, optional
+        Minimum number of entries of arrays, which are stored in the array
+        stacks (default: 100). Smaller arrays are pickled.
+    """
+    array_path = os.path.join(path, 'arrays')
+    if not os.path.exists(array_path):
+        os.makedirs(array_path)
+    for filename in os.listdir(array_path):
+        os.remove(os.path.join(array_path, filename))
+
+    writer = _StackWriter(array_path, min_size)
+    environment = city_district.environment
+
+    try:
+        #  Environment
+        with open(os.path.join(path, 'environment.pkl'), 'wb') as env_file:
+            env_file.write(_dump(environment, writer, None))
+
+        #  Entities (one pickle per node)
+        entities = {}
+        entity_index = {}
+        profiles = {}
+        with open(os.path.join(path, 'entities.pkl'), 'wb') as entity_file:
+            for n in city_district.nodes():
+                entity = city_district.nodes[n].get('entity')
+                if entity is None:
+                    continue
+                data = _dump(entity, writer, environment)
+                entity_index[n] = (entity_file.tell(), len(data),
+                                   entity.kind)
+                entity_file.write(data)
+                entities[n] = entity
+                profiles[n] = _get_profile_refs(entity, writer)
+
+        #  Topology and node attributes (entities are replaced by node ids)
+        with open(os.path.join(path, 'district.pkl'), 'wb') as district_file:
+            district_file.write(_dump(city_district, writer, environment,
+                                      entities))
+    finally:
+        writer.close(compress=compress)
+
+    metadata = {'format_version': format_version,
+                'compress': compress,
+                'stacks': writer.stacks,
+                'entities': entity_index,
+                'profiles': profiles}
+    with open(os.path.join(path, 'metadata.pkl'), 'wb') as metadata_file:
+        pickle.dump(metadata, metadata_file, pickle.HIGHEST_PROTOCOL)
+
+
+def _get_profile_refs(entity, writer):
+    """
+    Return the stack references of the demand profiles of all apartments of
+    a building (demand type as key and list of (stack key, row, scale) as
+    value). Deferred profiles (see the ``lazy`` argument of the demand
+    classes) are not generated; they are stored with their generator inputs
+    and have no references.
+    """
+    refs = {}
+    for apartment in getattr(entity, 'apartments', []):
+        for (demand_type, (attribute, profile_attribute)) in \
+                profile_attributes.items():
+            demand = getattr(apartment, attribute, None)
+            if getattr(demand, 'is_pending', False):
+                continue
+            if hasattr(demand, 'get_base_profile'):
+                #  Loads with shared base profiles
+                (profile, scale) = demand.get_base_profile()
+            else:
+                (profile, scale) = (getattr(demand, profile_attribute, None),
+                                    1)
+            ref = writer.get_ref(profile)
+            if ref is not None:
+                refs.setdefault(demand_type, []).append(ref + (scale,))
+    return refs
+
+
+def load_city_district(path, mmap_mode='c'):
+    """
+    Load a city district, which has been saved with save_city_district.
+
+    Parameters
+    ----------
+    path : str
+        Folder of the saved district
+    mmap_mode : str, optional
+        Mode of the memory mapped array stacks (default: 'c'):
+        'c' - Copy-on-write (changes are kept in memory only)
+        'r' - Read-only
+        None - Load the stacks into memory
+
+    Returns
+    -------
+    city_district : CityDistrict object
+    """
+    return DistrictStore(path, mmap_mode=mmap_mode).load_city_district()
+
+
+class DistrictStore(object):
+    """
+    Access to a city district saved with save_city_district.
+
+    Entities and array stacks are loaded on first access and cached, so
+    single buildings or demand profiles can be read without loading the
+    whole district.
+    """
+
+    def __init__(self, path, mmap_mode='c'):
+        """
+        Parameters
+        ----------
+        path : str
+            Folder of the saved district
+        mmap_mode : str, optional
+            Mode of the memory mapped array stacks (default: 'c'):
+            'c' - Copy-on-write (changes are kept in memory only)
+            'r' - Read-only
+            None - Load the stacks into memory
+        """
+        self._kind = 'districtstore'
+
+        assert mmap_mode in ('c', 'r', None), ('Unknown mmap_mode ' +
+                                               str(mmap_mode))
+        self.path = path
+        self.mmap_mode = mmap_mode
+
+        with open(os.path.join(path, 'metadata.pkl'), 'rb') as metadata_file:
+            self.metadata = pickle.load(metadata_file)
+        assert self.metadata['format_version'] <= format_version, \
+            'District has been saved with a newer version of pycity_base'
+
+        self._stacks = {}
+        self._entities = {}
+        self._environment = None
+
+    @property
+    def kind(self):
+        return self._kind
+
+    @property
+    def nodes(self):
+        """
+        Return the ids of all nodes with entities (in order of the saved
+        district).
+        """
+        return list(self.metadata['entities'])
+
+    def get_entity_kind(self, n):
+        """
+        Return the kind of the entity of node n (e.g. 'building') without
+        loading it.
+        """
+        return self.metadata['entities'][n][2]
+
+    def get_stack(self, key):
+        """
+        Return an array stack (rows x shape).
+        """
+        if key not in self._stacks:
+            (dtype, shape, nb_rows) = self.metadata['stacks'][key]
+            stack_path = os.path.join(self.path, 'arrays', key)
+            if self.metadata['compress']:
+                with np.load(stack_path + '.npz') as stack_file:
+                    stack = stack_file['stack']
+            elif nb_rows == 0:  # pragma: no cover
+                stack = np.zeros((0,) + tuple(shape), dtype=dtype)
+            elif self.mmap_mode is None:
+                stack = np.fromfile(stack_path + '.bin', dtype=dtype).reshape(
+                    (nb_rows,) + tuple(shape))
+            else:
+                stack = np.memmap(stack_path + '.bin', dtype=dtype,
+                                  mode=self.mmap_mode,
+                                  shape=(nb_rows,) + tuple(shape))
+            self._stacks[key] = stack
+        return self._stacks[key]
+
+    def get_array(self, key, row):
+        """
+        Return one row of an array stack (without copying).
+        """
+        return np.asarray(self.get_stack(key)[row])
+
+    def _load(self, filename, offset=0, length=-1):
+        with open(os.path.join(self.path, filename), 'rb') as data_file:
+            data_file.seek(offset)
+            data = data_file.read(length)
+        return _DistrictUnpickler(io.BytesIO(data), self).load()
+
+    def load_environment(self):
+        """
+        Return the environment of the district.
+        """
+        if self._environment is None:
+            self._environment = self._load('environment.pkl')
+        return self._environment
+
+    def load_entity(self, n):
+        """
+        Return the entity (e.g. building) of node n.
+
+        Parameters
+        ----------
+        n : int
+            Node id
+
+        Returns
+        -------
+        entity : object
+            Entity object, which refers to the store's environment
+        """
+        if n not in self._entities:
+            (offset, length, kind) = self.metadata['entities'][n]
+            self._entities[n] = self._load('entities.pkl', offset, length)
+        return self._entities[n]
+
+    def load_profiles(self, n, demand_type):
+        """
+        Return the profiles of one demand type of all apartments of the
+        building of node n without loading the building.
+
+        Parameters
+        ----------
+        n : int
+            Node id
+        demand_type : str
+            'el' - Electrical demand
+            'sh' - Space heating demand
+            'sc' - Space cooling demand
+            'dhw' - Domestic hot water demand
+            'occupancy' - Occupancy profile
+
+        Returns
+        -------
+        profiles : list (of np.arrays)
+            One profile per apartment (without copying, unless the profile
+            is a scaled shared base profile). Profiles, which are smaller
+            than the store's min_size or have not been generated yet, are not
+            included.
+        """
+        assert demand_type in profile_attributes, ('Unknown demand type ' +
+                                                   str(demand_type))
+        refs = self.metadata['profiles'].get(n, {}).get(demand_type, [])
+        profiles = []
+        for (key, row, scale) in refs:
+            profile = self.get_array(key, row)
+            if scale != 1:
+                profile = profile * scale
+            profiles.append(profile)
+        return profiles
+
+    def load_city_district(self):
+        """
+        Return the complete city district.
+        """
+        return self._load('district.pkl')
@@ -0,0 +1,324 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Forecast-error ensembles for weather and demand forecasts.
+
+Every member of an ensemble is the forecast of the current horizon with a
+random forecast error. The errors are realizations of a stationary,
+autoregressive process of first order (AR(1)), which is scaled with a
+standard deviation depending on the lead time. All members are generated
+at once: the standard normal noise (members x horizon) is multiplied with
+the (lower triangular) Cholesky factor of the AR(1) correlation matrix.
+
+The random numbers depend only on the seed, the current timestep and the
+quantity. Ensembles are thus reproducible regardless of the order of the
+calls.
+"""
+
+from __future__ import division
+
+import zlib
+import numpy as np
+
+
+class ForecastErrorModel(object):
+    """
+    Forecast error of one quantity.
+    """
+
+    def __init__(self, sigma, correlation_time=6.0, relative=False,
+                 lower=None, upper=None):
+        """
+        Parameters
+        ----------
+        sigma : float, array-like or function
+            Standard deviation of the forecast error. Absolute (in the unit
+            of the quantity) or relative to the forecast (see relative).
+            float - Constant standard deviation
+            array-like - Standard deviation per timestep of the horizon
+            function - Function of the lead time in hours (array), which
+            returns the standard deviations
+        correlation_time : float, optional
+            Correlation time of the errors in hours (default: 6.0). The
+            correlation of two errors with a distance of dt hours is
+            exp(-dt / correlation_time).
+        relative : bool, optional
+            Defines, if the error is relative to the forecast (default:
+            False). Relative errors keep zero values (e.g. radiation at
+            night) unchanged.
+        lower : float, optional
+            Lower bound of the perturbed forecasts (default: None)
+        upper : float, optional
+            Upper bound of the perturbed forecasts (default: None)
+        """
+        assert correlation_time >= 0, 'correlation_time has to be >= 0.'
+        self._kind = "forecasterrormodel"
+        self.sigma = sigma
+        self.correlation_time = correlation_time
+        self.relative = relative
+        self.lower = lower
+        self.upper = upper
+
+    @property
+    def kind(self):
+        return self._kind
+
+    def get_sigma(self, lead_times):
+        """
+        Return the standard deviation per timestep of the horizon.
+
+        Parameters
+        ----------
+        lead_times : np.array
+            Lead time of every timestep in hours
+        """
+        if callable(self.sigma):
+            sigma = self.sigma(lead_times)
+        else:
+            sigma = self.sigma
+        sigma = np.broadcast_to(np.asarray(sigma, dtype=np.float64),
+                                lead_times.shape)
+        assert np.all(sigma >= 0), 'sigma has to be non-negative.'
+        return sigma
+
+    def get_phi(self, time_discretization):
+        """
+        Return the AR(1) coefficient for the given time discretization in s.
+        """
+        if self.correlation_time == 0:
+            return 0.0
+        return np.exp(-time_discretization / 3600 / self.correlation_time)
+
+
+#  Rough default error models (standard deviation growing with the lead
+#  time). Calibrate them with measured forecast errors for applications.
+default_error_models = {
+    't_ambient': ForecastErrorModel(
+        lambda h: np.minimum(0.5 + 0.05 * h, 3.0), correlation_time=12.0),
+    'q_direct': ForecastErrorModel(
+        lambda h: np.minimum(0.15 + 0.01 * h, 0.6), correlation_time=4.0,
+        relative=True, lower=0.0),
+    'q_diffuse': ForecastErrorModel(
+        lambda h: np.minimum(0.1 + 0.005 * h, 0.4), correlation_time=4.0,
+        relative=True, lower=0.0),
+    'v_wind': ForecastErrorModel(
+        lambda h: np.minimum(0.1 + 0.01 * h, 0.5), correlation_time=6.0,
+        relative=True, lower=0.0),
+    'phi_ambient': ForecastErrorModel(
+        lambda h: np.minimum(3.0 + 0.2 * h, 15.0), correlation_time=12.0,
+        lower=0.0, upper=100.0),
+    'p_ambient': ForecastErrorModel(
+        lambda h: np.minimum(0.5 + 0.05 * h, 3.0), correlation_time=24.0),
+    'pv': ForecastErrorModel(
+        lambda h: np.minimum(0.15 + 0.01 * h, 0.6), correlation_time=4.0,
+        relative=True, lower=0.0),
+    'wind': ForecastErrorModel(
+        lambda h: np.minimum(0.2 + 0.02 * h, 0.8), correlation_time=6.0,
+        relative=True, lower=0.0),
+    'el': ForecastErrorModel(0.1, correlation_time=2.0, relative=True,
+                             lower=0.0),
+    'sh': ForecastErrorModel(
+        lambda h: np.minimum(0.05 + 0.005 * h, 0.3), correlation_time=12.0,
+        relative=True, lower=0.0),
+    'sc': ForecastErrorModel(
+        lambda h: np.minimum(0.05 + 0.005 * h, 0.3), correlation_time=12.0,
+        relative=True, lower=0.0),
+    'dhw': ForecastErrorModel(0.2, correlation_time=1.0, relative=True,
+                              lower=0.0)}
+
+
+class ForecastEnsemble(object):
+    """
+    Generator of forecast-error ensembles.
+
+    Examples
+    --------
+    >>> ensemble = ForecastEnsemble(environment.timer, seed=0)
+    >>> (t_ambient,) = environment.weather.getWeatherForecast(getTAmbient=True)
+    >>> members = ensemble.generate(t_ambient, 't_ambient', 50)
+    >>> members.shape
+    (50, 192)
+    """
+
+    def __init__(self, timer, error_models=None, seed=None):
+        """
+        Parameters
+        ----------
+        timer : Timer object
+            Common timer (time discretization and current timestep)
+        error_models : dict, optional
+            Quantity as key and ForecastErrorModel as value (default: None).
+            Given models replace the models of default_error_models.
+        seed : int, optional
+            Seed of the random numbers (default: None). If None, the
+            ensembles are not reproducible.
+        """
+        self._kind = "forecastensemble"
+        self.timer = timer
+        self.error_models = dict(default_error_models)
+        if error_models is not None:
+            self.error_models.update(error_models)
+        self.seed = seed
+
+        #  (phi, horizon) as key and Cholesky factor as value
+        self._factors = {}
+
+    @property
+    def kind(self):
+        return self._kind
+
+    def _get_factor(self, phi, horizon):
+        """
+        Return the Cholesky factor of the AR(1) correlation matrix.
+
+        The factor is known analytically:
+        L[i, j] = phi ** (i - j) * c[j] for i >= j, with c[0] = 1 and
+        c[j] = sqrt(1 - phi ** 2) for j >= 1.
+        """
+        key = (phi, horizon)
+        factor = self._factors.get(key)
+        if factor is None:
+            lags = np.subtract.outer(np.arange(horizon), np.arange(horizon))
+            factor = np.where(lags >= 0, phi ** np.maximum(lags, 0), 0.0)
+            factor[:, 1:] *= np.sqrt(1 - phi ** 2)
+            factor.flags.writeable = False
+            self._factors[key] = factor
+        return factor
+
+    def _get_rng(self, quantity):
+        """
+        Return the random number generator of a quantity in the current
+        timestep.
+        """
+        if self.seed is None:
+            return np.random.default_rng()
+        return np.random.default_rng(
+            [self.seed, self.timer.current_timestep,
+             zlib.crc32(str(quantity).encode('utf-8'))])
+
+    def get_errors(self, quantity, nb_members, horizon, shape=()):
+        """
+        Return standardized (sigma == 1 for all lead times) AR(1) errors.
+
+        Parameters
+        ----------
+        quantity : str
+            Quantity (key of the error models)
+        nb_members : int
+            Number of ensemble members
+        horizon : int
+            Number of timesteps
+        shape : tuple, optional
+            Shape of independent series per member (default: ()), e.g.
+            (nb_buildings,)
+
+        Returns
+        -------
+        errors : np.array
+            Errors with shape (nb_members,) + shape + (horizon,)
+        """
+        model = self.error_models[quantity]
+        phi = model.get_phi(self.timer.time_discretization)
+        noise = self._get_rng(quantity).standard_normal(
+            (nb_members,) + tuple(shape) + (horizon,))
+        return np.matmul(noise, self._get_factor(phi, horizon).T)
+
+    def generate(self, forecast, quantity, nb_members):
+        """
+        Generate an ensemble of perturbed forecasts.
+
+        Parameters
+        ----------
+        forecast : array-like
+            Forecast of the current horizon (last axis: timesteps), e.g. a
+            weather forecast or a demand matrix (buildings x timesteps)
+        quantity : str
+            Quantity (key of the error models, e.g. 't_ambient' or 'el')
+        nb_members : int
+            Number of ensemble members
+
+        Returns
+        -------
+        members : np.array
+            Perturbed forecasts with shape (nb_members,) + forecast.shape
+        """
+        assert quantity in self.error_models, ('No error model for ' +
+                                               str(quantity))
+        assert nb_members >= 1, 'nb_members has to be at least 1.'
+        model = self.error_models[quantity]
+        forecast = np.asarray(forecast, dtype=np.float64)
+        horizon = forecast.shape[-1]
+
+        lead_times = (np.arange(1, horizon + 1) *
+                      self.timer.time_discretization / 3600)
+        errors = self.get_errors(quantity, nb_members, horizon,
+                                 shape=forecast.shape[:-1])
+        errors *= model.get_sigma(lead_times)
+
+        if model.relative:
+            members = forecast * (1 + errors)
+        else:
+            members = forecast + errors
+        if model.lower is not None or model.upper is not None:
+            np.clip(members, model.lower, model.upper, out=members)
+        return members
+
+    def generate_all(self, forecasts, nb_members):
+        """
+        Generate ensembles of several quantities.
+
+        Parameters
+        ----------
+        forecasts : dict
+            Quantity as key and forecast as value. Nested dicts (e.g. the
+            'weather' entry of pycity_base.functions.rolling_horizon.
+            get_forecast) are processed recursively. Quantities without
+            error model are skipped.
+        nb_members : int
+            Number of ensemble members
+
+        Returns
+        -------
+        ensembles : dict
+            Quantity as key and ensemble (see generate) as value
+        """
+        ensembles = {}
+        for (quantity, forecast) in forecasts.items():
+            if isinstance(forecast, dict):
+                ensembles[quantity] = self.generate_all(forecast, nb_members)
+            elif quantity in self.error_models:
+                ensembles[quantity] = self.generate(forecast, quantity,
+                                                    nb_members)
+        return ensembles
+
+    def generate_weather(self, weather, nb_members,
+                         quantities=('t_ambient', 'q_direct', 'q_diffuse',
+                                     'v_wind')):
+        """
+        Generate ensembles of the weather forecast of the current horizon.
+
+        Parameters
+        ----------
+        weather : Weather object
+        nb_members : int
+            Number of ensemble members
+        quantities : tuple of str, optional
+            Weather quantities (default: ('t_ambient', 'q_direct',
+            'q_diffuse', 'v_wind'))
+
+        Returns
+        -------
+        ensembles : dict
+            Quantity as key and ensemble (nb_members x horizon) as value
+        """
+        flags = {'t_ambient': 'getTAmbient', 'q_direct': 'getQDirect',
+                 'q_diffuse': 'getQDiffuse', 'v_wind': 'getVWind',
+                 'phi_ambient': 'getPhiAmbient', 'p_ambient': 'getPAmbient'}
+        ensembles = {}
+        for quantity in quantities:
+            assert quantity in flags, 'Unknown quantity ' + str(quantity)
+            (forecast,) = weather.getWeatherForecast(
+                currentValues=True, **{flags[quantity]: True})
+            ensembles[quantity] = self.generate(forecast, quantity,
+                                                nb_members)
+        return ensembles
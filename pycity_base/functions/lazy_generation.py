@@ -0,0 +1,333 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Batch generation of deferred demand profiles.
+
+Demand objects created with ``lazy=True`` (ElectricalDemand,
+DomesticHotWater, SpaceHeating and Occupancy) record their inputs and
+generate their profiles on first access. The functions of this module find
+all pending objects of a city district, building or apartment and generate
+them in one batch.
+
+Pending objects are grouped by kind, method and profile type. Objects with
+standardized profiles (e.g. SLPs or Annex 42 hot water profiles) share one
+base profile per group (see pycity_base.classes.demand.load.
+get_shared_profile), which is generated once. Objects with individual
+profiles (stochastic or simulated) can be generated by worker processes.
+Each object may carry its own seed (see assign_seeds), so the profiles do
+not depend on the order or the process of generation.
+"""
+
+from __future__ import division
+
+import io
+import os
+import random
+import pickle
+import contextlib
+import collections
+import concurrent.futures
+
+import numpy as np
+
+
+#  Apartment attributes, which may hold demand objects
+apartment_attributes = ('occupancy', 'power_el', 'demand_domestic_hot_water',
+                        'demand_space_heating', 'demand_space_cooling')
+
+#  Kind and method of demand objects with individual (stochastic or
+#  simulated) profiles. These objects are generated by worker processes.
+individual_profiles = (('occupancy', None), ('electricaldemand', 2),
+                       ('domestichotwater', 2), ('spaceheating', 2))
+
+
+@contextlib.contextmanager
+def seeded_random(seed):
+    """
+    Seed the global random number generators (numpy and random) within the
+    context and restore their previous states afterwards. Nothing is done,
+    if seed is None.
+    """
+    if seed is None:
+        yield
+        return
+    states = (np.random.get_state(), random.getstate())
+    np.random.seed(seed)
+    random.seed(seed)
+    try:
+        yield
+    finally:
+        np.random.set_state(states[0])
+        random.setstate(states[1])
+
+
+def _get_apartments(entity):
+    """
+    Return all apartments of a city district, building or apartment.
+    """
+    kind = getattr(entity, 'kind', None)
+    if kind == 'apartment':
+        return [entity]
+    elif kind == 'building':
+        return list(entity.apartments)
+    elif kind == 'citydistrict':
+        apartments = []
+        for n in entity.get_list_build_entity_node_ids():
+            apartments.extend(_get_apartments(entity.nodes[n]['entity']))
+        return apartments
+    return []
+
+
+def get_pending_objects(entity):
+    """
+    Return all demand objects with deferred profiles.
+
+    Parameters
+    ----------
+    entity : object
+        CityDistrict, Building or Apartment object
+
+    Returns
+    -------
+    pending_objects : list
+        Demand objects, which have not generated their profiles yet.
+        Occupancy objects come first (other profiles might depend on them),
+        followed by the other objects grouped by kind and method.
+    """
+    pending = {}
+    for apartment in _get_apartments(entity):
+        for attribute in apartment_attributes:
+            demand = getattr(apartment, attribute, None)
+            if getattr(demand, 'is_pending', False):
+                pending[id(demand)] = demand
+
+    def sort_key(demand):
+        return (demand.kind != 'occupancy', demand.kind,
+                getattr(demand, 'method', 0))
+
+    return sorted(pending.values(), key=sort_key)
+
+
+def assign_seeds(entity, seed):
+    """
+    Record a seed for every demand object with deferred profile.
+
+    The seed of an object is derived from ``seed`` and the position of the
+    object in get_pending_objects(entity). The object seeds the global
+    random number generators with it, when its profile is generated, and
+    restores their states afterwards.
+
+    Parameters
+    ----------
+    entity : object
+        CityDistrict, Building or Apartment object
+    seed : int
+        Base seed
+    """
+    for (i, demand) in enumerate(get_pending_objects(entity)):
+        demand._seed = int(
+            np.random.SeedSequence([seed, i]).generate_state(1)[0])
+
+
+def _get_group_key(demand):
+    """
+    Return the group of a pending demand object: kind, method, profile type
+    and environment. Objects of a group with standardized profiles share
+    one base profile.
+    """
+    method = getattr(demand, 'method', None)
+    inputs = demand._pending if isinstance(demand._pending, dict) else {}
+    return (demand.kind, method, str(inputs.get('profile_type')),
+            id(demand.environment))
+
+
+class _EnvironmentPickler(pickle.Pickler):
+    """
+    Pickler, which replaces the environment (and its timer, weather and
+    prices) by tokens. Thus, the weather and price data are not
+    transferred with every object. Shared base profiles (see
+    pycity_base.classes.demand.load.get_shared_profile) are stored with
+    their key, so they are shared again after unpickling.
+    """
+
+    def __init__(self, file, environment):
+        pickle.Pickler.__init__(self, file, pickle.HIGHEST_PROTOCOL)
+        self.shared_objects = {id(environment): 'environment',
+                               id(environment.timer): 'timer',
+                               id(environment.weather): 'weather',
+                               id(environment.prices): 'prices'}
+
+    def persistent_id(self, obj):
+        token = self.shared_objects.get(id(obj))
+        if token is not None or not isinstance(obj, np.ndarray):
+            return token
+
+        from pycity_base.classes.demand import load
+        shared = load.find_shared_profile(obj)
+        if shared is None:
+            return None
+        (key, dtype, owner) = shared
+        owner_token = None
+        if owner is not None:
+            owner_token = self.shared_objects.get(id(owner))
+            if owner_token is None:
+                #  Owner is not part of the environment
+                return None
+        #  The receiving process only uses the values, if it does not hold
+        #  a profile with this key yet. The copy is not a shared profile and
+        #  thus pickled as usual.
+        return ('shared_profile', key, dtype.str, owner_token, np.array(obj))
+
+
+class _EnvironmentUnpickler(pickle.Unpickler):
+    """
+    Unpickler, which replaces the tokens of _EnvironmentPickler by the
+    given environment and shared base profiles by the profiles with the
+    same key in the current process.
+    """
+
+    def __init__(self, file, environment):
+        pickle.Unpickler.__init__(self, file)
+        self.shared_objects = {'environment': environment,
+                               'timer': environment.timer,
+                               'weather': environment.weather,
+                               'prices': environment.prices}
+
+    def persistent_load(self, pid):
+        if isinstance(pid, tuple) and pid[0] == 'shared_profile':
+            from pycity_base.classes.demand import load
+            (key, dtype, owner_token, values) = pid[1:]
+            owner = None
+            if owner_token is not None:
+                owner = self.shared_objects[owner_token]
+            return load.get_shared_profile(key, lambda: values, owner=owner,
+                                           dtype=dtype)
+        return self.shared_objects[pid]
+
+
+def dumps_without_environment(obj, environment):
+    """
+    Pickle an object (e.g. a building or demand object) without its
+    environment (see loads_with_environment).
+    """
+    buffer = io.BytesIO()
+    _EnvironmentPickler(buffer, environment).dump(obj)
+    return buffer.getvalue()
+
+
+def loads_with_environment(data, environment):
+    """
+    Unpickle an object pickled by dumps_without_environment and use the
+    given environment instead of the original one.
+    """
+    return _EnvironmentUnpickler(io.BytesIO(data), environment).load()
+
+
+#  Environment of a worker process (set by _init_worker)
+_worker_environment = None
+
+
+def _init_worker(environment):
+    """
+    Unpickle the environment of a worker process once.
+    """
+    global _worker_environment
+    _worker_environment = pickle.loads(environment)
+
+
+def _generate_worker(data):
+    """
+    Generate a pickled demand object in a worker process and return it
+    pickled (without environment).
+    """
+    demand = loads_with_environment(data, _worker_environment)
+    demand.generate()
+    return dumps_without_environment(demand, _worker_environment)
+
+
+def _generate_parallel(executor, demands, nb_workers):
+    """
+    Generate the profiles of demand objects with one environment by worker
+    processes and copy the results into the objects.
+    """
+    environment = demands[0].environment
+    for demand in demands:
+        #  Without seed, all workers would start from the same state
+        if getattr(demand, '_seed', None) is None:
+            demand._seed = int(np.random.randint(2 ** 32, dtype=np.uint64))
+
+    args = [dumps_without_environment(demand, environment)
+            for demand in demands]
+    results = executor.map(_generate_worker, args,
+                           chunksize=max(1, len(args) // (4 * nb_workers)))
+    for (demand, data) in zip(demands, results):
+        generated = loads_with_environment(data, environment)
+        demand.__dict__.update(generated.__dict__)
+
+
+def generate_pending(entity, nb_workers=1, verbose=False):
+    """
+    Generate the profiles of all demand objects with deferred profiles.
+
+    Objects are generated group by group (see get_pending_objects for the
+    order). Standardized profiles are generated once per group and shared
+    by its objects. Individual (stochastic or simulated) profiles are
+    generated by ``nb_workers`` processes. Objects with recorded seed (see
+    assign_seeds) get the same profiles for any number of workers; seeds
+    for objects without seed are drawn from numpy's global random number
+    generator.
+
+    Parameters
+    ----------
+    entity : object
+        CityDistrict, Building or Apartment object
+    nb_workers : int, optional
+        Number of worker processes (default: 1). If 1, all profiles are
+        generated in the current process. If None, the number of CPUs is
+        used.
+    verbose : bool, optional
+        Print progress (default: False)
+
+    Returns
+    -------
+    nb_generated : int
+        Number of generated profiles
+    """
+    if nb_workers is None:
+        nb_workers = os.cpu_count() or 1
+    assert nb_workers >= 1, 'nb_workers has to be at least 1'
+
+    pending = get_pending_objects(entity)
+    groups = collections.OrderedDict()
+    for demand in pending:
+        groups.setdefault(_get_group_key(demand), []).append(demand)
+
+    #  Worker pools (environment ID as key)
+    executors = {}
+    try:
+        nb_generated = 0
+        for (key, demands) in groups.items():
+            if nb_workers > 1 and key[:2] in individual_profiles:
+                environment = demands[0].environment
+                if key[3] not in executors:
+                    executors[key[3]] = \
+                        concurrent.futures.ProcessPoolExecutor(
+                            max_workers=nb_workers, initializer=_init_worker,
+                            initargs=(pickle.dumps(environment,
+                                                   pickle.HIGHEST_PROTOCOL),))
+                _generate_parallel(executors[key[3]], demands, nb_workers)
+            else:
+                #  The first object of a group with standardized profiles
+                #  generates the shared base profile
+                for demand in demands:
+                    demand.generate()
+
+            nb_generated += len(demands)
+            if verbose:
+                print('Generated', nb_generated, 'of', len(pending),
+                      'profiles (' + key[0] + ')')
+    finally:
+        for executor in executors.values():
+            executor.shutdown()
+
+    return len(pending)
@@ -0,0 +1,308 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Lightweight profiling of pyCity's demand and supply generation.
+
+The main constructors and computation functions of pyCity are instrumented
+with spans (see span and profiled). A span is identified by its phase (e.g.
+'generate', 'slp_thermal' or 'zone_model') and the kind of the entity it
+belongs to (e.g. 'electricaldemand'). Profiling is disabled by default.
+Then, spans only cost a check of a global flag.
+
+If profiling is enabled, the wall time (total and excluding nested spans),
+the number of calls and (optionally) the bytes allocated are recorded per
+phase and kind. Additionally, counters (see increment) may record arbitrary
+events, e.g. cache hits.
+
+Example
+-------
+>>> import pycity_base.functions.profiling as profiling
+>>> profiling.enable(memory=True)
+>>> city_district = city_generator.run_city_generator(...)
+>>> profiling.disable()
+>>> print(profiling.format_report())
+>>> profiling.export_trace('trace.json')  # Open with chrome://tracing
+
+Spans recorded in worker processes (e.g. of the city generator with
+nb_workers > 1) are not transferred to the main process.
+"""
+
+from __future__ import division
+
+import os
+import json
+import time
+import threading
+import functools
+import tracemalloc
+
+
+_enabled = False
+_track_memory = False
+_started_tracemalloc = False
+_max_events = 0
+
+#  (phase, kind) as key; dict with count, time, self_time and memory as value
+_stats = {}
+#  (name, kind) as key; value of the counter as value
+_counters = {}
+#  Trace events in the Trace Event Format (complete events)
+_events = []
+_origin = time.perf_counter()
+_local = threading.local()
+
+
+class _Span(object):
+    """
+    Span of a profiled phase (context manager).
+    """
+
+    __slots__ = ('phase', 'kind', 'args', 'start', 'child_time',
+                 'memory_start')
+
+    def __init__(self, phase, kind, args):
+        self.phase = phase
+        self.kind = kind
+        self.args = args
+
+    def __enter__(self):
+        stack = getattr(_local, 'stack', None)
+        if stack is None:
+            stack = _local.stack = []
+        stack.append(self)
+        self.child_time = 0.0
+        self.memory_start = None
+        if _track_memory:
+            self.memory_start = tracemalloc.get_traced_memory()[0]
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        end = time.perf_counter()
+        duration = end - self.start
+        memory = 0
+        if self.memory_start is not None and tracemalloc.is_tracing():
+            memory = tracemalloc.get_traced_memory()[0] - self.memory_start
+
+        stack = _local.stack
+        stack.pop()
+        if stack:
+            stack[-1].child_time += duration
+
+        key = (self.phase, self.kind)
+        stats = _stats.get(key)
+        if stats is None:
+            stats = _stats[key] = {'count': 0, 'time': 0.0, 'self_time': 0.0,
+                                   'memory': 0}
+        stats['count'] += 1
+        stats['time'] += duration
+        stats['self_time'] += duration - self.child_time
+        stats['memory'] += memory
+
+        if len(_events) < _max_events:
+            event = {'name': self.phase,
+                     'cat': self.kind or 'function',
+                     'ph': 'X',
+                     'ts': (self.start - _origin) * 1e6,
+                     'dur': duration * 1e6,
+                     'pid': os.getpid(),
+                     'tid': threading.current_thread().ident}
+            if self.args:
+                event['args'] = self.args
+            _events.append(event)
+        return False
+
+
+class _NullSpan(object):
+    """
+    Span, which does nothing (used while profiling is disabled).
+    """
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+_null_span = _NullSpan()
+
+
+def enable(memory=False, max_events=1000000):
+    """
+    Enable profiling.
+
+    Parameters
+    ----------
+    memory : bool, optional
+        Record the bytes allocated per span (default: False). Uses
+        tracemalloc, which slows down the execution considerably.
+    max_events : int, optional
+        Maximum number of recorded trace events (default: 1000000). The
+        aggregated statistics are recorded for all spans.
+    """
+    global _enabled, _track_memory, _started_tracemalloc, _max_events
+    if memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+        _started_tracemalloc = True
+    _track_memory = memory
+    _max_events = max_events
+    _enabled = True
+
+
+def disable():
+    """
+    Disable profiling. The recorded data are kept until reset is called.
+    """
+    global _enabled, _track_memory, _started_tracemalloc
+    _enabled = False
+    _track_memory = False
+    if _started_tracemalloc:
+        tracemalloc.stop()
+        _started_tracemalloc = False
+
+
+def is_enabled():
+    """
+    Return True, if profiling is enabled.
+    """
+    return _enabled
+
+
+def reset():
+    """
+    Delete all recorded data.
+    """
+    global _origin
+    _stats.clear()
+    _counters.clear()
+    del _events[:]
+    _origin = time.perf_counter()
+
+
+def span(phase, kind=None, **args):
+    """
+    Return a context manager, which profiles the enclosed code.
+
+    Parameters
+    ----------
+    phase : str
+        Name of the phase, e.g. 'generate' or 'zone_model'
+    kind : str, optional
+        Kind of the entity the phase belongs to, e.g. 'electricaldemand'
+        (default: None)
+    args : optional
+        Additional information, which is stored in the trace events (has
+        to be serializable with json)
+
+    Examples
+    --------
+    >>> with profiling.span('aggregation', 'citydistrict'):
+    ...     power = city_district.get_aggr_el_power_curve()
+    """
+    if not _enabled:
+        return _null_span
+    return _Span(phase, kind, args)
+
+
+def profiled(phase, kind=None):
+    """
+    Decorator, which profiles every call of a function (see span).
+    """
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return function(*args, **kwargs)
+            with _Span(phase, kind, None):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def increment(name, kind=None, value=1):
+    """
+    Increment a counter (only if profiling is enabled).
+
+    Parameters
+    ----------
+    name : str
+        Name of the counter, e.g. 'shared_profile_hit'
+    kind : str, optional
+        Kind of the entity the counter belongs to (default: None)
+    value : int or float, optional
+        Increment (default: 1)
+    """
+    if _enabled:
+        key = (name, kind)
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def get_report():
+    """
+    Return the recorded statistics.
+
+    Returns
+    -------
+    report : dict
+        Report with the keys
+        'spans' : list of dicts with the keys 'phase', 'kind', 'count',
+        'time' (total wall time in s), 'self_time' (wall time excluding
+        nested spans in s) and 'memory' (bytes allocated and not freed
+        within the spans; 0, if memory is not recorded), sorted by
+        descending self_time
+        'counters' : list of dicts with the keys 'name', 'kind' and 'value'
+    """
+    spans = [dict(phase=phase, kind=kind, **stats)
+             for ((phase, kind), stats) in _stats.items()]
+    spans.sort(key=lambda entry: entry['self_time'], reverse=True)
+    counters = [{'name': name, 'kind': kind, 'value': value}
+                for ((name, kind), value) in sorted(
+                    _counters.items(), key=lambda item: str(item[0]))]
+    return {'spans': spans, 'counters': counters}
+
+
+def format_report():
+    """
+    Return the recorded statistics as text table.
+    """
+    report = get_report()
+    lines = ['{:<24} {:<20} {:>8} {:>12} {:>12} {:>12}'.format(
+        'phase', 'kind', 'calls', 'time / s', 'self / s', 'memory / MiB')]
+    for entry in report['spans']:
+        lines.append('{:<24} {:<20} {:>8} {:>12.4f} {:>12.4f} {:>12.2f}'.format(
+            entry['phase'], str(entry['kind'] or '-'), entry['count'],
+            entry['time'], entry['self_time'], entry['memory'] / 2 ** 20))
+    if report['counters']:
+        lines.append('')
+        lines.append('{:<24} {:<20} {:>8}'.format('counter', 'kind', 'value'))
+        for entry in report['counters']:
+            lines.append('{:<24} {:<20} {:>8}'.format(
+                entry['name'], str(entry['kind'] or '-'), entry['value']))
+    return '\n'.join(lines)
+
+
+def export_report(path):
+    """
+    Save the recorded statistics (see get_report) as JSON file.
+    """
+    with open(path, 'w') as file:
+        json.dump(get_report(), file, indent=2)
+
+
+def export_trace(path):
+    """
+    Save the recorded spans as trace file in the Trace Event Format, which
+    can be opened with chrome://tracing or https://ui.perfetto.dev.
+    Counters are appended as counter events at the end of the trace.
+    """
+    events = list(_events)
+    timestamp = (time.perf_counter() - _origin) * 1e6
+    for ((name, kind), value) in _counters.items():
+        events.append({'name': name if kind is None else kind + '.' + name,
+                       'ph': 'C', 'ts': timestamp, 'pid': os.getpid(),
+                       'args': {'value': value}})
+    with open(path, 'w') as file:
+        json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, file)
@@ -0,0 +1,177 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Rolling-horizon simulation driver.
+
+The driver advances the common timer of a city district horizon by horizon
+over all timesteps. In every horizon, a user-defined callback (e.g. a model
+predictive controller) receives the forecasts of the current horizon and
+saves its accepted results with the devices' setResults methods. Afterwards,
+the results are committed through the result store (if given) and the timer
+is updated.
+"""
+
+from __future__ import division
+
+import time
+import numpy as np
+
+
+#  Weather quantities of the forecast (attribute names of Weather objects)
+weather_quantities = ('t_ambient', 'q_direct', 'q_diffuse', 'v_wind',
+                      'phi_ambient', 'p_ambient')
+
+
+def get_forecast(city_district):
+    """
+    Returns the forecasts of the current horizon.
+
+    Weather and demand forecasts are read-only views into the weather
+    arrays and the district's demand matrices (no copies are made). If the
+    weather has a forecast provider (see Weather.set_forecast_provider),
+    the weather forecast is taken from the provider instead.
+
+    Parameters
+    ----------
+    city_district : CityDistrict object
+
+    Returns
+    -------
+    forecast : dict
+        Forecasts of the current horizon with keys:
+        'weather' : dict with weather quantity as key (see
+        weather_quantities) and forecast array as value
+        'el', 'sh', 'sc', 'dhw' : demand matrices in W (buildings x
+        timesteps, rows in order of get_list_build_entity_node_ids)
+        'pv', 'wind' : aggregated power of all PV farms and wind energy
+        converters in W
+        The last horizons are shorter, if they exceed timesteps_total.
+    """
+    timer = city_district.environment.timer
+    weather = city_district.environment.weather
+    horizon = slice(timer.current_timestep,
+                    timer.current_timestep + timer.timesteps_horizon)
+
+    weather_forecast = {}
+    provided = None
+    if weather.forecast_prefetcher is not None:
+        #  Forecasts are returned in the order of weather_quantities
+        provided = dict(zip(weather_quantities, weather.getWeatherForecast(
+            getTAmbient=True, getQDirect=True, getQDiffuse=True,
+            getVWind=True, getPhiAmbient=True, getPAmbient=True)))
+    for quantity in weather_quantities:
+        if provided is not None:
+            values = provided[quantity]
+        else:
+            values = getattr(weather, quantity)[horizon]
+        if isinstance(values, np.ndarray):
+            values = values.view()
+            values.flags.writeable = False
+        weather_forecast[quantity] = values
+
+    forecast = {'weather': weather_forecast}
+    for demand_type in city_district.demand_types:
+        forecast[demand_type] = city_district.get_demand_matrix(
+            demand_type, currentValues=True)
+
+    #  Generators compute their horizon with full length. The last horizons
+    #  are therefore cut from the annual power curves.
+    full_horizon = horizon.stop <= timer.timesteps_total
+    for (key, method) in (('pv', city_district.getPVPower),
+                          ('wind', city_district.getWindEnergyConverterPower)):
+        if full_horizon:
+            forecast[key] = method(currentValues=True)
+        else:
+            forecast[key] = method(currentValues=False)[horizon]
+
+    return forecast
+
+
+def run_rolling_horizon(city_district, callback, result_store=None,
+                        nb_horizons=None, reset_timer=True, verbose=False):
+    """
+    Runs a rolling-horizon simulation of a city district.
+
+    Parameters
+    ----------
+    city_district : CityDistrict object
+        City district. All entities have to share the district's
+        environment.
+    callback : function
+        Function, which is called once per horizon with the forecast of the
+        current horizon (see get_forecast) and the timer as arguments:
+        callback(forecast, timer). It saves the accepted results with the
+        devices' setResults methods. If the callback returns False, the
+        simulation is stopped after the current horizon.
+    result_store : ResultStore object, optional
+        Store of the devices' results (default: None). After each horizon,
+        the results are committed (ResultRecorder) or flushed (memory
+        mapped ResultStore).
+    nb_horizons : int, optional
+        Maximum number of horizons (default: None). If None, the timer is
+        advanced until all timesteps_total are simulated.
+    reset_timer : bool, optional
+        Start at the first timestep (default: True). If False, the
+        simulation starts at the timer's current timestep.
+    verbose : bool, optional
+        Print progress (default: False)
+
+    Returns
+    -------
+    timings : dict
+        Start timestep (key 'timestep') and duration in seconds of the
+        phases 'forecast', 'callback', 'commit' and 'total' per horizon
+        (arrays with one entry per simulated horizon)
+    """
+    environment = city_district.environment
+    timer = environment.timer
+
+    if reset_timer:
+        timer.setCurrentValues(0, 0)
+
+    if result_store is None:
+        commit = None
+    elif hasattr(result_store, 'commit'):
+        commit = result_store.commit
+    else:
+        commit = result_store.flush
+
+    phases = ('forecast', 'callback', 'commit', 'total')
+    timings = {key: [] for key in ('timestep',) + phases}
+
+    horizon = 0
+    while timer.current_timestep < timer.timesteps_total:
+        if nb_horizons is not None and horizon >= nb_horizons:
+            break
+
+        t_start = time.perf_counter()
+        forecast = get_forecast(city_district)
+        t_forecast = time.perf_counter()
+        proceed = callback(forecast, timer)
+        t_callback = time.perf_counter()
+        if commit is not None:
+            commit()
+        t_commit = time.perf_counter()
+
+        timings['timestep'].append(timer.current_timestep)
+        timings['forecast'].append(t_forecast - t_start)
+        timings['callback'].append(t_callback - t_forecast)
+        timings['commit'].append(t_commit - t_callback)
+        timings['total'].append(t_commit - t_start)
+
+        if verbose:
+            print('Horizon', horizon + 1, 'at timestep',
+                  timer.current_timestep, 'took',
+                  round(t_commit - t_start, 4), 's')
+
+        environment.update()
+        horizon += 1
+
+        if proceed is False:
+            break
+
+    timings['timestep'] = np.array(timings['timestep'], dtype=int)
+    for key in phases:
+        timings[key] = np.array(timings[key])
+
+    return timings
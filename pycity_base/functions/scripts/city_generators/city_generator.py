@@ -8,8 +8,12 @@ from __future__ import division
 
 import os
 import math
+import random
 import pandas
 import pickle
+import concurrent.futures
+
+import numpy as np
 
 import shapely.geometry.point as point
 
@@ -26,14 +30,215 @@ import pycity_base.classes.heating_curve as HeatingCurve
 import pycity_base.classes.building as Building
 import pycity_base.classes.city_district as citydis
 import pycity_base.classes.demand.occupancy as occu
+import pycity_base.functions.district_storage as district_storage
+import pycity_base.functions.lazy_generation as lazy_generation
+import pycity_base.functions.profiling as profiling
+
+
+def _create_environment():
+    """
+    Generate the environment (timer, weather and prices) of the district.
+
+    Returns
+    -------
+    environment : object
+        Environment object of PyCity
+    """
+    #  Generate timer, weather and price objects
+    timer = pycity_base.classes.timer.Timer()
+    weather = pycity_base.classes.weather.Weather(timer)
+    prices = pycity_base.classes.prices.Prices()
+
+    #  Generate environment
+    return pycity_base.classes.environment.Environment(timer, weather, prices)
+
+
+def _get_row_seed(seed, index):
+    """
+    Return the seed of the random number generators for one input row.
+
+    The seed only depends on the base seed and the row index. Thus, the
+    generated profiles do not depend on the number of worker processes or
+    the order, in which the rows are processed.
+    """
+    return int(np.random.SeedSequence([seed, index]).generate_state(1)[0])
+
+
+@profiling.profiled('generate', 'building')
+def _generate_building(environment, row, use_el_slp, gen_dhw_profile,
+                       row_seed=None, lazy=False):
+    """
+    Generate a building object with demand curves from one input row.
+
+    Parameters
+    ----------
+    environment : object
+        Environment object of PyCity
+    row : dict
+        Input data of one building (column name as key)
+    use_el_slp : bool
+        Generate el. load profile via el. slp (True) or stochastic profile
+        generator (False)
+    gen_dhw_profile : bool
+        Generate domestic hot water profile
+    row_seed : int, optional
+        Seed of the random number generators (default: None). If None, the
+        random number generators are not seeded. Deferred profiles get
+        seeds derived from row_seed (see lazy_generation.assign_seeds).
+    lazy : bool, optional
+        Defer the generation of the demand profiles until they are accessed
+        (default: False)
+
+    Returns
+    -------
+    building : object
+        Building object of PyCity
+    """
+    if row_seed is not None:
+        np.random.seed(row_seed)
+        random.seed(row_seed)
+
+    curr_name = row['name']  # Building name
+    curr_area = row[
+        'living_area / m2']
+    #  Net floor area (respectively living area) in m^2
+    curr_th_spec_demand = row[
+        'specific_th_demand / kWh/m2a']
+    #  Spec. thermal energy demand in kWh/m^2a
+    curr_el_demand = row[
+        'an_el_demand / kWh/a']
+    #  Annual electric energy demand in kWh/a
+    curr_th_slp = row['th_slp_profile_type']  # Thermal SLP type
+    curr_el_slp = row['el_slp_profile_type']  # Electrical SLP type
+    curr_total_nb_occupants = row[
+        'total_nb_occupants']  # Total number of occupants in building
+
+    #  Assert input values
+    assert curr_area > 0
+    assert curr_th_spec_demand > 0
+    assert curr_el_demand > 0
+
+    #  Check if number of occupants is nan
+    #  (for non residential buildings)
+    if math.isnan(curr_total_nb_occupants):
+        curr_total_nb_occupants = None  # Replace nan with None
+    else:  # If number of occupants is not nan, convert value
+           # to integer
+        curr_total_nb_occupants = int(curr_total_nb_occupants)
+        assert curr_total_nb_occupants >= 1, ('Building ' + str(curr_name) +
+                                              ' needs at least one occupant')
+        assert curr_total_nb_occupants <= 5, ('Building ' + str(curr_name) +
+                                              ' has more than 5 occupants')
+
+    # Generate heat demand curve for space heating
+    heat_demand = \
+        SpaceHeating.SpaceHeating(environment,
+                                  method=1,
+                                  # Standard load profile
+                                  living_area=curr_area,
+                                  specific_demand=curr_th_spec_demand,
+                                  profile_type=curr_th_slp,
+                                  lazy=lazy)
+
+    if use_el_slp:  # Use el. SLP
+        el_method = 1
+        occupancy_profile = []  # Dummy value
+    else:  # Stochastic profile generator
+           # (only for residential buildings)
+        el_method = 2
+        #  Generate stochastic occupancy profile
+        occupancy_object = \
+            occu.Occupancy(environment,
+                           number_occupants=curr_total_nb_occupants,
+                           lazy=lazy)
+        #  The profile of deferred occupancy objects is read on generation
+        #  of the el. load profile
+        occupancy_profile = occupancy_object
+
+    # Generate electrical demand curve
+    el_demand = \
+        ElectricalDemand.ElectricalDemand(environment,
+                                          method=el_method,
+                                          annual_demand=curr_el_demand,
+                                          profile_type=curr_el_slp,
+                                          single_family_house=True,
+                                          total_nb_occupants=curr_total_nb_occupants,
+                                          randomize_appliances=True,
+                                          light_configuration=0,
+                                          occupancy=occupancy_profile,
+                                          lazy=lazy)
+
+    #  Generate apartment and add demand durves
+    apartment = Apartment.Apartment(environment)
+    apartment.addMultipleEntities([heat_demand, el_demand])
+
+    if gen_dhw_profile:
+        #  Generate domestic hot water demand curve
+        dhw_annex42 = \
+            DomesticHotWater.DomesticHotWater(environment,
+                                              t_flow=60,
+                                              thermal=True,
+                                              method=1,
+                                              # Annex 42
+                                              daily_consumption=70,
+                                              supply_temperature=25,
+                                              lazy=lazy)
+        apartment.addEntity(dhw_annex42)
+
+    # Generate heating curve
+    heating_curve = HeatingCurve.HeatingCurve(environment)
+
+    #  Generate building and add apartment and heating curve
+    building = Building.Building(environment)
+    entities = [apartment, heating_curve]
+    building.addMultipleEntities(entities)
+
+    if lazy and row_seed is not None:
+        lazy_generation.assign_seeds(building, row_seed)
+
+    return building
+
+
+#  Environment of a worker process (generated by _init_worker)
+_worker_environment = None
+
+
+def _init_worker():
+    """
+    Generate the environment of a worker process once.
+    """
+    global _worker_environment
+    _worker_environment = _create_environment()
+
+
+def _generate_building_worker(args):
+    """
+    Generate a building in a worker process and return it pickled (without
+    environment).
+    """
+    (row, use_el_slp, gen_dhw_profile, row_seed, lazy) = args
+    building = _generate_building(_worker_environment, row, use_el_slp,
+                                  gen_dhw_profile, row_seed, lazy)
+    return lazy_generation.dumps_without_environment(building,
+                                                     _worker_environment)
 
 
 def run_city_generator(gen_mo=0, input_name='test_city_mixed_buildings.txt',
                        output_name=None, use_el_slp=True,
-                       gen_dhw_profile=False):
+                       gen_dhw_profile=False, nb_workers=1, chunksize=1000,
+                       seed=None, verbose=True, output_format='pickle',
+                       lazy=False):
     """
     Function to generate and return city district object
 
+    The input file is read in chunks of ``chunksize`` rows. The buildings of
+    each chunk are generated by ``nb_workers`` processes and added to the
+    city district in the order of the input file. Each building's random
+    number generators are seeded with a seed derived from ``seed`` and its
+    row index, so the results do not depend on ``nb_workers``. The state of
+    the global random number generators of the calling process is restored
+    afterwards.
+
     Parameters
     ----------
     gen_mo : int, optional
@@ -41,10 +246,12 @@ def run_city_generator(gen_mo=0, input_name='test_city_mixed_buildings.txt',
         0 - Use data from input file (default)
     input_name : str, optional
         Name of input data file (default: 'test_city_only_buildings.txt')
+        An absolute path may be given to use a file outside of the input
+        folder.
     output_name : str, optional
         Name of output file (default: None)
         If output_name is None, no output file is generated.
-        Else: Pickled output file is saved to output folder
+        Else: Output file (or folder) is saved to output folder
     use_el_slp : bool, optional
         Boolean to define, how electrical load profile should be generated
         (default: True)
@@ -56,20 +263,49 @@ def run_city_generator(gen_mo=0, input_name='test_city_mixed_buildings.txt',
         (default: False)
         True: Generate dhw profile (valid for residential buildings!)
         False: Do not generate dhw profile
+    nb_workers : int, optional
+        Number of worker processes (default: 1). If 1, all buildings are
+        generated in the current process. If None, the number of CPUs is
+        used.
+    chunksize : int, optional
+        Number of input rows, which are read and processed at once
+        (default: 1000)
+    seed : int, optional
+        Base seed of the random number generators (default: None). If None,
+        a random base seed is used.
+    verbose : bool, optional
+        Print progress (default: True)
+    output_format : str, optional
+        Format of the output (default: 'pickle')
+        'pickle' - Pickled city district
+        'columnar' - Folder in the columnar format of
+        pycity_base.functions.district_storage (fast and memory mapped
+        loading of single buildings)
+    lazy : bool, optional
+        Defer the generation of the demand profiles until they are accessed
+        (default: False). The district skeleton is built almost instantly.
+        Deferred profiles carry seeds derived from ``seed`` and are
+        generated on first access. Use
+        pycity_base.functions.lazy_generation.generate_pending to generate
+        all profiles at once (optionally by several worker processes).
 
     Returns
     -------
     city_district : object
         CityDistrict object of PyCity
     """
+    if nb_workers is None:
+        nb_workers = os.cpu_count() or 1
+    assert nb_workers >= 1, 'nb_workers has to be at least 1'
+    assert chunksize >= 1, 'chunksize has to be at least 1'
+    assert output_format in ('pickle', 'columnar'), ('Unknown output format ' +
+                                                     str(output_format))
 
-    #  Generate timer, weather and price objects
-    timer = pycity_base.classes.timer.Timer()
-    weather = pycity_base.classes.weather.Weather(timer)
-    prices = pycity_base.classes.prices.Prices()
+    if seed is None:
+        seed = np.random.SeedSequence().entropy
 
     #  Generate environment
-    environment = pycity_base.classes.environment.Environment(timer, weather, prices)
+    environment = _create_environment()
 
     #  Generate city district object
     city_district = citydis.CityDistrict(environment)
@@ -80,115 +316,73 @@ def run_city_generator(gen_mo=0, input_name='test_city_mixed_buildings.txt',
     #  Choose city district generation method
     if gen_mo == 0:  # Load data from file
         import_path = os.path.join(curr_path, 'input', input_name)
-        city_dist_pandas_dataframe = pandas.read_csv(import_path, sep='\t')
-
-        for index, row in city_dist_pandas_dataframe.iterrows():
-            curr_name = row['name']  # Building name
-            curr_x = row['x_coord / m']  # Building x coordinate in m
-            curr_y = row['y_coord / m']  # Building y coordinate in m
-            curr_area = row[
-                'living_area / m2']
-            #  Net floor area (respectively living area) in m^2
-            curr_th_spec_demand = row[
-                'specific_th_demand / kWh/m2a']
-            #  Spec. thermal energy demand in kWh/m^2a
-            curr_el_demand = row[
-                'an_el_demand / kWh/a']
-            #  Annual electric energy demand in kWh/a
-            curr_th_slp = row['th_slp_profile_type']  # Thermal SLP type
-            curr_el_slp = row['el_slp_profile_type']  # Electrical SLP type
-            curr_total_nb_occupants = row[
-                'total_nb_occupants']  # Total number of occupants in building
-
-            #  Assert input values
-            assert curr_area > 0
-            assert curr_th_spec_demand > 0
-            assert curr_el_demand > 0
-
-            print('Processing building', curr_name)
-
-            #  Check if number of occupants is nan
-            #  (for non residential buildings)
-            if math.isnan(curr_total_nb_occupants):
-                curr_total_nb_occupants = None  # Replace nan with None
-            else:  # If number of occupants is not nan, convert value
-                   # to integer
-                curr_total_nb_occupants = int(curr_total_nb_occupants)
-                assert curr_total_nb_occupants >= 1
-                assert curr_total_nb_occupants <= 5
-
-            # Generate heat demand curve for space heating
-            heat_demand = \
-                SpaceHeating.SpaceHeating(environment,
-                                          method=1,
-                                          # Standard load profile
-                                          living_area=curr_area,
-                                          specific_demand=curr_th_spec_demand,
-                                          profile_type=curr_th_slp)
-
-            if use_el_slp:  # Use el. SLP
-                el_method = 1
-                occupancy_profile = []  # Dummy value
-            else:  # Stochastic profile generator
-                   # (only for residential buildings)
-                el_method = 2
-                #  Generate stochastic occupancy profile
-                occupancy_object = \
-                    occu.Occupancy(environment,
-                                   number_occupants=curr_total_nb_occupants)
-                occupancy_profile = occupancy_object.occupancy
-
-            # Generate electrical demand curve
-            el_demand = \
-                ElectricalDemand.ElectricalDemand(environment,
-                                                  method=el_method,
-                                                  annual_demand=curr_el_demand,
-                                                  profile_type=curr_el_slp,
-                                                  single_family_house=True,
-                                                  total_nb_occupants=curr_total_nb_occupants,
-                                                  randomize_appliances=True,
-                                                  light_configuration=0,
-                                                  occupancy=occupancy_profile)
-
-            #  Generate apartment and add demand durves
-            apartment = Apartment.Apartment(environment)
-            apartment.addMultipleEntities([heat_demand, el_demand])
-
-            if gen_dhw_profile:
-                #  Generate domestic hot water demand curve
-                dhw_annex42 = \
-                    DomesticHotWater.DomesticHotWater(environment,
-                                                      t_flow=60,
-                                                      thermal=True,
-                                                      method=1,
-                                                      # Annex 42
-                                                      daily_consumption=70,
-                                                      supply_temperature=25)
-                apartment.addEntity(dhw_annex42)
-
-            # Generate heating curve
-            heating_curve = HeatingCurve.HeatingCurve(environment)
-
-            #  Generate building and add apartment and heating curve
-            building = Building.Building(environment)
-            entities = [apartment, heating_curve]
-            building.addMultipleEntities(entities)
-
-            #  Generate shapely point positions
-            position = point.Point(curr_x, curr_y)
-
-            #  Add buildings to city district
-            city_district.addEntity(entity=building, position=position,
-                                    name=curr_name)
-
-            print('Added building', curr_name, ' to city district.')
-
-    # Save results as pickled file
+        reader = pandas.read_csv(import_path, sep='\t', chunksize=chunksize)
+
+        executor = None
+        if nb_workers > 1:
+            executor = concurrent.futures.ProcessPoolExecutor(
+                max_workers=nb_workers, initializer=_init_worker)
+
+        #  Buildings generated in this process reseed the global random
+        #  number generators
+        rng_states = (np.random.get_state(), random.getstate())
+
+        try:
+            nb_buildings = 0
+            for chunk in reader:
+                rows = chunk.to_dict('records')
+                seeds = [_get_row_seed(seed, nb_buildings + i)
+                         for i in range(len(rows))]
+
+                if executor is None:
+                    buildings = (_generate_building(environment, row,
+                                                    use_el_slp,
+                                                    gen_dhw_profile,
+                                                    row_seed, lazy)
+                                 for (row, row_seed) in zip(rows, seeds))
+                else:
+                    args = [(row, use_el_slp, gen_dhw_profile, row_seed,
+                             lazy)
+                            for (row, row_seed) in zip(rows, seeds)]
+                    pickled = executor.map(
+                        _generate_building_worker, args,
+                        chunksize=max(1, len(args) // (4 * nb_workers)))
+                    buildings = (lazy_generation.loads_with_environment(
+                                     data, environment)
+                                 for data in pickled)
+
+                for (row, building) in zip(rows, buildings):
+                    #  Generate shapely point positions
+                    position = point.Point(row['x_coord / m'],
+                                           row['y_coord / m'])
+
+                    #  Add buildings to city district
+                    city_district.addEntity(entity=building,
+                                            position=position,
+                                            name=row['name'])
+                    nb_buildings += 1
+
+                    if verbose:
+                        print('Added building', row['name'],
+                              'to city district (' + str(nb_buildings) +
+                              ' buildings).')
+        finally:
+            np.random.set_state(rng_states[0])
+            random.setstate(rng_states[1])
+            if executor is not None:
+                executor.shutdown()
+
+    # Save results
     if output_name is not None:
         output_path = os.path.join(curr_path, 'output', output_name)
-        #  Pickle and dump city objects
-        pickle.dump(city_district, open(output_path, 'wb'))
-        print('Pickled and dumped city object')
+        if output_format == 'columnar':
+            district_storage.save_city_district(city_district, output_path)
+            print('Saved city object in columnar format')
+        else:
+            #  Pickle and dump city objects
+            with open(output_path, 'wb') as output_file:
+                pickle.dump(city_district, output_file)
+            print('Pickled and dumped city object')
 
     return city_district
 
@@ -209,6 +403,9 @@ if __name__ == '__main__':
     #  buildings)
     gen_dhw_profile = True
 
+    #  Number of worker processes (None: number of CPUs)
+    nb_workers = 1
+
     #  Define input data filename
     filename = 'test_city_mixed_buildings.txt'
 
@@ -221,7 +418,8 @@ if __name__ == '__main__':
                                        input_name=filename,
                                        output_name=pickle_city_filename,
                                        use_el_slp=use_el_slp,
-                                       gen_dhw_profile=gen_dhw_profile)
+                                       gen_dhw_profile=gen_dhw_profile,
+                                       nb_workers=nb_workers)
 
     print('What am I?')
     print(city_district)
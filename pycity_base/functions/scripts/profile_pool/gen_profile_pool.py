@@ -11,6 +11,9 @@ npz internal arrays should hold name labels:
 """
 
 import os
+import json
+import random
+import concurrent.futures
 import numpy as np
 
 import pycity_base.classes.timer
@@ -35,11 +38,128 @@ def create_path_if_not_exist(path):
         os.makedirs(path)
 
 
-def generate_profile_pool(path=None, runs=100, timestep=60):
+#  Environment of a worker process (generated by _init_worker)
+_worker_environment = None
+
+
+def _create_environment(timestep):
+    """
+    Generate environment with TRY weather for the profile generation.
+    """
+    timesteps_total = 365 * 24 * 3600 / timestep
+
+    timer = pycity_base.classes.timer.Timer(time_discretization=timestep,
+                                            timesteps_total=timesteps_total)
+    weather = pycity_base.classes.weather.Weather(timer, use_TRY=True)
+    prices = pycity_base.classes.prices.Prices()
+    return pycity_base.classes.environment.Environment(timer, weather, prices)
+
+
+def _get_run_seed(seed, nb_occupants, run):
+    """
+    Return the seed of one run. It only depends on the base seed, the number
+    of occupants and the run number.
+    """
+    return int(np.random.SeedSequence([seed, nb_occupants, run]
+                                      ).generate_state(1)[0])
+
+
+def _generate_profiles(env, nb_occupants, run_seed):
+    """
+    Generate occupancy, el. load and hot water profile of one run.
+
+    Returns
+    -------
+    tuple_profiles : tuple (of np.arrays)
+        Occupancy (600 seconds), el. load and hot water profile (timestep of
+        env)
+    """
+    np.random.seed(run_seed)
+    random.seed(run_seed)
+
+    #  Generate occupancy object
+    occupancy = occ.Occupancy(environment=env, number_occupants=nb_occupants)
+
+    #  Get profile
+    occ_profile = occupancy.occupancy
+
+    # Generate el. load profile
+    el_dem_stochastic = \
+        ed.ElectricalDemand(environment=env,
+                            method=2,
+                            total_nb_occupants=nb_occupants,
+                            randomize_appliances=True,
+                            light_configuration=10,
+                            occupancy=occupancy.occupancy)
+
+    # Generate hot water profile
+    dhw_stochastical = \
+        dhw.DomesticHotWater(environment=env,
+                             t_flow=60,
+                             thermal=True,
+                             method=2,
+                             supply_temperature=20,
+                             occupancy=occ_profile)
+
+    return (occ_profile, el_dem_stochastic.loadcurve,
+            dhw_stochastical.loadcurve)
+
+
+def _init_worker(timestep):
+    """
+    Generate the environment of a worker process once.
+    """
+    global _worker_environment
+    _worker_environment = _create_environment(timestep)
+
+
+def _generate_profiles_worker(args):
+    (run, nb_occupants, run_seed) = args
+    return (run, _generate_profiles(_worker_environment, nb_occupants,
+                                    run_seed))
+
+
+def _open_pool_arrays(path, nb_occupants, runs, lengths, resume):
+    """
+    Open (or create) the preallocated npy files of one number of occupants
+    and the checkpoint array of completed runs.
+    """
+    prefix = os.path.join(path, str(nb_occupants) + '_person_')
+    done_path = prefix + 'done.npy'
+
+    arrays = {}
+    if resume and os.path.exists(done_path):
+        done = np.load(done_path, mmap_mode='r+')
+        for (type, length) in lengths.items():
+            arrays[type] = np.load(prefix + type + '.npy', mmap_mode='r+')
+            assert arrays[type].shape == (runs, length), \
+                ('Profile pool ' + prefix + type + '.npy does not match ' +
+                 'the number of runs and the timestep.')
+    else:
+        for (type, length) in lengths.items():
+            arrays[type] = np.lib.format.open_memmap(
+                prefix + type + '.npy', mode='w+', dtype=np.float64,
+                shape=(runs, length))
+        done = np.lib.format.open_memmap(done_path, mode='w+', dtype=bool,
+                                         shape=(runs,))
+    return (arrays, done)
+
+
+def generate_profile_pool(path=None, runs=100, timestep=60, nb_workers=1,
+                          seed=None, resume=True, save_npz=True,
+                          occupants=(1, 2, 3, 4, 5)):
     """
     Generates profile pool in subfolder profile (if no profile pool exists)
     (occupancy, electrical, dhw)
 
+    The profiles are written to preallocated, memory-mappable npy files
+    ('<n>_person_occ.npy', '<n>_person_el.npy', '<n>_person_dhw.npy').
+    Completed runs are recorded in '<n>_person_done.npy' after each run.
+    An interrupted generation is resumed by calling the function again with
+    the same arguments. Each run uses its own seed, which only depends on
+    seed, the number of occupants and the run number. Thus, the pool does
+    not depend on nb_workers or on interruptions.
+
     Parameters
     ----------
     path : str, optional
@@ -49,6 +169,23 @@ def generate_profile_pool(path=None, runs=100, timestep=60):
         Number of loops used to generate profile pool (default: 100)
     timestep : int, optional
         Time discretization for environment in seconds (default: 60)
+    nb_workers : int, optional
+        Number of worker processes (default: 1). If 1, all profiles are
+        generated in the current process. If None, the number of CPUs is
+        used.
+    seed : int, optional
+        Base seed of the random number generators (default: None). If None,
+        a random base seed is used (and stored for resuming).
+    resume : bool, optional
+        Resume an interrupted generation in path (default: True). If False,
+        existing profiles in path are overwritten.
+    save_npz : bool, optional
+        Additionally save all profiles of a number of occupants as
+        '<n>_person_profiles.npz', when all runs are completed
+        (default: True)
+    occupants : list (of ints), optional
+        Numbers of occupants, for which profiles are generated
+        (default: (1, 2, 3, 4, 5))
     """
 
     if path is None:
@@ -58,83 +195,82 @@ def generate_profile_pool(path=None, runs=100, timestep=60):
         #  Create path, if not existent
         create_path_if_not_exist(path)
 
-    timesteps_total = 365 * 24 * 3600 / timestep
-
-    #  Generate environment
-    timer = pycity_base.classes.timer.Timer(time_discretization=timestep,
-                                            timesteps_total=timesteps_total)
-    weather = pycity_base.classes.weather.Weather(timer, use_TRY=True)
-    prices = pycity_base.classes.prices.Prices()
-    env = pycity_base.classes.environment.Environment(timer, weather, prices)
+    if nb_workers is None:
+        nb_workers = os.cpu_count() or 1
+    assert nb_workers >= 1, 'nb_workers has to be at least 1'
 
-    for occ_index in range(1, 6):  # Loop from 1 to 5 occupants
+    #  Base seed and settings of the pool (reused on resume)
+    state_path = os.path.join(path, 'profile_pool_state.json')
+    state = {'seed': seed, 'runs': runs, 'timestep': timestep}
+    if resume and os.path.exists(state_path):
+        with open(state_path) as state_file:
+            saved_state = json.load(state_file)
+        assert (saved_state['runs'], saved_state['timestep']) == \
+            (runs, timestep), ('Existing profile pool in ' + path + ' has ' +
+                               'been generated with other runs or timestep.' +
+                               ' Use resume=False to overwrite it.')
+        assert seed is None or seed == saved_state['seed'], \
+            'Existing profile pool has been generated with another seed.'
+        state = saved_state
+    if state['seed'] is None:
+        state['seed'] = int(np.random.SeedSequence().entropy % 2 ** 63)
+    with open(state_path, 'w') as state_file:
+        json.dump(state, state_file)
 
-        print('Number of occupants: ', occ_index)
-        print('#####################################################')
+    timesteps_total = int(365 * 24 * 3600 / timestep)
+    lengths = {'occ': 365 * 144, 'el': timesteps_total,
+               'dhw': timesteps_total}
 
-        #  Filenames (Files are going to store 3 arrays ('occ', 'app', 'lig'))
-        file_name = str(occ_index) + '_person_profiles.npz'
-        path_profile_file = os.path.join(path, file_name)
+    env = None
+    executor = None
+    if nb_workers > 1:
+        executor = concurrent.futures.ProcessPoolExecutor(
+            max_workers=nb_workers, initializer=_init_worker,
+            initargs=(timestep,))
+    else:
+        env = _create_environment(timestep)
 
-        occupancy_profiles = None
-        el_profiles = None
-        dhw_profiles = None
+    try:
+        for occ_index in occupants:
 
-        for i in range(runs):  # Loop over desired number of profiles
+            print('Number of occupants: ', occ_index)
+            print('#####################################################')
 
-            print('Run number: ', i)
+            (arrays, done) = _open_pool_arrays(path, occ_index, runs, lengths,
+                                               resume)
+            pending = [(run, occ_index,
+                        _get_run_seed(state['seed'], occ_index, run))
+                       for run in range(runs) if not done[run]]
+            print('Runs to generate: ', len(pending), 'of', runs)
 
-            #  Generate occupancy object
-            occupancy = occ.Occupancy(environment=env, number_occupants=occ_index)
-
-            #  Get profile
-            occ_profile = occupancy.occupancy
-
-            if occupancy_profiles is None:
-                occupancy_profiles = occ_profile
-            else:
-                occupancy_profiles = np.vstack(
-                    (occupancy_profiles, occ_profile))
-
-            # Generate el. load profile
-            el_dem_stochastic = \
-                ed.ElectricalDemand(environment=env,
-                                    method=2,
-                                    total_nb_occupants=occ_index,
-                                    randomize_appliances=True,
-                                    light_configuration=10,
-                                    occupancy=occupancy.occupancy)
-
-            #  Get el. load profile
-            el_profile = el_dem_stochastic.loadcurve
-
-            if el_profiles is None:
-                el_profiles = el_profile
+            if executor is None:
+                results = ((run, _generate_profiles(env, occ_index, run_seed))
+                           for (run, occ_index, run_seed) in pending)
             else:
-                el_profiles = np.vstack((el_profiles, el_profile))
-
-            # Generate hot water profile
-            dhw_stochastical = \
-                dhw.DomesticHotWater(environment=env,
-                                     t_flow=60,
-                                     thermal=True,
-                                     method=2,
-                                     supply_temperature=20,
-                                     occupancy=occ_profile)
-
-            #  Get dhw curve
-            dhw_profile = dhw_stochastical.loadcurve
-
-            if dhw_profiles is None:
-                dhw_profiles = dhw_profile
-            else:
-                dhw_profiles = np.vstack((dhw_profiles, dhw_profile))
+                futures = [executor.submit(_generate_profiles_worker, args)
+                           for args in pending]
+                results = (future.result() for future in
+                           concurrent.futures.as_completed(futures))
+
+            for (run, profiles) in results:
+                print('Run number: ', run)
+                for (type, profile) in zip(('occ', 'el', 'dhw'), profiles):
+                    arrays[type][run] = profile
+                    arrays[type].flush()
+                #  Checkpoint (after the profiles have been written)
+                done[run] = True
+                done.flush()
 
-        # Save as npz file (3 arrays ('occ', 'el', 'dhw'))
-        np.savez(path_profile_file, occ=occupancy_profiles,
-                 el=el_profiles, dhw=dhw_profiles)
-        print('#####################################################')
-        print()
+            if save_npz:
+                # Save as npz file (3 arrays ('occ', 'el', 'dhw'))
+                file_name = str(occ_index) + '_person_profiles.npz'
+                np.savez(os.path.join(path, file_name), occ=arrays['occ'],
+                         el=arrays['el'], dhw=arrays['dhw'])
+            print('#####################################################')
+            print()
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
 
 
 if __name__ == '__main__':
@@ -142,5 +278,8 @@ if __name__ == '__main__':
     #  profiles
     runs = 100
 
+    #  Number of worker processes (None: number of CPUs)
+    nb_workers = 1
+
     #  Run profile pool generator
-    generate_profile_pool(runs=runs)
+    generate_profile_pool(runs=runs, nb_workers=nb_workers)
@@ -15,6 +15,9 @@ npz internal arrays should hold name labels:
 - occ (600 second resolution)
 - el (60 second resolution)
 - dhw (60 second resolution)
+
+For fast access to large pools, convert the npz files into memory-mappable
+npy files ('<n>_person_<type>.npy') with convert_npz_to_npy.
 """
 
 import os
@@ -24,6 +27,8 @@ import matplotlib.pyplot as plt
 
 from pycity_base.functions import change_resolution as chres
 
+#  Resolution of the pool profiles in seconds (type as key)
+pool_resolution = {'occ': 600, 'el': 60, 'dhw': 60}
 
 def get_list_of_npz_files(path):
     """
@@ -50,15 +55,85 @@ def get_list_of_npz_files(path):
     return list_npz
 
 
+def get_list_of_npy_files(path):
+    """
+    Returns list of npy files found in path (only one level, no os.walk!)
+
+    Parameters
+    ----------
+    path : str
+        Path to folder, which should be searched through
+
+    Returns
+    -------
+    list_npy : list
+        List of npy file names found in path
+    """
+    return [elem for elem in os.listdir(path)
+            if os.path.isfile(os.path.join(path, elem)) and
+            elem.endswith('.npy')]
+
+
+def _get_nb_occupants(filename):
+    """
+    Returns number of occupants of profile pool file (leading number of
+    filename, e.g. 3 for '3_person_profiles.npz') or None.
+    """
+    prefix = filename.split('_')[0]
+    if prefix.isdigit():
+        return int(prefix)
+    return None
+
+
+def convert_npz_to_npy(path, path_out=None):
+    """
+    Convert profile pool npz files into uncompressed npy files, which can be
+    memory mapped.
+
+    Every array of '<n>_person_profiles.npz' is saved as
+    '<n>_person_<type>.npy' (e.g. '3_person_el.npy').
+
+    Parameters
+    ----------
+    path : str
+        Path to folder, where profile pool npz files are stored
+    path_out : str, optional
+        Path to folder, where npy files should be stored (default: None).
+        If set to None, path is used.
+    """
+    if path_out is None:
+        path_out = path
+    if not os.path.exists(path_out):
+        os.makedirs(path_out)
+
+    for elem in get_list_of_npz_files(path):
+        nb_occupants = _get_nb_occupants(elem)
+        if nb_occupants is None:
+            continue
+        with np.load(os.path.join(path, elem)) as npz_data:
+            for type in npz_data.files:
+                np.save(os.path.join(path_out, str(nb_occupants) +
+                                     '_person_' + type + '.npy'),
+                        npz_data[type])
+
+
 class ProfilePool(object):
     """
     Class to hold profile pool
 
+    Profiles are loaded lazily: the files of a number of occupants are only
+    opened, when profiles for this number of occupants are requested for the
+    first time. Uncompressed npy files (see convert_npz_to_npy) are memory
+    mapped, so single profiles are read from disk without loading the
+    whole pool. Compressed npz files are decompressed once per number of
+    occupants and type.
+
     Attributes
     ----------
     dict_data : dict
-        Dictionary with number of occupants as key and numpy nd-array with
-        profiles as values
+        Dictionary with number of occupants as key and dict with profile
+        type as key and numpy nd-array with profiles (one per row) as value
+        (only holds numbers of occupants, which have been requested)
     """
 
     def __init__(self, path_to_npz_folder=None):
@@ -68,20 +143,32 @@ class ProfilePool(object):
         Parameters
         ----------
         path_to_npz_folder : str, optional
-            Path to folder, where profile pool npz files are stored
+            Path to folder, where profile pool npz (or npy) files are stored
             (default: None). If set to None, no profiles are loaded.
-            If path is given, going to load profiles during init
+            If the folder holds npy files, they are used instead of npz files.
         """
 
         self.dict_data = {}
 
+        #  Number of occupants as key and dict with profile type as key and
+        #  file path as value (files, which have not been opened, yet)
+        self._files = {}
+
+        #  (nb_occupants, type, timestep) as key and dict with profile index
+        #  as key and resampled profile as value
+        self._resampled = {}
+
         if path_to_npz_folder is not None:
-            #  Load npz files
-            self.load_profile_npz(path_to_npz_folder)
+            if len(get_list_of_npy_files(path_to_npz_folder)) > 0:
+                self.load_profile_npy(path_to_npz_folder)
+            else:
+                #  Load npz files
+                self.load_profile_npz(path_to_npz_folder)
 
     def load_profile_npz(self, path):
         """
-        Load all npz numpy arrays into ProfilePool object
+        Register all npz numpy arrays of path in ProfilePool object. The
+        arrays are loaded on first request.
 
         Parameters
         ----------
@@ -90,20 +177,213 @@ class ProfilePool(object):
         """
 
         #  Get list of npz files found in path
-        list_npz = get_list_of_npz_files(path)
+        list_npz = sorted(get_list_of_npz_files(path))
 
         for i in range(len(list_npz)):
             elem = list_npz[i]
 
-            #  Construct path to load data
-            path_load = os.path.join(path, elem)
+            #  Number of occupants given by file name (or by file order)
+            key = _get_nb_occupants(elem)
+            if key is None:
+                key = i + 1
+
+            self._files[key] = os.path.join(path, elem)
+            self.dict_data.pop(key, None)
+
+    def load_profile_npy(self, path):
+        """
+        Register all npy numpy arrays ('<n>_person_<type>.npy') of path in
+        ProfilePool object. The arrays are memory mapped on first request.
+
+        Parameters
+        ----------
+        path : str
+            Path to folder, where profile pool npy files are stored
+        """
+        for elem in get_list_of_npy_files(path):
+            key = _get_nb_occupants(elem)
+            if key is None or '_person_' not in elem:
+                continue
+            type = elem[:-len('.npy')].split('_person_', 1)[1]
+            if type not in pool_resolution:
+                #  E.g. checkpoint files of gen_profile_pool
+                continue
+            if not isinstance(self._files.get(key), dict):
+                self._files[key] = {}
+            self._files[key][type] = os.path.join(path, elem)
+            self.dict_data.pop(key, None)
+
+    def get_partition(self, nb_occupants):
+        """
+        Returns all profiles of one number of occupants (loaded on first
+        call).
+
+        Parameters
+        ----------
+        nb_occupants : int
+            Number of occupants
+
+        Returns
+        -------
+        partition : dict
+            Profile type as key and numpy nd-array with profiles (one per
+            row) as value
+        """
+        if nb_occupants not in self.dict_data:
+            if nb_occupants not in self._files:
+                raise AssertionError('No profiles for ' + str(nb_occupants) +
+                                     ' occupants loaded. Load data first!')
+            files = self._files[nb_occupants]
+            if isinstance(files, dict):
+                #  Memory mapped npy files
+                partition = {type: np.load(path_load, mmap_mode='r')
+                             for (type, path_load) in files.items()}
+            else:
+                #  Decompress npz file once
+                with np.load(files) as npz_data:
+                    partition = {type: npz_data[type]
+                                 for type in npz_data.files}
+                for profiles in partition.values():
+                    profiles.flags.writeable = False
+            self.dict_data[nb_occupants] = partition
+        return self.dict_data[nb_occupants]
+
+    def get_nb_profiles(self, nb_occupants=1):
+        """
+        Returns number of profiles per type for one number of occupants.
+
+        Parameters
+        ----------
+        nb_occupants : int, optional
+            Number of occupants (default: 1)
+
+        Returns
+        -------
+        nb_profiles : int
+            Number of profiles
+        """
+        return len(self.get_partition(nb_occupants)['occ'])
+
+    def sample_profiles(self, nb_occupants, replace=True, seed=None):
+        """
+        Returns random profile indexes for many apartments at once.
+
+        Profiles are drawn separately for each number of occupants
+        (stratified sampling).
 
-            #  Load npz file
-            npz_data = np.load(path_load)
+        Parameters
+        ----------
+        nb_occupants : array-like (of ints)
+            Number of occupants of each apartment (between 1 - 5)
+        replace : bool, optional
+            Draw with replacement (default: True). If False, every profile
+            of a number of occupants is used once, before any profile is
+            used a second time.
+        seed : int, optional
+            Seed of the random number generator (default: None)
+
+        Returns
+        -------
+        indexes : np.array (of ints)
+            Profile index (row within the profiles of the apartment's number
+            of occupants) of each apartment
+        """
+        nb_occupants = np.asarray(nb_occupants, dtype=int)
+        if np.any((nb_occupants > 5) | (nb_occupants <= 0)):
+            msg = 'Number of occupants must be between 1 and 5!'
+            raise AssertionError(msg)
 
-            # Save data to dict_data
-            key = i + 1
-            self.dict_data[key] = npz_data
+        rng = np.random.default_rng(seed)
+        indexes = np.zeros(len(nb_occupants), dtype=np.int64)
+
+        for occupants in np.unique(nb_occupants):
+            apartments = np.flatnonzero(nb_occupants == occupants)
+            nb_profiles = self.get_nb_profiles(int(occupants))
+            if replace:
+                indexes[apartments] = rng.integers(0, nb_profiles,
+                                                   size=len(apartments))
+            else:
+                #  Concatenated random permutations of all profiles
+                nb_permutations = -(-len(apartments) // nb_profiles)
+                samples = np.concatenate([rng.permutation(nb_profiles)
+                                          for i in range(nb_permutations)])
+                indexes[apartments] = samples[:len(apartments)]
+
+        return indexes
+
+    def assign_profiles(self, apartments, replace=True, seed=None,
+                        types=('occ', 'el', 'dhw'), t_flow=60):
+        """
+        Assigns random pool profiles to many apartments at once.
+
+        The apartments' demand objects reference (read-only) rows of the
+        pool instead of copies. El. and hot water profiles are resampled to
+        the timestep of the apartments' environment (resampled profiles are
+        shared, too).
+
+        Parameters
+        ----------
+        apartments : list (of Apartment objects) or object
+            Apartments or CityDistrict, Building or Apartment object. Each
+            apartment has to hold an occupancy object, which defines the
+            number of occupants.
+        replace : bool, optional
+            Draw with replacement (default: True). See sample_profiles.
+        seed : int, optional
+            Seed of the random number generator (default: None)
+        types : list (of str), optional
+            Types of profiles, which should be assigned
+            (default: ('occ', 'el', 'dhw'))
+        t_flow : float, optional
+            Flow temperature of the hot water demand objects in degree
+            Celsius (default: 60)
+
+        Returns
+        -------
+        tuple_indexes : tuple (of np.arrays)
+            Number of occupants and profile index of each apartment
+        """
+        import pycity_base.classes.demand.domestic_hot_water as dhw
+        import pycity_base.classes.demand.electrical_demand as ed
+        import pycity_base.functions.lazy_generation as lazy
+
+        if hasattr(apartments, 'kind'):
+            apartments = lazy._get_apartments(apartments)
+
+        for apartment in apartments:
+            if apartment.occupancy is None:
+                raise AssertionError('Apartment without occupancy object. '
+                                     'Add occupancy objects first!')
+
+        nb_occupants = np.array([apartment.occupancy.number_occupants
+                                 for apartment in apartments], dtype=int)
+        indexes = self.sample_profiles(nb_occupants, replace=replace,
+                                       seed=seed)
+
+        for (apartment, occupants, index) in zip(apartments, nb_occupants,
+                                                 indexes):
+            environment = apartment.environment
+            timestep = environment.timer.time_discretization
+            occupants = int(occupants)
+
+            if 'occ' in types:
+                apartment.occupancy.occupancy = self.get_random_profile(
+                    occupants, 'occ', index, copy=False)
+
+            if 'el' in types:
+                el_demand = ed.ElectricalDemand(environment, method=0)
+                el_demand.set_base_profile(self.get_random_profile(
+                    occupants, 'el', index, copy=False, timestep=timestep))
+                apartment.addEntity(el_demand)
+
+            if 'dhw' in types:
+                dhw_demand = dhw.DomesticHotWater(environment, t_flow=t_flow,
+                                                  method=0)
+                dhw_demand.set_base_profile(self.get_random_profile(
+                    occupants, 'dhw', index, copy=False, timestep=timestep))
+                apartment.addEntity(dhw_demand)
+
+        return (nb_occupants, indexes)
 
     def get_random_number(self):
         """
@@ -116,16 +396,19 @@ class ProfilePool(object):
             Random number
         """
 
-        if len(self.dict_data) == 0:
+        if len(self.dict_data) == 0 and len(self._files) == 0:
             raise AssertionError('self.dict_data is empty. Load data first!')
 
-        nb_profiles = len(self.dict_data[1]['occ'])
+        nb_profiles = self.get_nb_profiles(1)
 
         return random.randint(0, nb_profiles - 1)
 
-    def get_random_profile(self, nb_occupants, type, rand_number=None):
+    def get_random_profile(self, nb_occupants, type, rand_number=None,
+                           copy=True, timestep=None):
         """
-        Returns copy of random occupancy profile with 600 second resolution
+        Returns copy of random profile (occupancy profiles are given with
+        600 second resolution, el. and dhw profiles with 60 second
+        resolution)
 
         Parameters
         ----------
@@ -137,6 +420,13 @@ class ProfilePool(object):
             Random number to select profile (default: None). If set to None,
             going to select random integer. If integer is given, this integer
             is goint to be used.
+        copy : bool, optional
+            Return a copy of the profile (default: True). If set to False,
+            a read-only view into the pool is returned (without copying).
+        timestep : int, optional
+            Timestep of the returned profile in seconds (default: None).
+            If set to None, the resolution of the pool is used. Resampled
+            profiles are cached per number of occupants, type and timestep.
 
         Returns
         -------
@@ -157,9 +447,25 @@ class ProfilePool(object):
             rand_number = self.get_random_number()
             print('Choosen random number: ', rand_number)
 
-        return np.copy(self.dict_data[nb_occupants][type][rand_number])
-
-    def get_occ_el_dhw_profile(self, nb_occupants, rand_number=None):
+        profile = self.get_partition(nb_occupants)[type][rand_number]
+
+        if timestep is not None and timestep != pool_resolution[type]:
+            cache = self._resampled.setdefault((nb_occupants, type,
+                                                timestep), {})
+            if rand_number not in cache:
+                resampled = chres.changeResolution(
+                    profile, oldResolution=pool_resolution[type],
+                    newResolution=timestep)
+                resampled.flags.writeable = False
+                cache[rand_number] = resampled
+            profile = cache[rand_number]
+
+        if copy:
+            return np.array(profile)
+        return profile
+
+    def get_occ_el_dhw_profile(self, nb_occupants, rand_number=None,
+                               copy=True, timestep=None):
         """
         Returns tuply with occupancy, electrical load and hot water profile
 
@@ -173,6 +479,12 @@ class ProfilePool(object):
             Random number to select profile (default: None). If set to None,
             going to select random integer. If integer is given, this integer
             is goint to be used.
+        copy : bool, optional
+            Return copies of the profiles (default: True). If set to False,
+            read-only views into the pool are returned (without copying).
+        timestep : int, optional
+            Timestep of the returned profiles in seconds (default: None).
+            If set to None, the resolutions of the pool are used.
 
         Returns
         -------
@@ -192,17 +504,20 @@ class ProfilePool(object):
         # Get occupancy profile
         occ_profile = self.get_random_profile(nb_occupants=nb_occupants,
                                               type='occ',
-                                              rand_number=rand_number)
+                                              rand_number=rand_number,
+                                              copy=copy, timestep=timestep)
 
         #  Get el. load profile
         el_profile = self.get_random_profile(nb_occupants=nb_occupants,
                                              type='el',
-                                             rand_number=rand_number)
+                                             rand_number=rand_number,
+                                             copy=copy, timestep=timestep)
 
         #  Get dhw load profile
         dhw_profile = self.get_random_profile(nb_occupants=nb_occupants,
                                               type='dhw',
-                                              rand_number=rand_number)
+                                              rand_number=rand_number,
+                                              copy=copy, timestep=timestep)
 
         return (occ_profile, el_profile, dhw_profile)
 
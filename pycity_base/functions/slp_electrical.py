@@ -12,6 +12,7 @@ import os
 import numpy as np
 import openpyxl
 from pycity_base.functions import change_resolution as chres
+from pycity_base.functions import profiling
 
 
 def load(filename):
@@ -34,6 +35,7 @@ def load(filename):
     return profiles
 
 
+@profiling.profiled('slp_electrical')
 def get_demand(annual_demand, profile, time_discretization):
     scaling = 4000 / 1000000 * annual_demand / time_discretization * 900
 
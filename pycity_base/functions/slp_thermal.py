@@ -10,22 +10,23 @@ from __future__ import division
 
 import os
 import numpy as np
-import math
 import openpyxl
 from pycity_base.functions import change_resolution as chres
+from pycity_base.functions import profiling
 
 
 # Sources:
 # [1] BDEW/VKU/GEODE-Leitfaden. Abwicklung von Standardlastprofilen Gas (2014)
 # https://www.bdew.de/internet.nsf/id/33EEC2362FA39C3AC1257D04004ED1C2/$file/14-06-30_KOV%20VII_LF_Abwicklung_von_SLP_Gas.pdf
 
+@profiling.profiled('slp_thermal')
 def calculate(temperature, initial_day, profiles, weekly_factors, hourly_factors, total_demand):
     """
     Parameters
     ----------
     temperature : array-like
         Full year temperature profile.
-    initial_day : integer
+    initial_day : integer or array-like
         - 0 : Monday
         - 1 : Tuesday
         - 2 : Wednesday
@@ -33,6 +34,9 @@ def calculate(temperature, initial_day, profiles, weekly_factors, hourly_factors
         - 4 : Friday
         - 5 : Saturday
         - 6 : Sunday
+        Alternatively, an array with the weekday of each day (same indexes,
+        e.g. Timer.day_weekday - 1). Holidays can be treated as Sundays this
+        way.
     profiles : array-like
         Dictionary containing all profile factors (A, B, C, D) for all types
         of houses.
@@ -74,14 +78,18 @@ def calculate(temperature, initial_day, profiles, weekly_factors, hourly_factors
     h = np.array([D + A / ((B / (t - theta_0)) ** C + 1) for t in t_average])
 
     # Compute weekday factors
-    F_factors = np.tile(weekly_factors, int(math.ceil(len(t_average) / 7)))
-    F = F_factors[initial_day:initial_day + len(t_average)]
+    weekdays = np.asarray(initial_day, dtype=int)
+    if weekdays.ndim == 0:
+        weekdays = (weekdays + np.arange(len(t_average))) % 7
+    else:
+        weekdays = weekdays[:len(t_average)]
+    F = np.asarray(weekly_factors)[weekdays]
 
     # Compute customer's value. [1], page 78
     KW = total_demand / np.sum(h * F)
 
     # Compute daily load profiles
-    result = _daily_profiles(t_average, KW, h, F, hourly_factors, initial_day)
+    result = _daily_profiles(t_average, KW, h, F, hourly_factors, weekdays)
 
     # Transform to W instead of kWh
     return result * 1000 * 3600 / time_discretization
@@ -117,7 +125,7 @@ def _average_temperature(temperature, timesteps_day=24):
     return t_ambient_average
 
 
-def _daily_profiles(temperatures, KW, h, F, hourly_factors, initial_day):
+def _daily_profiles(temperatures, KW, h, F, hourly_factors, weekdays):
     """
     Parameters
     ----------
@@ -127,12 +135,13 @@ def _daily_profiles(temperatures, KW, h, F, hourly_factors, initial_day):
         Customer demand in kWh per day
     hourly_factors : dictionary
         Dictionary containing all hourly profile factors for types of houses.
-        First dimension holds the day of the week (see ``initial_day``), the
+        First dimension holds the day of the week (see ``weekdays``), the
         second dimension holds the temperature range
         (-15, -10, -5, 0, 5, 10, 15, 20, 25, else). The values at this level
         are arrays containing the factors for one day, starting with the
         time interval from 00:00 until 01:00.
-    initial_day : integer
+    weekdays : array-like
+        Weekday of each day
         - 0 : Monday
         - 1 : Tuesday
         - 2 : Wednesday
@@ -141,24 +150,19 @@ def _daily_profiles(temperatures, KW, h, F, hourly_factors, initial_day):
         - 5 : Saturday
         - 6 : Sunday
     """
-    # Initialization
-    result = []
     temperature_range = [-15, -10, -5, 0, 5, 10, 15, 20, 25, 100]
 
-    for day in range(len(temperatures)):
-        # Get the relative day (Monday, Tuesday... Sunday)
-        relative_day = (initial_day + day) % 7
-
-        # Get the appropriate temperature interval
-        for tr in temperature_range:
-            if temperatures[day] <= tr:
-                break
+    # Hourly factors as array (weekday x temperature interval x timestep)
+    factors = np.array([[hourly_factors[day, tr] for tr in temperature_range]
+                        for day in range(7)])
 
-        # Get hourly profile
-        profile = hourly_factors[relative_day, tr]
+    # Get the appropriate temperature interval of each day
+    intervals = np.searchsorted(temperature_range, temperatures, side="left")
+    intervals = np.minimum(intervals, len(temperature_range) - 1)
 
-        # Compute thermal demand profile
-        result.append(profile * KW * h[day] * F[day])
+    # Compute thermal demand profiles
+    result = (factors[np.asarray(weekdays), intervals] *
+              (KW * np.asarray(h) * np.asarray(F))[:, np.newaxis])
 
     # Transform result into 1-d array
     return np.reshape(result, -1)
@@ -0,0 +1,295 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Batched simulation of the states of many batteries and thermal energy
+storages.
+
+The kernels loop over the timesteps and compute each timestep for all
+storage units with numpy operations. Requested charging and discharging
+powers are limited, such that the states stay within the units' limits.
+"""
+
+from __future__ import division
+
+import numpy as np
+
+from pycity_base.classes.supply.thermal_energy_storage import \
+    ThermalEnergyStorage
+
+
+def _as_matrix(values):
+    """
+    Return ``values`` as two dimensional float array (units x timesteps)
+    without negative entries.
+    """
+    return np.maximum(np.atleast_2d(np.asarray(values, dtype=float)), 0)
+
+
+def _as_vector(values, nb_units):
+    """
+    Return ``values`` as float array with one entry per unit.
+    """
+    return np.broadcast_to(np.asarray(values, dtype=float), (nb_units,))
+
+
+def battery_soc(p_charge, p_discharge, soc_init, capacity,
+                time_discretization, self_discharge=0.01, eta_charge=0.95,
+                eta_discharge=0.95):
+    """
+    Compute the state of charge of many batteries.
+
+    Within each timestep, self discharge is applied first, followed by
+    discharging and charging. Discharging is limited by the stored energy,
+    charging by the remaining capacity.
+
+    Parameters
+    ----------
+    p_charge : array-like
+        Requested charging power in W (units x timesteps)
+    p_discharge : array-like
+        Requested discharging power in W (units x timesteps)
+    soc_init : float or array-like
+        Initial state of charge in J, one value per unit
+    capacity : float or array-like
+        Capacity in J, one value per unit
+    time_discretization : int
+        Timestep length in seconds
+    self_discharge : float or array-like, optional
+        Rate of self discharge per timestep (default: 0.01)
+    eta_charge : float or array-like, optional
+        Charging efficiency (default: 0.95)
+    eta_discharge : float or array-like, optional
+        Discharging efficiency (default: 0.95)
+
+    Returns
+    -------
+    soc : np.ndarray
+        State of charge in J at the end of each timestep (units x timesteps)
+    p_charge : np.ndarray
+        Realized charging power in W (units x timesteps)
+    p_discharge : np.ndarray
+        Realized discharging power in W (units x timesteps)
+    """
+    p_charge = _as_matrix(p_charge)
+    p_discharge = _as_matrix(p_discharge)
+    assert p_charge.shape == p_discharge.shape, ('p_charge and p_discharge ' +
+                                                 'must have the same shape')
+    (nb_units, timesteps) = p_charge.shape
+    dt = time_discretization
+
+    capacity = _as_vector(capacity, nb_units)
+    retention = 1 - _as_vector(self_discharge, nb_units)
+    eta_charge = _as_vector(eta_charge, nb_units)
+    eta_discharge = _as_vector(eta_discharge, nb_units)
+    energy = np.clip(_as_vector(soc_init, nb_units), 0, capacity)
+
+    soc = np.zeros((nb_units, timesteps))
+    realized_charge = np.zeros((nb_units, timesteps))
+    realized_discharge = np.zeros((nb_units, timesteps))
+
+    for t in range(timesteps):
+        energy = energy * retention
+
+        discharge = np.minimum(p_discharge[:, t],
+                               energy * eta_discharge / dt)
+        energy = energy - discharge * dt / eta_discharge
+
+        charge = np.minimum(p_charge[:, t],
+                            (capacity - energy) / (eta_charge * dt))
+        energy = np.clip(energy + charge * eta_charge * dt, 0, capacity)
+
+        soc[:, t] = energy
+        realized_charge[:, t] = charge
+        realized_discharge[:, t] = discharge
+
+    return (soc, realized_charge, realized_discharge)
+
+
+def tes_temperature(q_charge, q_discharge, t_init, capacity, t_max,
+                    time_discretization, t_surroundings=20, k_losses=3,
+                    t_min=None):
+    """
+    Compute the temperature of many (fully mixed) thermal energy storages.
+
+    Discharging is limited by the heat stored above ``t_min``, charging by
+    the heat that can be stored below ``t_max``. Thermal losses are taken
+    into account.
+
+    Parameters
+    ----------
+    q_charge : array-like
+        Requested charging heat flow in W (units x timesteps)
+    q_discharge : array-like
+        Requested discharging heat flow in W (units x timesteps)
+    t_init : float or array-like
+        Initial temperature in °C, one value per unit
+    capacity : float or array-like
+        Storage mass in kg, one value per unit
+    t_max : float or array-like
+        Maximum storage temperature in °C, one value per unit
+    time_discretization : int
+        Timestep length in seconds
+    t_surroundings : float or array-like, optional
+        Temperature of the storages' surroundings in °C (default: 20)
+    k_losses : float or array-like, optional
+        Storages' loss factor in W/K (default: 3)
+    t_min : float or array-like, optional
+        Minimum temperature in °C down to which the storages can be
+        discharged (default: None). If None, t_surroundings is used.
+
+    Returns
+    -------
+    t_sto : np.ndarray
+        Storage temperature in °C at the end of each timestep (units x
+        timesteps)
+    q_charge : np.ndarray
+        Realized charging heat flow in W (units x timesteps)
+    q_discharge : np.ndarray
+        Realized discharging heat flow in W (units x timesteps)
+    """
+    q_charge = _as_matrix(q_charge)
+    q_discharge = _as_matrix(q_discharge)
+    assert q_charge.shape == q_discharge.shape, ('q_charge and q_discharge ' +
+                                                 'must have the same shape')
+    (nb_units, timesteps) = q_charge.shape
+    dt = time_discretization
+
+    heat_capacity = (_as_vector(capacity, nb_units) *
+                     ThermalEnergyStorage.c_water)
+    t_max = _as_vector(t_max, nb_units)
+    t_surroundings = _as_vector(t_surroundings, nb_units)
+    k_losses = _as_vector(k_losses, nb_units)
+    if t_min is None:
+        t_min = t_surroundings
+    else:
+        t_min = _as_vector(t_min, nb_units)
+    temperature = np.array(_as_vector(t_init, nb_units))
+
+    t_sto = np.zeros((nb_units, timesteps))
+    realized_charge = np.zeros((nb_units, timesteps))
+    realized_discharge = np.zeros((nb_units, timesteps))
+
+    for t in range(timesteps):
+        losses = k_losses * (temperature - t_surroundings)
+
+        discharge = np.minimum(q_discharge[:, t],
+                               np.maximum(heat_capacity *
+                                          (temperature - t_min) / dt -
+                                          losses, 0))
+        charge = np.minimum(q_charge[:, t],
+                            np.maximum(heat_capacity *
+                                       (t_max - temperature) / dt +
+                                       losses + discharge, 0))
+
+        temperature = np.minimum(temperature +
+                                 (charge - discharge - losses) * dt /
+                                 heat_capacity,
+                                 np.maximum(t_max, temperature))
+
+        t_sto[:, t] = temperature
+        realized_charge[:, t] = charge
+        realized_discharge[:, t] = discharge
+
+    return (t_sto, realized_charge, realized_discharge)
+
+
+def simulate_batteries(batteries, p_charge, p_discharge, save_results=True):
+    """
+    Simulate many Battery objects for the current horizon.
+
+    Parameters
+    ----------
+    batteries : list
+        List of Battery objects. All batteries have to share the same timer.
+    p_charge : array-like
+        Requested charging power in W (units x timesteps_horizon)
+    p_discharge : array-like
+        Requested discharging power in W (units x timesteps_horizon)
+    save_results : bool, optional
+        Save the results with the batteries' setResults methods (default:
+        True). The batteries' total_soc, total_p_charge and
+        total_p_discharge arrays and their initial state of charge for the
+        next horizon are updated.
+
+    Returns
+    -------
+    soc : np.ndarray
+        State of charge in J (units x timesteps_horizon)
+    p_charge : np.ndarray
+        Realized charging power in W (units x timesteps_horizon)
+    p_discharge : np.ndarray
+        Realized discharging power in W (units x timesteps_horizon)
+    """
+    batteries = list(batteries)
+    parameters = np.array([(battery.soc_init,) + battery.getNominalValues()
+                           for battery in batteries], dtype=float)
+    timer = batteries[0].environment.timer
+
+    results = battery_soc(p_charge, p_discharge,
+                          soc_init=parameters[:, 0],
+                          capacity=parameters[:, 1],
+                          time_discretization=timer.time_discretization,
+                          self_discharge=parameters[:, 2],
+                          eta_charge=parameters[:, 3],
+                          eta_discharge=parameters[:, 4])
+
+    if save_results:
+        (soc, charge, discharge) = results
+        for (i, battery) in enumerate(batteries):
+            battery.setResults(soc[i], charge[i], discharge[i])
+
+    return results
+
+
+def simulate_thermal_storages(tes_units, q_charge, q_discharge, t_min=None,
+                              save_results=True):
+    """
+    Simulate many ThermalEnergyStorage objects for the current horizon.
+
+    Parameters
+    ----------
+    tes_units : list
+        List of ThermalEnergyStorage objects. All storages have to share the
+        same timer.
+    q_charge : array-like
+        Requested charging heat flow in W (units x timesteps_horizon)
+    q_discharge : array-like
+        Requested discharging heat flow in W (units x timesteps_horizon)
+    t_min : float or array-like, optional
+        Minimum temperature in °C down to which the storages can be
+        discharged (default: None). If None, the temperature of the
+        storages' surroundings is used.
+    save_results : bool, optional
+        Save the results with the storages' setResults methods (default:
+        True). The storages' total_t_sto arrays and their initial
+        temperatures for the next horizon are updated.
+
+    Returns
+    -------
+    t_sto : np.ndarray
+        Storage temperature in °C (units x timesteps_horizon)
+    q_charge : np.ndarray
+        Realized charging heat flow in W (units x timesteps_horizon)
+    q_discharge : np.ndarray
+        Realized discharging heat flow in W (units x timesteps_horizon)
+    """
+    tes_units = list(tes_units)
+    parameters = np.array([(tes.t_init,) + tes.getNominalValues()
+                           for tes in tes_units], dtype=float)
+    timer = tes_units[0].environment.timer
+
+    results = tes_temperature(q_charge, q_discharge,
+                              t_init=parameters[:, 0],
+                              capacity=parameters[:, 1],
+                              t_max=parameters[:, 2],
+                              time_discretization=timer.time_discretization,
+                              t_surroundings=parameters[:, 3],
+                              k_losses=parameters[:, 4],
+                              t_min=t_min)
+
+    if save_results:
+        t_sto = results[0]
+        for (i, tes) in enumerate(tes_units):
+            tes.setResults(t_sto[i])
+
+    return results
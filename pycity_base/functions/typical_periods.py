@@ -0,0 +1,412 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Aggregation of weather and district demands to typical periods.
+
+The periods (e.g. days or weeks) of the simulated time are clustered by
+their weather and district demand curves with k-means. Every cluster is
+represented by its medoid, i.e. the original period closest to the cluster
+center, so that the typical periods keep physically consistent profiles.
+Periods with extreme values (e.g. the day with the peak heating demand) may
+be added as additional typical periods.
+
+The reduced timer, weather and demands cover the typical periods one after
+another. Weights and the mapping of every original period to its typical
+period allow to expand results back to the full time.
+"""
+
+from __future__ import division
+
+import copy
+import numpy as np
+
+import pycity_base.classes.timer
+import pycity_base.classes.weather
+import pycity_base.classes.environment
+
+
+#  Weather quantities, which are used as features of the clustering
+weather_features = ('t_ambient', 'q_direct', 'q_diffuse', 'v_wind')
+
+#  District quantities, which are used as features of the clustering
+district_features = ('el', 'sh', 'sc', 'dhw', 'pv', 'wind')
+
+
+class TypicalPeriods(object):
+    """
+    Result of the aggregation to typical periods (see aggregate).
+
+    Attributes
+    ----------
+    environment : Environment object
+        Reduced environment. The timer covers all typical periods (one
+        horizon per typical period) and the weather holds the weather data
+        of the typical periods. Solar geometry refers to the reduced time
+        axis, use the aggregated 'pv' generation instead of computing PV
+        power with the reduced weather.
+    timesteps_period : int
+        Number of timesteps per period
+    period_indexes : np.array
+        Index of the original period of every typical period
+    weights : np.array
+        Number of original periods represented by every typical period. An
+        incomplete last period counts with its share of timesteps.
+    assignment : np.array
+        Index of the typical period of every original period
+    nodes : list
+        Node ids of the buildings (rows of the demand matrices)
+    demands : dict
+        Reduced district data: demand type ('el', 'sh', 'sc', 'dhw') as key
+        and demand matrix in W (buildings x reduced timesteps) as value;
+        'pv' and 'wind' as key and total generation in W as value
+    """
+
+    def __init__(self, environment, timesteps_total, timesteps_period,
+                 period_indexes, weights, assignment):
+        self._kind = "typicalperiods"
+
+        self.environment = environment
+        self.timesteps_total = timesteps_total
+        self.timesteps_period = timesteps_period
+        self.period_indexes = period_indexes
+        self.weights = weights
+        self.assignment = assignment
+        self.nodes = []
+        self.demands = {}
+
+        offsets = np.arange(timesteps_period)
+        #  Original timestep of every reduced timestep
+        self.reduced_index = (period_indexes[:, None] * timesteps_period +
+                              offsets).ravel()
+        #  Reduced timestep of every original timestep
+        timesteps = np.arange(timesteps_total)
+        self.full_index = (assignment[timesteps // timesteps_period] *
+                           timesteps_period + timesteps % timesteps_period)
+
+    @property
+    def kind(self):
+        return self._kind
+
+    @property
+    def nb_periods(self):
+        """
+        Number of typical periods.
+        """
+        return len(self.period_indexes)
+
+    @property
+    def timestep_weights(self):
+        """
+        Weight of every reduced timestep (see weights), e.g. to compute
+        annual sums: np.sum(values * timestep_weights).
+        """
+        return np.repeat(self.weights, self.timesteps_period)
+
+    def reduce(self, values):
+        """
+        Reduce a time series of the full time to the typical periods.
+
+        Parameters
+        ----------
+        values : array-like
+            Values of all original timesteps (last axis)
+
+        Returns
+        -------
+        reduced_values : np.array
+            Values of the reduced timesteps (last axis)
+        """
+        values = np.asarray(values)
+        assert values.shape[-1] >= self.timesteps_total, \
+            'values have to cover all timesteps.'
+        return values[..., self.reduced_index]
+
+    def expand(self, values):
+        """
+        Expand a time series of the typical periods to the full time.
+
+        Every original period gets the values of its typical period.
+
+        Parameters
+        ----------
+        values : array-like
+            Values of the reduced timesteps (last axis), e.g. results of an
+            optimization with the reduced environment
+
+        Returns
+        -------
+        full_values : np.array
+            Values of all original timesteps (last axis)
+        """
+        values = np.asarray(values)
+        assert values.shape[-1] == len(self.reduced_index), \
+            'values have to cover all reduced timesteps.'
+        return values[..., self.full_index]
+
+
+def _get_features(city_district):
+    """
+    Return the (full time) series of all clustering features.
+    """
+    environment = city_district.environment
+    timesteps_total = environment.timer.timesteps_total
+
+    features = {}
+    for quantity in weather_features:
+        values = getattr(environment.weather, quantity, None)
+        if values is not None:
+            features[quantity] = np.asarray(values[:timesteps_total],
+                                             dtype=np.float64)
+    for demand_type in city_district.demand_types:
+        features[demand_type] = city_district.get_demand_matrix(
+            demand_type).sum(axis=0, dtype=np.float64)
+    features['pv'] = np.asarray(city_district.getPVPower(currentValues=False),
+                                dtype=np.float64)[:timesteps_total]
+    features['wind'] = np.asarray(
+        city_district.getWindEnergyConverterPower(currentValues=False),
+        dtype=np.float64)[:timesteps_total]
+    return features
+
+
+def _kmeans(data, nb_clusters, rng, max_iterations):
+    """
+    Cluster the rows of data with k-means (k-means++ initialization).
+
+    Returns the cluster of every row and the index of the medoid (row
+    closest to the cluster center) of every cluster.
+    """
+    nb_rows = data.shape[0]
+    centers = np.empty((nb_clusters, data.shape[1]))
+    centers[0] = data[rng.integers(nb_rows)]
+    distances = np.sum((data - centers[0]) ** 2, axis=1)
+    for i in range(1, nb_clusters):
+        if np.sum(distances) > 0:
+            index = rng.choice(nb_rows, p=distances / np.sum(distances))
+        else:
+            index = rng.integers(nb_rows)
+        centers[i] = data[index]
+        distances = np.minimum(distances,
+                               np.sum((data - centers[i]) ** 2, axis=1))
+
+    clusters = None
+    for iteration in range(max_iterations):
+        distances = np.sum((data[:, None, :] - centers[None, :, :]) ** 2,
+                           axis=2)
+        new_clusters = np.argmin(distances, axis=1)
+        if clusters is not None and np.array_equal(clusters, new_clusters):
+            break
+        clusters = new_clusters
+        for i in range(nb_clusters):
+            members = clusters == i
+            if np.any(members):
+                centers[i] = data[members].mean(axis=0)
+            else:
+                #  Restart empty clusters at the worst represented row
+                worst = np.argmax(distances[np.arange(nb_rows), clusters])
+                centers[i] = data[worst]
+
+    medoids = np.empty(nb_clusters, dtype=int)
+    for i in range(nb_clusters):
+        members = np.flatnonzero(clusters == i)
+        if len(members) == 0:
+            members = np.arange(nb_rows)
+        distances = np.sum((data[members] - centers[i]) ** 2, axis=1)
+        medoids[i] = members[np.argmin(distances)]
+    return (clusters, medoids)
+
+
+def _reduce_environment(environment, reduced_index, timesteps_period):
+    """
+    Create the environment of the typical periods.
+    """
+    timer = environment.timer
+    timesteps_total = len(reduced_index)
+
+    reduced_timer = pycity_base.classes.timer.Timer(
+        time_discretization=timer.time_discretization,
+        timesteps_horizon=timesteps_period,
+        timesteps_used_horizon=timesteps_period,
+        timesteps_total=timesteps_total,
+        initial_day=timer.initial_day)
+    reduced_timer.set_dtype(timer.dtype, timer.int_dtype)
+
+    #  Calendar of the original timesteps and days
+    for attribute in ('timestep_hour', 'timestep_weekday', 'timestep_weekend',
+                      'timestep_holiday'):
+        setattr(reduced_timer, attribute,
+                getattr(timer, attribute)[reduced_index])
+    reduced_days = timer.timestep_day[
+        reduced_index[::max(int(86400 / timer.time_discretization), 1)]]
+    if len(reduced_days) == reduced_timer.total_days:
+        for attribute in ('day_weekday', 'day_weekend', 'day_holiday',
+                          'day_date'):
+            values = getattr(timer, attribute)
+            if values is not None:
+                setattr(reduced_timer, attribute, values[reduced_days])
+    reduced_timer.setCurrentValues(0, 0)
+
+    weather = copy.copy(environment.weather)
+    weather.timer = reduced_timer
+    #  The forecast provider (and its background threads) belongs to the
+    #  original weather and timesteps
+    weather._forecast_prefetcher = None
+    for quantity in pycity_base.classes.weather.quantities:
+        values = getattr(environment.weather, quantity, None)
+        if values is not None:
+            values = np.asarray(values[:timer.timesteps_total])
+            setattr(weather, quantity, values[reduced_index])
+        current = 'current_' + quantity
+        if hasattr(weather, current):
+            setattr(weather, current, np.zeros(timesteps_period))
+
+    return pycity_base.classes.environment.Environment(reduced_timer,
+                                                       weather,
+                                                       environment.prices)
+
+
+def aggregate(city_district, nb_periods, period_days=1, extreme_periods=(),
+              weights=None, seed=None, max_iterations=100):
+    """
+    Aggregate the weather and demands of a city district to typical periods.
+
+    Parameters
+    ----------
+    city_district : CityDistrict object
+        City district. Weather and demands of the complete simulated time
+        (timesteps_total of the district's timer) are aggregated.
+    nb_periods : int
+        Number of typical periods (including extreme periods)
+    period_days : int, optional
+        Length of the periods in days (default: 1). Use 7 for typical weeks.
+        If the simulated time is no multiple of the period length, the
+        incomplete last period is assigned to the typical period, whose
+        first part matches best.
+    extreme_periods : iterable of tuples, optional
+        Periods, which are added as separate typical periods (default: ()).
+        Each tuple consists of a feature name (see weather_features and
+        district_features) and 'max' or 'min', e.g. ('sh', 'max') for the
+        period with the peak space heating demand or ('t_ambient', 'min')
+        for the coldest period.
+    weights : dict, optional
+        Feature name as key and weight of the feature in the clustering as
+        value (default: None). Features without weight have weight 1.
+        All features are normalized to [0, 1] before weighting.
+    seed : int, optional
+        Seed of the random number generator of the k-means initialization
+        (default: None)
+    max_iterations : int, optional
+        Maximum number of k-means iterations (default: 100)
+
+    Returns
+    -------
+    typical_periods : TypicalPeriods object
+        Reduced environment and demands, weights and mapping of all
+        original periods to the typical periods
+
+    Examples
+    --------
+    >>> periods = aggregate(city_district, 12, extreme_periods=[('sh', 'max')])
+    >>> heat = periods.demands['sh'].sum(axis=0)
+    >>> annual_heat = np.sum(heat * periods.timestep_weights)
+    """
+    environment = city_district.environment
+    timer = environment.timer
+    timesteps_total = timer.timesteps_total
+    timesteps_period = int(period_days * 86400 / timer.time_discretization)
+    assert timesteps_period >= 1, 'period_days is too short.'
+    nb_full_periods = timesteps_total // timesteps_period
+    remainder = timesteps_total - nb_full_periods * timesteps_period
+    assert nb_full_periods >= 1, 'The timer has to cover at least one period.'
+
+    if weights is None:
+        weights = {}
+
+    #  Normalized and weighted features (one row per full period)
+    features = _get_features(city_district)
+    for name in weights:
+        assert name in features, 'Unknown feature ' + str(name)
+    columns = []
+    partial_columns = []
+    for (name, values) in sorted(features.items()):
+        value_range = np.max(values) - np.min(values)
+        if value_range == 0:
+            continue
+        normalized = (values - np.min(values)) / value_range
+        normalized *= weights.get(name, 1)
+        periods = normalized[:nb_full_periods * timesteps_period]
+        columns.append(periods.reshape(nb_full_periods, timesteps_period))
+        partial_columns.append(normalized[nb_full_periods * timesteps_period:])
+    if columns:
+        data = np.hstack(columns)
+    else:
+        data = np.zeros((nb_full_periods, 1))
+
+    #  Extreme periods
+    extremes = []
+    for (name, extreme) in extreme_periods:
+        assert name in features, 'Unknown feature ' + str(name)
+        assert extreme in ('max', 'min'), "Use 'max' or 'min'."
+        values = features[name][:nb_full_periods * timesteps_period]
+        if extreme == 'max':
+            index = int(np.argmax(values)) // timesteps_period
+        else:
+            index = int(np.argmin(values)) // timesteps_period
+        if index not in extremes:
+            extremes.append(index)
+
+    candidates = np.setdiff1d(np.arange(nb_full_periods), extremes)
+    nb_clusters = nb_periods - len(extremes)
+    assert nb_clusters >= 1, ('nb_periods has to be larger than the number '
+                              'of extreme periods.')
+    assert nb_clusters <= len(candidates), 'nb_periods is too large.'
+
+    rng = np.random.default_rng(seed)
+    (clusters, medoids) = _kmeans(data[candidates], nb_clusters, rng,
+                                  max_iterations)
+
+    #  Typical periods in chronological order
+    period_indexes = np.sort(np.concatenate((candidates[medoids],
+                                             extremes))).astype(int)
+    position = {index: i for (i, index) in enumerate(period_indexes)}
+    assignment = np.empty(nb_full_periods + (remainder > 0), dtype=int)
+    assignment[candidates] = [position[candidates[medoids[cluster]]]
+                              for cluster in clusters]
+    for index in extremes:
+        assignment[index] = position[index]
+
+    if remainder > 0:
+        #  Compare the incomplete period with the first part of the typical
+        #  periods
+        partial = np.concatenate(partial_columns) if columns else \
+            np.zeros(1)
+        nb_features = len(columns)
+        distances = []
+        for index in period_indexes:
+            if nb_features:
+                parts = data[index].reshape(nb_features, timesteps_period)
+                first_part = parts[:, :remainder].ravel()
+            else:
+                first_part = np.zeros(1)
+            distances.append(np.sum((first_part - partial) ** 2))
+        assignment[-1] = int(np.argmin(distances))
+
+    period_weights = np.bincount(assignment[:nb_full_periods],
+                                 minlength=len(period_indexes)).astype(float)
+    if remainder > 0:
+        period_weights[assignment[-1]] += remainder / timesteps_period
+
+    reduced_index = (period_indexes[:, None] * timesteps_period +
+                     np.arange(timesteps_period)).ravel()
+    typical_periods = TypicalPeriods(
+        _reduce_environment(environment, reduced_index, timesteps_period),
+        timesteps_total, timesteps_period, period_indexes, period_weights,
+        assignment)
+
+    typical_periods.nodes = city_district.get_list_build_entity_node_ids()
+    for demand_type in city_district.demand_types:
+        typical_periods.demands[demand_type] = typical_periods.reduce(
+            city_district.get_demand_matrix(demand_type))
+    for name in ('pv', 'wind'):
+        typical_periods.demands[name] = typical_periods.reduce(features[name])
+
+    return typical_periods
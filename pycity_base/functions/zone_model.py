@@ -11,6 +11,8 @@ from __future__ import division
 import numpy as np
 import numpy.linalg as linalg
 
+from pycity_base.functions import profiling
+
 
 def _solve(A, b):
     return linalg.solve(A, b)
@@ -208,6 +210,7 @@ def _calculateHeat(zone_parameters, zone_inputs, t_m_init, T_set, timestep=0):
     return (Q_HC, T_op, T_m, T_i, T_s)
    
    
+@profiling.profiled('zone_model')
 def calc(zone_parameters, zone_inputs, t_cooling_set, t_heating_set,
          limitHeating=np.inf, limitCooling=-np.inf, beQuiet=False):
     """
@@ -207,3 +207,59 @@ def create_building(create_environment, create_apartment):
     create_building = Build.Building(environment=create_environment)
     create_building.addEntity(entity=create_apartment)
     return create_building
+
+
+@pytest.fixture
+def create_loadcurve_citydist(create_environment):
+    """
+    Pytest fixture function to generate city district with three
+    res. buildings with constant, user defined load curves (method 0) on
+    positions (0, 0), (0, 10), (10, 10), one street node and one PV farm.
+    Building i (0, 1, 2) has an electrical demand of 100 * (i + 1) W, a
+    space heating demand of 1000 * (i + 1) W, a space cooling demand of
+    10 * (i + 1) W and a dhw demand of 50 * (i + 1) W.
+
+    Parameters
+    ----------
+    create_environment : object
+        Environment object (as fixture of pytest)
+
+    Returns
+    -------
+    create_loadcurve_citydist : object
+        CityDistrict object of PyCity
+    """
+    import numpy as np
+    import pycity_base.classes.demand.space_cooling as SpaceCooling
+    import pycity_base.classes.supply.photovoltaic as PV
+
+    timesteps_total = create_environment.timer.timesteps_total
+
+    create_loadcurve_citydist = citydist.CityDistrict()
+    create_loadcurve_citydist.environment = create_environment
+
+    positions = [point.Point(0, 0), point.Point(0, 10), point.Point(10, 10)]
+    for (i, position) in enumerate(positions):
+        ones = np.ones(timesteps_total)
+        apartment = App.Apartment(environment=create_environment)
+        apartment.addMultipleEntities([
+            ElectricalDemand.ElectricalDemand(create_environment, method=0,
+                                              loadcurve=ones * 100 * (i + 1)),
+            SpaceHeating.SpaceHeating(create_environment, method=0,
+                                      loadcurve=ones * 1000 * (i + 1)),
+            SpaceCooling.SpaceCooling(create_environment, method=0,
+                                      loadcurve=ones * 10 * (i + 1)),
+            DomesticHotWater.DomesticHotWater(create_environment, t_flow=60,
+                                              method=0,
+                                              loadcurve=ones * 50 * (i + 1))])
+        building = Build.Building(environment=create_environment)
+        building.addEntity(entity=apartment)
+        create_loadcurve_citydist.addEntity(entity=building,
+                                            position=position)
+
+    create_loadcurve_citydist.add_street_node(position=point.Point(5, 5))
+    create_loadcurve_citydist.addEntity(
+        entity=PV.PV(create_environment, method=0, area=10),
+        position=point.Point(20, 20))
+
+    return create_loadcurve_citydist
@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+# coding=utf-8
+"""
+Benchmark suite test.
+"""
+
+from __future__ import division
+
+import os
+import copy
+
+import pycity_base.benchmarks.benchmark_suite as bench
+
+
+class TestBenchmarks(object):
+    """
+    Test class for the benchmark suite.
+    """
+
+    def test_run_suite(self):
+        results = bench.run_suite(names=['change_resolution', 'photovoltaic'],
+                                  size='quick', repeat=2)
+
+        assert results['meta']['size'] == 'quick'
+        assert sorted(results['results']) == ['change_resolution',
+                                              'photovoltaic']
+        for result in results['results'].values():
+            assert result['status'] == 'ok'
+            assert len(result['times']) == 2
+            assert result['time'] == min(result['times'])
+            assert result['peak_memory'] > 0
+
+        #  Failing benchmarks are recorded instead of stopping the suite
+        def failing_setup(size):
+            def run():
+                raise IOError('missing input file')
+            return run
+
+        bench.benchmarks.append(('failing', failing_setup, None))
+        bench.benchmark_names.append('failing')
+        try:
+            results = bench.run_suite(names=['failing'], size='quick',
+                                      repeat=1)
+        finally:
+            bench.benchmarks.pop()
+            bench.benchmark_names.pop()
+        assert results['results']['failing']['status'] == 'error'
+        assert 'missing input file' in \
+            results['results']['failing']['message']
+
+    def test_compare_results(self):
+        baseline = {'meta': {'size': 'quick'},
+                    'results': {'a': {'status': 'ok', 'time': 1.0,
+                                      'peak_memory': 1000},
+                                'b': {'status': 'ok', 'time': 0.001,
+                                      'peak_memory': 1000},
+                                'c': {'status': 'error', 'message': ''}}}
+        results = copy.deepcopy(baseline)
+        assert bench.compare_results(results, baseline) == []
+
+        results['results']['a']['time'] = 1.5
+        results['results']['a']['peak_memory'] = 1050
+        #  Below the absolute threshold of the duration
+        results['results']['b']['time'] = 0.005
+        results['results']['c'] = {'status': 'ok', 'time': 10.0}
+        regressions = bench.compare_results(results, baseline)
+        assert [(r['name'], r['metric']) for r in regressions] == \
+            [('a', 'time')]
+        assert regressions[0]['ratio'] == 1.5
+
+    def test_main(self, tmp_path):
+        baseline_path = os.path.join(str(tmp_path), 'baseline.json')
+        args = ['change_resolution', '--quick', '--repeat', '1',
+                '--no-memory', '--baseline', baseline_path]
+
+        assert bench.main(args + ['--save']) == 0
+        baseline = bench.load_results(baseline_path)
+        assert baseline['results']['change_resolution']['status'] == 'ok'
+
+        #  Simulate a faster baseline
+        baseline['results']['change_resolution']['time'] = 1e-6
+        bench.save_results(baseline, baseline_path)
+        assert bench.main(args + ['--min-time', '0']) == 1
+        assert bench.main(args + ['--time-tolerance', '1e9']) == 0
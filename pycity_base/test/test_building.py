@@ -15,7 +15,8 @@ import pycity_base.classes.heating_curve as hcurve
 
 import pycity_base.classes.demand.apartment as Apartment
 from pycity_base.test.pycity_fixtures import create_environment, create_demands, \
-    create_apartment, create_building, create_occupancy
+    create_apartment, create_building, create_occupancy, \
+    create_loadcurve_citydist
 
 
 class TestBuilding():
@@ -96,3 +97,49 @@ class TestBuilding():
         assert all(building.get_electric_power_curve(currentValues=True) == 0)
         assert all(building.get_dhw_power_curve(currentValues=False) == 0)
         assert all(building.get_dhw_power_curve(currentValues=True) == 0)
+
+    def test_cached_power_curves(self, create_loadcurve_citydist):
+        city = create_loadcurve_citydist
+        building = city.nodes[1002]['entity']
+        timer = building.environment.timer
+
+        el_power = building.get_electric_power_curve(currentValues=False)
+        assert np.allclose(el_power, 200)
+        assert not el_power.flags.writeable
+        assert building.get_electric_power_curve(currentValues=False) is \
+            el_power
+
+        #  Horizon values are views into the full-year curves
+        (power_el, power_th_sh, power_th_sc) = building.get_power_curves()
+        assert len(power_th_sh) == timer.timesteps_horizon
+        assert np.shares_memory(
+            power_th_sh, building.get_power_curves(currentValues=False)[1])
+        assert np.allclose(power_th_sh, 2100)
+        assert np.allclose(power_th_sc, 20)
+
+        #  Adding entities invalidates the cached curves
+        city.use_demand_matrix = True
+        assert np.allclose(city.get_aggr_el_power_curve(), 600)
+        apartment = Apartment.Apartment(environment=building.environment)
+        apartment.addEntity(building.apartments[0].power_el)
+        building.addEntity(apartment)
+        assert np.allclose(building.get_electric_power_curve(), 400)
+        assert np.allclose(city.get_aggr_el_power_curve(), 800)
+
+        #  Changing load curves invalidates the cached curves
+        power_el = building.apartments[0].power_el
+        power_el.loadcurve = np.ones(timer.timesteps_total) * 500
+        assert np.allclose(building.get_electric_power_curve(), 1000)
+        assert np.allclose(city.get_aggr_el_power_curve(), 1400)
+        assert np.allclose(city.get_demand_matrix('el')[1], 1000)
+
+        #  Arrays modified in place after the last access require an
+        #  explicit invalidation
+        loadcurve = power_el.loadcurve
+        assert np.allclose(building.get_electric_power_curve(), 1000)
+        loadcurve[:] = 0
+        assert np.allclose(building.get_electric_power_curve(), 1000)
+        building.invalidate_power_curves()
+        assert np.allclose(building.get_electric_power_curve(), 0)
+        assert np.allclose(city.get_aggr_el_power_curve(), 400)
+
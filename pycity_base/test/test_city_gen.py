@@ -4,6 +4,11 @@
 City generator test.
 """
 
+import os
+import random
+
+import numpy as np
+
 from pycity_base.functions.scripts.city_generators import city_generator as citygen
 
 
@@ -12,3 +17,53 @@ class TestCityGen():
     def test_city_gen(self):
 
         citygen.run_city_generator()
+
+    def test_city_gen_parallel(self, tmpdir):
+        #  Two residential buildings with stochastic el. load profiles
+        src_path = os.path.join(os.path.dirname(citygen.__file__), 'input',
+                                'test_city_only_residential_buildings.txt')
+        with open(src_path) as src_file:
+            lines = src_file.readlines()[:3]
+        input_path = str(tmpdir.join('city.txt'))
+        with open(input_path, 'w') as input_file:
+            input_file.writelines(lines)
+
+        np.random.seed(0)
+        random.seed(0)
+        district_serial = citygen.run_city_generator(
+            input_name=input_path, use_el_slp=False, gen_dhw_profile=True,
+            nb_workers=1, chunksize=1, seed=1, verbose=False)
+        #  The random number generators of the caller are not reseeded
+        assert np.random.rand() == np.random.RandomState(0).rand()
+        assert random.random() == random.Random(0).random()
+        district_parallel = citygen.run_city_generator(
+            input_name=input_path, use_el_slp=False, gen_dhw_profile=True,
+            nb_workers=2, seed=1, verbose=False)
+
+        nodes = district_serial.get_list_build_entity_node_ids()
+        assert nodes == district_parallel.get_list_build_entity_node_ids()
+        assert len(nodes) == 2
+        for node in nodes:
+            building = district_parallel.nodes[node]['entity']
+            assert building.environment is district_parallel.environment
+            assert np.allclose(
+                district_serial.nodes[node]['entity'].get_electric_power_curve(),
+                building.get_electric_power_curve())
+            assert district_serial.nodes[node]['name'] == \
+                district_parallel.nodes[node]['name']
+
+        #  Profiles of different buildings differ
+        (node_1, node_2) = nodes
+        assert not np.allclose(
+            district_serial.nodes[node_1]['entity'].get_electric_power_curve(),
+            district_serial.nodes[node_2]['entity'].get_electric_power_curve())
+
+        #  Buildings of worker processes share the standardized base profiles
+        (apartment_1, apartment_2) = [
+            district_parallel.nodes[node]['entity'].apartments[0]
+            for node in nodes]
+        for attribute in ('demand_space_heating', 'demand_domestic_hot_water'):
+            profile_1 = getattr(apartment_1, attribute).get_base_profile()[0]
+            profile_2 = getattr(apartment_2, attribute).get_base_profile()[0]
+            assert np.shares_memory(profile_1, profile_2)
+            assert not profile_1.flags.writeable
@@ -11,7 +11,7 @@ import pycity_base.classes.city_district as citydist
 
 from pycity_base.test.pycity_fixtures import create_environment, \
     create_building, create_apartment, create_demands, \
-    create_empty_citydist, create_citydist
+    create_empty_citydist, create_citydist, create_loadcurve_citydist
 
 
 class TestCityDistrict(object):
@@ -89,3 +89,101 @@ class TestCityDistrict(object):
         assert (th_demand - 3 * 100 * 150 - ref_dwh_value) <= 0.001 * th_demand
 
     #  TODO: Add tests for RES, PV and Windpower
+
+    def test_entity_index(self, create_loadcurve_citydist):
+        city = create_loadcurve_citydist
+
+        assert city.get_list_build_entity_node_ids() == [1001, 1002, 1003]
+        assert city.get_node_numbers_of_entities(entity_name='pv') == [1005]
+        assert city.get_nb_of_building_entities() == 3
+        assert city.get_nb_occupants() == 0
+        assert np.allclose(city.get_aggr_el_power_curve(nodelist=[1003, 1004,
+                                                                  1001]),
+                           400)
+
+        #  Index follows node removal, copies and subgraphs
+        copy = city.copy()
+        city.remove_node(1002)
+        assert city.get_list_build_entity_node_ids() == [1001, 1003]
+        assert np.allclose(city.get_aggr_space_heating_power_curve(), 4000)
+        assert copy.get_nb_of_entities(entity_name='building') == 3
+        subcity = copy.subgraph([1002, 1004, 1005])
+        assert subcity.get_list_build_entity_node_ids() == [1002]
+
+        #  Index is rebuilt for objects without index (e.g. old pickles)
+        del copy.__dict__['_entity_index']
+        copy.nodes[1005]['entity'] = copy.nodes[1001]['entity']
+        assert copy.get_nb_of_entities(entity_name='building') == 4
+        assert copy.get_nb_of_entities(entity_name='pv') == 0
+
+    def test_demand_matrix(self, create_loadcurve_citydist):
+        city = create_loadcurve_citydist
+        timer = city.environment.timer
+
+        matrix = city.get_demand_matrix('sh')
+        assert matrix.shape == (3, timer.timesteps_total)
+        assert not matrix.flags.writeable
+        assert city.get_demand_matrix('sh') is matrix
+        subset = city.get_demand_matrix('el', currentValues=True,
+                                        nodelist=[1003, 1004, 1001])
+        assert subset.shape == (2, timer.timesteps_horizon)
+        assert np.allclose(subset[:, 0], [300, 100])
+
+        for (method, values) in [('get_aggr_el_power_curve', 600),
+                                 ('get_aggr_space_heating_power_curve', 6000),
+                                 ('get_aggr_space_cooling_power_curve', 60),
+                                 ('get_aggr_dhw_power_curve', 300)]:
+            expected = getattr(city, method)(currentValues=True)
+            city.use_demand_matrix = True
+            result = getattr(city, method)(currentValues=True)
+            city.use_demand_matrix = False
+            assert np.allclose(result, expected)
+            assert np.allclose(result, values)
+
+        #  Matrices are rebuilt after entities have changed
+        city.use_demand_matrix = True
+        city.remove_node(1001)
+        assert np.allclose(city.get_aggr_space_heating_power_curve(), 5000)
+        assert city.get_demand_matrix('sh').shape[0] == 2
+        assert np.allclose(city.get_aggr_el_power_curve(nodelist=[1002]), 200)
+
+    def test_forecast_tensor(self, create_loadcurve_citydist):
+        city = create_loadcurve_citydist
+        timer = city.environment.timer
+
+        (nodes, tensor) = city.get_forecast_tensor()
+        assert nodes == [1001, 1002, 1003, 1005]
+        assert tensor.shape == (4, 5, timer.timesteps_horizon)
+        assert not tensor.flags.writeable
+        assert np.allclose(tensor[:3, 0], [[100], [200], [300]])
+        assert np.allclose(tensor[:3, 1], [[1000], [2000], [3000]])
+        assert np.allclose(tensor[3, :4], 0)
+        assert np.allclose(tensor[:3, 4], 0)
+        assert np.allclose(tensor[3, 4], city.getPVPower())
+
+        #  Consecutive horizons are views of the same block
+        timer.current_timestep += timer.timesteps_used_horizon
+        (nodes, next_tensor) = city.get_forecast_tensor()
+        timer.current_timestep = 0
+        assert np.shares_memory(tensor, next_tensor)
+        (nodes, annual) = city.get_forecast_tensor(currentValues=False)
+        assert annual.flags.c_contiguous
+        assert annual.shape == (4, 5, timer.timesteps_total)
+        assert next_tensor.strides == annual.strides
+        assert np.allclose(next_tensor, annual[:, :, 96:288])
+
+        #  Changed generator parameters or weather invalidate the tensor
+        pv = city.node[1005]['entity']
+        pv_power = np.array(annual[3, 4])
+        pv.area *= 2
+        (nodes, annual) = city.get_forecast_tensor(currentValues=False)
+        assert np.allclose(annual[3, 4], 2 * pv_power)
+        pv.area /= 2
+        weather = city.environment.weather
+        (q_direct, q_diffuse) = (weather.q_direct, weather.q_diffuse)
+        (weather.q_direct, weather.q_diffuse) = (q_direct * 0, q_diffuse * 0)
+        (nodes, annual) = city.get_forecast_tensor(currentValues=False)
+        assert np.allclose(annual[3, 4], 0)
+        (weather.q_direct, weather.q_diffuse) = (q_direct, q_diffuse)
+        (nodes, annual) = city.get_forecast_tensor(currentValues=False)
+        assert np.allclose(annual[3, 4], pv_power)
@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+# coding=utf-8
+"""
+Device catalogue test.
+"""
+
+from __future__ import division
+
+import os
+import shutil
+import numpy as np
+
+import pycity_base.classes.supply.device_catalogue as dc
+import pycity_base.classes.supply.heat_pump as hp
+import pycity_base.classes.supply.photovoltaic as pv
+import pycity_base.classes.supply.wind_energy_converter as wec
+from pycity_base.test.pycity_fixtures import create_environment
+
+
+class TestDeviceCatalogue(object):
+    """
+    Test class for the device catalogue.
+    """
+
+    def test_parse_and_cache(self, tmp_path):
+        inputs = os.path.join(os.path.dirname(os.path.dirname(
+            os.path.abspath(__file__))), "inputs")
+        for filename in dc.source_files.values():
+            shutil.copy(os.path.join(inputs, filename), str(tmp_path))
+
+        catalogue = dc.DeviceCatalogue(path=str(tmp_path))
+        assert catalogue.get_models("heatpump") == ["Dimplex_LA9TU",
+                                                    "Dimplex_LA12TU"]
+        assert len(catalogue.get_models("pv")) == 4
+        assert catalogue.get_index("windenergyconverter",
+                                   "ENERCON_E_126") == 8
+        assert os.path.exists(catalogue.cache_file)
+
+        parameters = catalogue.get_heatpump_parameters("Dimplex_LA9TU")
+        assert parameters["t_max"] == 60
+        assert np.allclose(parameters["t_flow"], [35, 45, 55])
+        assert np.allclose(parameters["t_ambient"],
+                           [-20, -15, -7, 2, 7, 10, 12, 20])
+        assert parameters["heat"].shape == (8, 3)
+        assert parameters["heat"][0, 0] == 2960
+        assert parameters["cop"][0, 0] == 1.86
+        assert np.allclose(parameters["power"],
+                           parameters["heat"] / parameters["cop"])
+
+        parameters = catalogue.get_wind_energy_converter_parameters(
+            "ENERCON_E_44")
+        assert parameters["hub_height"] == 45
+        assert parameters["velocity"][0] == 1
+        assert parameters["power"][3] == 20000
+
+        #  A second catalogue uses the binary cache
+        cached = dc.DeviceCatalogue(path=str(tmp_path))
+        cached._parse = None
+        assert (cached.get_pv_parameters(1) ==
+                catalogue.get_pv_parameters("SolarWorld_SW290"))
+        assert cached.get_pv_parameters(1)["area"] == 1.676675
+
+        #  Outdated caches are refreshed
+        filename = os.path.join(str(tmp_path), dc.source_files["pv"])
+        os.utime(filename, (0, 0))
+        refreshed = dc.DeviceCatalogue(path=str(tmp_path))
+        assert refreshed._read_cache(np.zeros(3)) is None
+        assert refreshed.get_pv_parameters(1)["eta_noct"] > 0
+
+    def test_from_catalogue(self, create_environment, tmp_path):
+        catalogue = dc.DeviceCatalogue(
+            cache_file=os.path.join(str(tmp_path), "catalogue.npz"))
+
+        heater = hp.Heatpump.from_catalogue(create_environment,
+                                            "Dimplex_LA12TU",
+                                            lower_activation_limit=0.5,
+                                            catalogue=catalogue)
+        assert heater.kind == "heatpump"
+        assert heater.lower_activation_limit == 0.5
+        flow_temperature = np.ones(create_environment.timer.timesteps_horizon)
+        (p_nominal, q_nominal, t_max, lal) = heater.getNominalValues(
+            flow_temperature * 45)
+        assert np.all(q_nominal > 0)
+        assert t_max == 60
+
+        pv_unit = pv.PV.from_catalogue(create_environment, "SolarWorld_SW290",
+                                       number_modules=10, beta=30,
+                                       catalogue=catalogue)
+        assert np.isclose(pv_unit.area, 16.76675)
+        assert pv_unit.radiation_noct == 800
+        assert np.all(pv_unit.getPower() >= 0)
+
+        turbine = wec.WindEnergyConverter.from_catalogue(
+            create_environment, "ENERCON_E_126", catalogue=catalogue)
+        assert turbine.hub_height > 0
+        assert np.all(turbine.getPower() >= 0)
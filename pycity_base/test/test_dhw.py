@@ -10,6 +10,10 @@ import numpy as np
 import copy
 
 import pycity_base.classes.demand.domestic_hot_water as dhw
+import pycity_base.classes.environment as env
+import pycity_base.classes.prices as price
+import pycity_base.classes.timer as time
+import pycity_base.classes.weather as weath
 from pycity_base.test.pycity_fixtures import create_environment, create_occupancy
 
 
@@ -90,6 +94,18 @@ class TestDomesticHotWater(object):
         assert (av_daily_dhw_volume >= 45)
         assert (dhw_stochastical is not None)
 
+    def test_method2_short_timer(self, create_occupancy):
+        #  The profile is generated for the full year of occupancy data
+        timer = time.Timer(time_discretization=3600, timesteps_total=168)
+        environment = env.Environment(timer, weath.Weather(timer),
+                                      price.Prices())
+        dhw_stochastical = dhw.DomesticHotWater(
+            environment, t_flow=60, thermal=True, method=2,
+            supply_temperature=20, occupancy=create_occupancy.occupancy)
+
+        assert len(dhw_stochastical.water) == 8760
+        assert np.sum(dhw_stochastical.water) > 0
+
     def test_method3(self, create_environment):
         """
         Test method for IEA annex 42 domestic hot water profile generator
@@ -0,0 +1,134 @@
+#!/usr/bin/env python
+# coding=utf-8
+"""
+Rule-based dispatch test.
+"""
+
+from __future__ import division
+
+import numpy as np
+import pytest
+
+import pycity_base.classes.supply.building_energy_system as bes
+import pycity_base.classes.supply.boiler as boil
+import pycity_base.classes.supply.combined_heat_power as chp
+import pycity_base.classes.supply.electrical_heater as eh
+import pycity_base.classes.supply.heat_pump as hp
+import pycity_base.classes.supply.thermal_energy_storage as tes
+import pycity_base.functions.dispatch as dispatch
+from pycity_base.test.pycity_fixtures import create_environment
+
+
+class TestDispatch(object):
+    """
+    Test class for the rule-based dispatch of building energy systems.
+    """
+
+    def test_heat_led(self, create_environment):
+        timer = create_environment.timer
+        timesteps = timer.timesteps_horizon
+        q_demand = np.tile(np.linspace(0, 12000, timesteps), (3, 1))
+
+        #  Boiler only
+        bes_1 = bes.BES(create_environment)
+        bes_1.addDevice(boil.Boiler(create_environment, 10000, 0.8))
+
+        #  CHP unit, boiler and thermal storage
+        bes_2 = bes.BES(create_environment)
+        bes_2.addMultipleDevices([
+            chp.CHP(create_environment, 1000, 2000, 0.9,
+                    lower_activation_limit=0.5),
+            boil.Boiler(create_environment, 10000, 0.8),
+            tes.ThermalEnergyStorage(create_environment, 60, 500, 80,
+                                     k_losses=3)])
+
+        #  Heat pump and electrical heater
+        heat = np.array([[4000, 3000], [6000, 5000]])
+        power = np.array([[1000, 1500], [1000, 1250]])
+        bes_3 = bes.BES(create_environment)
+        bes_3.addMultipleDevices([
+            hp.Heatpump(create_environment, np.array([-20, 40]),
+                        np.array([35, 55]), heat, power, heat / power, 55,
+                        lower_activation_limit=0),
+            eh.ElectricalHeater(create_environment, 3000, 0.99)])
+
+        bes_units = [bes_1, bes_2, bes_3]
+        results = dispatch.dispatch_bes(bes_units, q_demand)
+
+        #  Energy balance of each building
+        q_generated = sum(results["q_" + kind]
+                          for kind in dispatch.generators)
+        t_sto = np.hstack((np.array([[0], [60], [0]]), results["t_sto"]))
+        q_storage = (np.diff(t_sto, axis=1) * 500 * dispatch.c_water /
+                     timer.time_discretization)
+        q_storage[[0, 2]] = 0
+        q_losses = 3 * (t_sto[1, :-1] - 20)
+        assert np.allclose(q_generated[0] + results["q_unmet"][0],
+                           q_demand[0])
+        assert np.allclose(q_generated[1] + results["q_unmet"][1],
+                           q_demand[1] + q_storage[1] + q_losses)
+        assert np.allclose(q_generated[2] + results["q_unmet"][2],
+                           q_demand[2])
+
+        #  Boiler covers demand up to its nominal power
+        assert np.allclose(results["q_boiler"][0],
+                           np.minimum(q_demand[0], 10000))
+        assert np.allclose(results["q_unmet"][0],
+                           np.maximum(q_demand[0] - 10000, 0))
+
+        #  CHP unit respects its lower activation limit
+        q_chp = results["q_chp"][1]
+        assert np.all((q_chp == 0) | (q_chp >= 1000))
+        assert np.all(results["t_sto"][1] <= 80)
+        assert np.allclose(results["p_chp"][1], q_chp / 2)
+        assert np.allclose(results["fuel"][1],
+                           results["q_boiler"][1] / 0.8 + q_chp * 1.5 / 0.9)
+
+        #  Heat pump with electrical heater as peak load unit
+        assert np.all(results["q_heatpump"][2, 1:] > 0)
+        assert np.all(results["p_heatpump"][2] <= 1500)
+        assert np.allclose(results["q_electricalheater"][2],
+                           np.minimum(q_demand[2] -
+                                      results["q_heatpump"][2], 3000))
+
+        #  Results are saved in the devices
+        (p_output, q_output, schedule) = bes_2.chp_units[0].getResults(True)
+        used = timer.timesteps_used_horizon
+        assert np.allclose(q_output, q_chp[:used])
+        assert np.allclose(schedule, q_chp[:used] > 0)
+        assert bes_2.tes_units[0].t_init == results["t_sto"][1, used - 1]
+
+    def test_electricity_led(self, create_environment):
+        timesteps = create_environment.timer.timesteps_horizon
+
+        system = bes.BES(create_environment)
+        system.addMultipleDevices([
+            chp.CHP(create_environment, 1000, 2000, 0.9,
+                    lower_activation_limit=0.5),
+            boil.Boiler(create_environment, 10000, 0.8),
+            tes.ThermalEnergyStorage(create_environment, 60, 500, 80)])
+
+        q_demand = np.ones(timesteps) * 500
+        p_demand = np.ones(timesteps) * 800
+        results = system.dispatch(q_demand, p_demand=p_demand,
+                                  strategy="electricity", save_results=False)
+
+        #  CHP unit follows the electrical demand and charges the storage
+        assert results["q_chp"][0] == 1600
+        assert results["p_chp"][0] == 800
+        assert results["t_sto"][0] > 60
+        assert np.all(results["t_sto"] <= 80)
+        assert results["q_chp"].shape == (timesteps,)
+
+    def test_square_shape(self):
+        #  As many buildings as timesteps: 1-D values are per building
+        (q_output, t_sto, q_unmet) = dispatch.dispatch_heat(
+            np.ones((3, 3)) * 1000, {'boiler': [0, 500, 2000]}, {}, 900)
+        assert np.allclose(q_output['boiler'], [[0] * 3, [500] * 3,
+                                                [1000] * 3])
+        assert np.allclose(q_unmet, [[1000] * 3, [500] * 3, [0] * 3])
+
+        #  Per-timestep values require an array (buildings x timesteps)
+        with pytest.raises(AssertionError):
+            dispatch.dispatch_heat(np.ones((2, 3)), {'boiler': [1, 2, 3]},
+                                   {}, 900)
@@ -0,0 +1,133 @@
+#!/usr/bin/env python
+# coding=utf-8
+"""
+Columnar district storage test.
+"""
+
+from __future__ import division
+
+import os
+
+import numpy as np
+import pytest
+import shapely.geometry.point as point
+
+import pycity_base.classes.building as build
+import pycity_base.classes.city_district as citydist
+import pycity_base.classes.demand.apartment as apart
+import pycity_base.classes.demand.occupancy as occ
+import pycity_base.classes.demand.space_heating as sh
+import pycity_base.functions.district_storage as storage
+import pycity_base.functions.lazy_generation as lazy_gen
+from pycity_base.test.pycity_fixtures import create_environment, \
+    create_loadcurve_citydist
+
+
+class TestDistrictStorage(object):
+    """
+    Test class for saving and loading city districts in the columnar format.
+    """
+
+    @pytest.mark.parametrize('compress', [False, True])
+    def test_save_load(self, create_loadcurve_citydist, tmpdir, compress):
+        city = create_loadcurve_citydist
+        nodes = city.get_list_build_entity_node_ids()
+        path = str(tmpdir.join('district'))
+
+        storage.save_city_district(city, path, compress=compress)
+
+        loaded = storage.load_city_district(path)
+        assert loaded.get_list_build_entity_node_ids() == nodes
+        assert sorted(loaded.nodes()) == sorted(city.nodes())
+        assert loaded.get_nb_of_entities('pv') == 1
+        assert np.allclose(loaded.get_aggr_el_power_curve(),
+                           city.get_aggr_el_power_curve())
+        assert np.allclose(loaded.get_aggr_space_heating_power_curve(),
+                           city.get_aggr_space_heating_power_curve())
+        assert np.allclose(loaded.environment.weather.t_ambient,
+                           city.environment.weather.t_ambient)
+
+        #  All entities share the loaded environment
+        for n in nodes:
+            assert loaded.nodes[n]['entity'].environment is \
+                loaded.environment
+            assert loaded.nodes[n]['position'] == city.nodes[n]['position']
+
+    def test_save_load_pending(self, create_environment, tmpdir):
+        city = citydist.CityDistrict()
+        city.environment = create_environment
+        apartment = apart.Apartment(create_environment)
+        apartment.addMultipleEntities([
+            occ.Occupancy(create_environment, number_occupants=2, lazy=True),
+            sh.SpaceHeating(create_environment, method=1, living_area=100,
+                            specific_demand=150, lazy=True)])
+        building = build.Building(create_environment)
+        building.addEntity(apartment)
+        node = city.addEntity(entity=building, position=point.Point(0, 0))
+        lazy_gen.assign_seeds(city, 1)
+        path = str(tmpdir.join('district'))
+
+        #  Deferred profiles are saved with their inputs (not generated)
+        storage.save_city_district(city, path)
+        assert len(lazy_gen.get_pending_objects(city)) == 2
+        store = storage.DistrictStore(path)
+        assert store.load_profiles(node, 'occupancy') == []
+        assert store.load_profiles(node, 'sh') == []
+
+        loaded = store.load_city_district()
+        assert len(lazy_gen.get_pending_objects(loaded)) == 2
+        assert lazy_gen.generate_pending(loaded) == 2
+        assert lazy_gen.generate_pending(city) == 2
+        loaded_apartment = loaded.nodes[node]['entity'].apartments[0]
+        assert np.array_equal(loaded_apartment.occupancy.occupancy,
+                              apartment.occupancy.occupancy)
+        assert np.allclose(loaded.get_aggr_space_heating_power_curve(),
+                           city.get_aggr_space_heating_power_curve())
+
+    def test_lazy_loading(self, create_loadcurve_citydist, tmpdir):
+        city = create_loadcurve_citydist
+        nodes = city.get_list_build_entity_node_ids()
+        path = str(tmpdir.join('district'))
+
+        #  Share one load curve between two buildings
+        apartment_0 = city.nodes[nodes[0]]['entity'].apartments[0]
+        apartment_1 = city.nodes[nodes[1]]['entity'].apartments[0]
+        apartment_1.power_el.loadcurve = apartment_0.power_el.loadcurve
+
+        storage.save_city_district(city, path)
+
+        store = storage.DistrictStore(path)
+        assert store.nodes[:3] == nodes
+        assert store.get_entity_kind(nodes[0]) == 'building'
+
+        #  Shared arrays are stored once
+        timesteps = city.environment.timer.timesteps_total
+        (stack,) = [key for (key, (dtype, shape, nb_rows)) in
+                    store.metadata['stacks'].items()
+                    if tuple(shape) == (timesteps,) and dtype == 'float64']
+        profiles = store.metadata['profiles']
+        assert profiles[nodes[0]]['el'] == profiles[nodes[1]]['el']
+        assert profiles[nodes[0]]['sh'] != profiles[nodes[1]]['sh']
+        assert os.path.exists(os.path.join(path, 'arrays', stack + '.bin'))
+
+        #  Profiles are memory mapped rows of the stacks
+        (profile,) = store.load_profiles(nodes[2], 'sh')
+        assert np.allclose(profile, 3000)
+        assert isinstance(store.get_stack(stack), np.memmap)
+        assert not store._entities
+
+        (el_0,) = store.load_profiles(nodes[0], 'el')
+        (el_1,) = store.load_profiles(nodes[1], 'el')
+        assert np.shares_memory(el_0, el_1)
+
+        #  Single buildings are loaded on demand
+        building = store.load_entity(nodes[1])
+        assert list(store._entities) == [nodes[1]]
+        assert np.allclose(building.get_electric_power_curve(), 100)
+        assert building.environment is store.load_environment()
+
+        #  Copy-on-write: changes are not written to disk
+        building.apartments[0].demand_space_heating.loadcurve[:] = 0
+        (profile,) = storage.DistrictStore(path).load_profiles(nodes[1],
+                                                                'sh')
+        assert np.allclose(profile, 2000)
@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+# coding=utf-8
+"""
+Forecast-error ensemble test.
+"""
+
+from __future__ import division
+
+import numpy as np
+
+import pycity_base.classes.timer as ti
+import pycity_base.functions.forecast_ensemble as fens
+import pycity_base.functions.rolling_horizon as rolling
+from pycity_base.test.pycity_fixtures import create_environment, \
+    create_loadcurve_citydist
+
+
+class TestForecastEnsemble(object):
+    """
+    Test class for the forecast-error ensembles.
+    """
+
+    def test_statistics(self):
+        timer = ti.Timer(time_discretization=3600, timesteps_horizon=48,
+                         timesteps_used_horizon=24, timesteps_total=8760)
+        model = fens.ForecastErrorModel(2.0, correlation_time=5.0)
+        ensemble = fens.ForecastEnsemble(timer, {'t_ambient': model}, seed=3)
+
+        members = ensemble.generate(np.ones(48) * 10, 't_ambient', 20000)
+        errors = members - 10
+        assert members.shape == (20000, 48)
+        assert np.allclose(errors.mean(axis=0), 0, atol=0.1)
+        assert np.allclose(errors.std(axis=0), 2, rtol=0.05)
+        correlation = np.corrcoef(errors[:, 10], errors[:, 11])[0, 1]
+        assert np.isclose(correlation, np.exp(-1 / 5), atol=0.03)
+
+        #  Reproducible per timestep, independent of the order of the calls
+        ensemble.generate(np.zeros(48), 'q_direct', 5)
+        again = ensemble.generate(np.ones(48) * 10, 't_ambient', 20000)
+        assert np.array_equal(members, again)
+        timer.update()
+        assert not np.array_equal(
+            members, ensemble.generate(np.ones(48) * 10, 't_ambient', 20000))
+
+    def test_relative_errors(self):
+        timer = ti.Timer(time_discretization=900, timesteps_total=35040)
+        ensemble = fens.ForecastEnsemble(timer, seed=0)
+        forecast = np.zeros(timer.timesteps_horizon)
+        forecast[40:60] = 500
+
+        members = ensemble.generate(forecast, 'q_direct', 100)
+        assert np.all(members[:, forecast == 0] == 0)
+        assert np.all(members >= 0)
+        #  Error grows with the lead time
+        sigma = ensemble.error_models['q_direct'].get_sigma(
+            np.arange(1, 193) / 4)
+        assert sigma[-1] > sigma[0]
+
+    def test_rolling_horizon_forecast(self, create_loadcurve_citydist):
+        city = create_loadcurve_citydist
+        timer = city.environment.timer
+        ensemble = fens.ForecastEnsemble(timer, seed=1)
+
+        forecast = rolling.get_forecast(city)
+        ensembles = ensemble.generate_all(forecast, 10)
+        assert ensembles['weather']['t_ambient'].shape == (10, 192)
+        assert ensembles['sh'].shape == (10, 3, 192)
+        assert ensembles['pv'].shape == (10, 192)
+
+        weather = ensemble.generate_weather(city.environment.weather, 10)
+        assert np.array_equal(weather['t_ambient'],
+                              ensembles['weather']['t_ambient'])
@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+# coding=utf-8
+"""
+Forecast provider test.
+"""
+
+from __future__ import division
+
+import time
+import pickle
+import socket
+import asyncio
+
+import numpy as np
+import pytest
+
+import pycity_base.classes.forecast_provider as fp
+import pycity_base.classes.timer as ti
+import pycity_base.classes.weather as we
+
+
+class TestForecastProvider(object):
+    """
+    Test class for the asynchronous forecast providers.
+    """
+
+    def test_local_provider(self):
+        data = {'t_ambient': np.arange(10.0)}
+        provider = fp.LocalForecastProvider(data, latency=0.001)
+
+        forecast = asyncio.run(provider.fetch(8, 4))
+        assert list(forecast['t_ambient']) == [8.0, 9.0]
+
+    def test_remote_provider_timeout(self):
+        data = {'t_ambient': np.arange(1000.0)}
+
+        async def fetch(provider):
+            with pytest.raises(asyncio.TimeoutError):
+                await provider.fetch(0, 3)
+            #  The late response of the first request is not returned
+            provider.timeout = 10.0
+            forecast = await provider.fetch(500, 3)
+            await provider.close()
+            return forecast
+
+        with fp.ForecastServer(data, latency=0.2) as server:
+            provider = fp.RemoteForecastProvider(server.host, server.port,
+                                                 timeout=0.1)
+            forecast = asyncio.run(fetch(provider))
+            assert list(forecast['t_ambient']) == [500.0, 501.0, 502.0]
+
+            #  Open connections are closed, when the server is stopped
+            client = socket.create_connection((server.host, server.port))
+            for i in range(100):
+                if server._tasks:
+                    break
+                time.sleep(0.01)
+            assert len(server._tasks) == 1
+        assert not server._tasks
+        assert client.recv(1) == b''
+        client.close()
+
+    def test_weather_with_server(self):
+        timer = ti.Timer(time_discretization=3600, timesteps_horizon=48,
+                         timesteps_used_horizon=24, timesteps_total=8760)
+        weather = we.Weather(timer)
+
+        with fp.ForecastServer(weather, latency=0.01) as server:
+            provider = fp.RemoteForecastProvider(server.host, server.port)
+            weather.set_forecast_provider(provider, prefetch=2)
+            prefetcher = weather.forecast_prefetcher
+
+            for day in range(5):
+                (t_ambient, q_direct) = weather.getWeatherForecast(
+                    getTAmbient=True, getQDirect=True)
+                horizon = slice(timer.current_timestep,
+                                timer.current_timestep + 48)
+                assert np.allclose(t_ambient, weather.t_ambient[horizon])
+                assert np.allclose(q_direct, weather.q_direct[horizon])
+                timer.update()
+
+            #  Only the first horizon has not been prefetched
+            assert prefetcher.misses == 1
+            assert prefetcher.hits == 4
+            assert len(prefetcher._cache) <= 4
+
+            #  Errors of the service are raised
+            with pytest.raises(ValueError):
+                prefetcher.get(-1, 48)
+
+            #  Weather objects with provider can be pickled (without it)
+            copied = pickle.loads(pickle.dumps(weather))
+            assert copied.forecast_prefetcher is None
+
+            weather.set_forecast_provider(None)
+            assert weather.forecast_prefetcher is None
+            assert server.nb_requests >= 6
+
+        (t_ambient,) = weather.getWeatherForecast(getTAmbient=True)
+        assert len(t_ambient) == 48
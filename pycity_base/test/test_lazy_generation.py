@@ -0,0 +1,128 @@
+#!/usr/bin/env python
+# coding=utf-8
+"""
+Deferred profile generation test.
+"""
+
+from __future__ import division
+
+import random
+
+import numpy as np
+
+import pycity_base.classes.building as build
+import pycity_base.classes.demand.apartment as apart
+import pycity_base.classes.demand.domestic_hot_water as dhw
+import pycity_base.classes.demand.occupancy as occ
+import pycity_base.classes.demand.space_heating as sh
+import pycity_base.functions.lazy_generation as lazy_gen
+from pycity_base.test.pycity_fixtures import create_environment
+
+
+class TestLazyGeneration(object):
+    """
+    Test class for demand objects with deferred profile generation.
+    """
+
+    def test_lazy_demands(self, create_environment):
+        space_heating = sh.SpaceHeating(create_environment, method=1,
+                                        living_area=100, specific_demand=150,
+                                        lazy=True)
+        hot_water = dhw.DomesticHotWater(create_environment, t_flow=60,
+                                         method=1, daily_consumption=70,
+                                         supply_temperature=25, lazy=True)
+        assert space_heating.is_pending
+        assert space_heating.kind == 'spaceheating'
+
+        #  The profile is generated on first access
+        power = space_heating.get_power(currentValues=False)
+        assert not space_heating.is_pending
+        assert space_heating.kind == 'spaceheating'
+        eager = sh.SpaceHeating(create_environment, method=1,
+                                living_area=100, specific_demand=150)
+        assert np.allclose(power, eager.get_power(currentValues=False))
+
+        assert hot_water.is_pending
+        assert np.allclose(hot_water.loadcurve,
+                           dhw.DomesticHotWater(create_environment, t_flow=60,
+                                                method=1,
+                                                daily_consumption=70,
+                                                supply_temperature=25
+                                                ).loadcurve)
+
+    def test_generate_pending(self, create_environment):
+        occupancy = occ.Occupancy(create_environment, number_occupants=3,
+                                  lazy=True)
+        assert occupancy.is_pending
+
+        apartment = apart.Apartment(create_environment)
+        apartment.addMultipleEntities([
+            occupancy,
+            sh.SpaceHeating(create_environment, method=1, living_area=100,
+                            specific_demand=150, lazy=True),
+            dhw.DomesticHotWater(create_environment, t_flow=60, method=1,
+                                 daily_consumption=70, supply_temperature=25,
+                                 lazy=True)])
+        building = build.Building(create_environment)
+        building.addEntity(apartment)
+
+        pending = lazy_gen.get_pending_objects(building)
+        assert [demand.kind for demand in pending] == \
+            ['occupancy', 'domestichotwater', 'spaceheating']
+
+        assert lazy_gen.generate_pending(building) == 3
+        assert lazy_gen.get_pending_objects(building) == []
+        assert len(occupancy.occupancy) == 365 * 144
+        assert np.max(occupancy.occupancy) <= 3
+        assert np.sum(building.get_space_heating_power_curve()) > 0
+
+    def test_generate_pending_parallel(self, create_environment):
+        def create_building():
+            building = build.Building(create_environment)
+            for i in range(2):
+                occupancy = occ.Occupancy(create_environment,
+                                          number_occupants=2, lazy=True)
+                apartment = apart.Apartment(create_environment)
+                apartment.addMultipleEntities([
+                    occupancy,
+                    dhw.DomesticHotWater(create_environment, t_flow=60,
+                                         method=2, supply_temperature=25,
+                                         occupancy=occupancy, lazy=True),
+                    sh.SpaceHeating(create_environment, method=1,
+                                    living_area=100 * (i + 1),
+                                    specific_demand=150, lazy=True)])
+                building.addEntity(apartment)
+            lazy_gen.assign_seeds(building, 5)
+            return building
+
+        serial = create_building()
+        parallel = create_building()
+        np.random.seed(0)
+        random.seed(0)
+        assert lazy_gen.generate_pending(serial) == 6
+        assert lazy_gen.generate_pending(parallel, nb_workers=2) == 6
+        #  The random number generators of the caller are not reseeded
+        assert np.random.rand() == np.random.RandomState(0).rand()
+        assert random.random() == random.Random(0).random()
+
+        #  Recorded seeds give the same profiles for any number of workers
+        for (apartment_1, apartment_2) in zip(serial.apartments,
+                                              parallel.apartments):
+            assert apartment_2.occupancy.environment is create_environment
+            assert np.array_equal(apartment_1.occupancy.occupancy,
+                                  apartment_2.occupancy.occupancy)
+            assert np.array_equal(
+                apartment_1.demand_domestic_hot_water.get_power(
+                    currentValues=False, returnTemperature=False),
+                apartment_2.demand_domestic_hot_water.get_power(
+                    currentValues=False, returnTemperature=False))
+        assert not np.array_equal(serial.apartments[0].occupancy.occupancy,
+                                  serial.apartments[1].occupancy.occupancy)
+
+        #  Standardized profiles of a group share one base profile
+        (base_1, scale_1) = serial.apartments[0].demand_space_heating.\
+            get_base_profile()
+        (base_2, scale_2) = parallel.apartments[1].demand_space_heating.\
+            get_base_profile()
+        assert base_1 is base_2
+        assert scale_2 == 2 * scale_1
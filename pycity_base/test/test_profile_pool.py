@@ -0,0 +1,162 @@
+#!/usr/bin/env python
+# coding=utf-8
+"""
+Profile pool test.
+"""
+
+from __future__ import division
+
+import numpy as np
+
+import pycity_base.classes.demand.apartment as apart
+import pycity_base.classes.demand.occupancy as occ
+import pycity_base.functions.scripts.profile_pool.get_profile_pool_access \
+    as pool
+from pycity_base.test.pycity_fixtures import create_environment
+
+
+def create_pool_files(path, nb_profiles=4, nb_days=2):
+    """
+    Save a small profile pool (1 and 2 occupants) as npz files.
+    """
+    for nb_occupants in (1, 2):
+        shape = (nb_profiles, nb_days * 1440)
+        el = np.arange(shape[0] * shape[1], dtype=float).reshape(shape)
+        np.savez(str(path.join(str(nb_occupants) + '_person_profiles.npz')),
+                 occ=np.ones((nb_profiles, nb_days * 144)) * nb_occupants,
+                 el=el * nb_occupants,
+                 dhw=np.ones(shape) * 100 * nb_occupants)
+
+
+class TestProfilePool(object):
+    """
+    Test class for the profile pool.
+    """
+
+    def test_npz_pool(self, tmpdir):
+        create_pool_files(tmpdir)
+        profile_pool = pool.ProfilePool(str(tmpdir))
+
+        #  Files are only loaded on first request
+        assert profile_pool.dict_data == {}
+        (occ, el, dhw) = profile_pool.get_occ_el_dhw_profile(2, rand_number=1)
+        assert list(profile_pool.dict_data) == [2]
+        assert np.allclose(occ, 2)
+        assert np.allclose(dhw, 200)
+        assert el[0] == 2 * 2880
+
+        #  Copies can be modified without changing the pool
+        el[:] = 0
+        assert profile_pool.get_random_profile(2, 'el', 1)[0] == 2 * 2880
+
+    def test_npy_pool(self, tmpdir):
+        create_pool_files(tmpdir)
+        npy_path = tmpdir.join('npy')
+        pool.convert_npz_to_npy(str(tmpdir), str(npy_path))
+        assert npy_path.join('1_person_el.npy').check()
+
+        profile_pool = pool.ProfilePool(str(npy_path))
+        assert profile_pool.get_nb_profiles() == 4
+
+        #  Views into the memory mapped pool
+        view = profile_pool.get_random_profile(1, 'el', 3, copy=False)
+        assert isinstance(profile_pool.dict_data[1]['el'], np.memmap)
+        assert np.shares_memory(view, profile_pool.dict_data[1]['el'])
+        assert not view.flags.writeable
+        assert view[0] == 3 * 2880
+
+        #  Resampled profiles are cached
+        hourly = profile_pool.get_random_profile(1, 'el', 3, copy=False,
+                                                 timestep=3600)
+        assert len(hourly) == 48
+        assert np.isclose(hourly[0], np.mean(view[:60]))
+        assert profile_pool.get_random_profile(1, 'el', 3, copy=False,
+                                               timestep=3600) is hourly
+        occ = profile_pool.get_random_profile(1, 'occ', 0, timestep=60)
+        assert len(occ) == 2880
+
+    def test_sample_profiles(self, tmpdir):
+        create_pool_files(tmpdir)
+        profile_pool = pool.ProfilePool(str(tmpdir))
+        nb_occupants = np.array([1, 2, 1, 1, 2, 1, 1, 1, 1, 2])
+
+        indexes = profile_pool.sample_profiles(nb_occupants, seed=1)
+        assert indexes.shape == (10,)
+        assert np.all((indexes >= 0) & (indexes < 4))
+        assert np.array_equal(
+            indexes, profile_pool.sample_profiles(nb_occupants, seed=1))
+
+        #  Without replacement, every profile is drawn before any repetition
+        indexes = profile_pool.sample_profiles(nb_occupants, replace=False,
+                                               seed=2)
+        single = indexes[nb_occupants == 1]
+        assert sorted(single[:4]) == [0, 1, 2, 3]
+        assert len(set(indexes[nb_occupants == 2])) == 3
+
+    def test_assign_profiles(self, tmpdir, create_environment):
+        create_pool_files(tmpdir)
+        profile_pool = pool.ProfilePool(str(tmpdir))
+
+        apartments = []
+        for nb_occupants in (1, 2, 2):
+            apartment = apart.Apartment(create_environment)
+            apartment.addEntity(occ.Occupancy(create_environment, nb_occupants,
+                                              do_profile=False))
+            apartments.append(apartment)
+
+        (nb_occupants, indexes) = profile_pool.assign_profiles(
+            apartments, replace=False, seed=3)
+        assert list(nb_occupants) == [1, 2, 2]
+        assert indexes[1] != indexes[2]
+
+        for (apartment, nb, index) in zip(apartments, nb_occupants, indexes):
+            assert np.allclose(apartment.occupancy.occupancy, nb)
+
+            #  Demand objects reference the (resampled) pool profiles
+            el = apartment.power_el
+            (profile, scale) = el.get_base_profile()
+            assert el.is_shared
+            assert scale == 1
+            assert len(profile) == 2 * 96
+            assert np.isclose(profile[0], nb * (index * 2880 + 7))
+            assert profile is profile_pool.get_random_profile(
+                nb, 'el', index, copy=False, timestep=900)
+            (profile, scale) = \
+                apartment.demand_domestic_hot_water.get_base_profile()
+            assert np.allclose(profile, 100 * nb)
+
+    def test_generate_profile_pool(self, tmpdir):
+        import pycity_base.functions.scripts.profile_pool.gen_profile_pool \
+            as gen_pool
+
+        path = str(tmpdir)
+        gen_pool.generate_profile_pool(path=path, runs=2, timestep=3600,
+                                       seed=1, occupants=(2,),
+                                       save_npz=False)
+
+        done = np.load(str(tmpdir.join('2_person_done.npy')))
+        assert np.all(done)
+        el = np.load(str(tmpdir.join('2_person_el.npy')))
+        assert el.shape == (2, 8760)
+        assert np.all(np.sum(el, axis=1) > 0)
+
+        #  Simulate an interruption after the first run
+        el_done = np.load(str(tmpdir.join('2_person_el.npy')), mmap_mode='r+')
+        el_done[0] = -1
+        el_done[1] = 0
+        el_done.flush()
+        done[1] = False
+        np.save(str(tmpdir.join('2_person_done.npy')), done)
+        del el_done
+
+        gen_pool.generate_profile_pool(path=path, runs=2, timestep=3600,
+                                       occupants=(2,), save_npz=False)
+
+        #  Completed runs are kept, the missing run is generated again
+        #  with the same seed
+        resumed = np.load(str(tmpdir.join('2_person_el.npy')))
+        assert np.all(resumed[0] == -1)
+        assert np.allclose(resumed[1], el[1])
+
+        profile_pool = pool.ProfilePool(path)
+        assert sorted(profile_pool.get_partition(2)) == ['dhw', 'el', 'occ']
@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+# coding=utf-8
+"""
+Profiling test.
+"""
+
+from __future__ import division
+
+import os
+import json
+
+import numpy as np
+
+import pycity_base.classes.demand.load as load
+import pycity_base.classes.demand.occupancy as occ
+import pycity_base.classes.demand.space_heating as sh
+import pycity_base.functions.change_resolution as chres
+import pycity_base.functions.profiling as profiling
+from pycity_base.test.pycity_fixtures import create_environment
+
+
+class TestProfiling(object):
+    """
+    Test class for the profiling spans and counters.
+    """
+
+    def test_disabled(self, create_environment):
+        profiling.reset()
+        assert not profiling.is_enabled()
+        sh.SpaceHeating(create_environment, method=1, profile_type='HEF',
+                        living_area=100, specific_demand=100)
+        profiling.increment('counter')
+        assert profiling.get_report() == {'spans': [], 'counters': []}
+        assert chres.changeResolution.__name__ == 'changeResolution'
+
+    def test_spans(self, create_environment, tmp_path):
+        load.clear_shared_profiles()
+        profiling.reset()
+        profiling.enable(memory=True)
+        try:
+            for i in range(2):
+                sh.SpaceHeating(create_environment, method=1,
+                                profile_type='HEF', living_area=100,
+                                specific_demand=100)
+            occ.Occupancy(create_environment, number_occupants=2)
+            with profiling.span('custom', 'test', size=3):
+                values = np.ones(100000)
+        finally:
+            profiling.disable()
+
+        spans = {(entry['phase'], entry['kind']): entry
+                 for entry in profiling.get_report()['spans']}
+        generate = spans[('generate', 'spaceheating')]
+        assert generate['count'] == 2
+        #  The thermal SLP is only computed once (shared base profile)
+        assert spans[('slp_thermal', None)]['count'] == 1
+        assert generate['self_time'] < generate['time']
+        assert generate['time'] >= spans[('slp_thermal', None)]['time']
+        assert spans[('generate', 'occupancy')]['count'] == 1
+        #  Allocated array is retained after the span
+        assert spans[('custom', 'test')]['memory'] >= values.nbytes
+
+        counters = {(entry['name'], entry['kind']): entry['value']
+                    for entry in profiling.get_report()['counters']}
+        assert counters[('shared_profile_miss', None)] == 1
+        assert counters[('shared_profile_hit', None)] == 1
+
+        assert 'slp_thermal' in profiling.format_report()
+
+        path = os.path.join(str(tmp_path), 'trace.json')
+        profiling.export_trace(path)
+        with open(path) as file:
+            events = json.load(file)['traceEvents']
+        custom = [event for event in events if event['name'] == 'custom']
+        assert custom[0]['cat'] == 'test'
+        assert custom[0]['ph'] == 'X'
+        assert custom[0]['args'] == {'size': 3}
+        assert any(event['ph'] == 'C' for event in events)
+
+        profiling.reset()
+        assert profiling.get_report()['spans'] == []
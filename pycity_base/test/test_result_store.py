@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+# coding=utf-8
+"""
+Result store test.
+"""
+
+from __future__ import division
+
+import numpy as np
+
+import pycity_base.classes.timer as ti
+import pycity_base.classes.weather as we
+import pycity_base.classes.prices as pr
+import pycity_base.classes.environment as env
+import pycity_base.classes.supply.boiler as boil
+import pycity_base.classes.supply.battery as bat
+import pycity_base.classes.supply.result_store as rstore
+from pycity_base.test.pycity_fixtures import create_environment
+
+
+class TestResultStore(object):
+    """
+    Test class for pyCity result store object.
+    """
+
+    def test_register_and_save(self, create_environment):
+        store = rstore.ResultStore(create_environment, nb_devices=2)
+
+        boilers = [boil.Boiler(create_environment, q_nominal=10000, eta=0.9)
+                   for i in range(5)]
+        battery = bat.Battery(create_environment, soc_init=0, capacity=1000)
+
+        store.register_multiple(boilers)
+        rows = store.register(battery)
+
+        assert rows == {'p_charge': 0, 'p_discharge': 0, 'soc': 0}
+        assert store.get_quantities() == ['device_schedule', 'p_charge',
+                                          'p_discharge', 'q_output', 'soc']
+        assert store.get_devices('q_output') == boilers
+
+        #  Registering twice does not add another row
+        store.register(boilers[0])
+        assert len(store.get_devices('q_output')) == 5
+
+        timesteps = create_environment.timer.timesteps_used_horizon
+        for (i, boiler) in enumerate(boilers):
+            boiler.setResults(np.ones(timesteps) * i, np.ones(timesteps))
+
+        results = store.get_results('q_output')
+        assert results.shape == (5, create_environment.timer.timesteps_total)
+        for (i, boiler) in enumerate(boilers):
+            (q_output, schedule) = boiler.getResults(currentValues=False)
+            assert np.shares_memory(q_output, store.data['q_output'])
+            assert np.all(results[i] == q_output)
+            assert np.all(q_output[:timesteps] == i)
+
+        current = store.get_results('q_output', currentValues=True)
+        assert current.shape == (5, timesteps)
+        assert np.all(current[:, 0] == np.arange(5))
+
+    def test_float32_memory_mapped(self, create_environment, tmp_path):
+        store = rstore.ResultStore(create_environment, nb_devices=1,
+                                   dtype=np.float32, path=str(tmp_path))
+
+        boiler_1 = boil.Boiler(create_environment, q_nominal=10000, eta=0.9)
+        boiler_2 = boil.Boiler(create_environment, q_nominal=10000, eta=0.9)
+        store.register(boiler_1)
+        boiler_1.setResults(np.ones(96) * 5000, np.ones(96))
+        store.register(boiler_2)
+
+        assert isinstance(store.data['q_output'], np.memmap)
+        assert store.data['q_output'].dtype == np.float32
+        assert boiler_1.total_q_output.dtype == np.float32
+        assert boiler_1.total_q_output[0] == 5000
+
+        store.flush()
+        saved = np.load(store.files['q_output'])
+        assert saved[0, 0] == 5000
+        assert len(list(tmp_path.iterdir())) == 2
+
+    def test_recorder(self, tmp_path):
+        timer = ti.Timer(time_discretization=3600,
+                         timesteps_horizon=48,
+                         timesteps_used_horizon=24,
+                         timesteps_total=8760)
+        weather = we.Weather(timer)
+        prices = pr.Prices()
+        environment = env.Environment(timer, weather, prices)
+
+        recorder = rstore.ResultRecorder(environment, path=str(tmp_path),
+                                         nb_devices=1)
+        boilers = [boil.Boiler(environment, q_nominal=10000, eta=0.9)
+                   for i in range(3)]
+        recorder.register_multiple(boilers)
+
+        for horizon in range(3):
+            for (i, boiler) in enumerate(boilers):
+                q_output = np.ones(timer.timesteps_horizon) * (horizon + i)
+                boiler.setResults(q_output, np.ones(timer.timesteps_horizon))
+            recorder.commit()
+            assert recorder.committed_timestep == 24 * (horizon + 1)
+            environment.update()
+
+        for (i, boiler) in enumerate(boilers):
+            (q_output, schedule) = boiler.getResults(currentValues=False)
+            assert isinstance(q_output, np.memmap)
+            assert len(q_output) == 8760
+            for horizon in range(3):
+                assert np.all(q_output[24 * horizon:24 * (horizon + 1)] ==
+                              horizon + i)
+            assert np.all(q_output[72:] == 0)
+
+        saved = np.load(recorder.files['q_output'])
+        assert saved.shape == (8760, 4)
+        results = recorder.get_results('q_output')
+        assert np.all(saved[:72, :3] == results[:, :72].T)
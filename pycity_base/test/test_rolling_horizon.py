@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+# coding=utf-8
+"""
+Rolling-horizon driver test.
+"""
+
+from __future__ import division
+
+import numpy as np
+
+import pycity_base.classes.supply.boiler as boil
+import pycity_base.classes.supply.result_store as rstore
+import pycity_base.functions.rolling_horizon as rolling
+from pycity_base.test.pycity_fixtures import create_environment, \
+    create_loadcurve_citydist
+
+
+class TestRollingHorizon(object):
+    """
+    Test class for the rolling-horizon driver.
+    """
+
+    def test_run_rolling_horizon(self, create_loadcurve_citydist, tmp_path):
+        city = create_loadcurve_citydist
+        timer = city.environment.timer
+
+        recorder = rstore.ResultRecorder(city.environment, path=str(tmp_path))
+        boilers = [boil.Boiler(city.environment, q_nominal=10000, eta=0.9)
+                   for i in range(3)]
+        recorder.register_multiple(boilers)
+
+        def callback(forecast, timer):
+            assert forecast['sh'].shape == (3, timer.timesteps_horizon)
+            assert len(forecast['weather']['t_ambient']) == \
+                timer.timesteps_horizon
+            assert not forecast['el'].flags.writeable
+            for (i, boiler) in enumerate(boilers):
+                boiler.setResults(forecast['sh'][i],
+                                  np.ones(timer.timesteps_horizon))
+
+        timings = rolling.run_rolling_horizon(city, callback,
+                                              result_store=recorder,
+                                              nb_horizons=3)
+
+        assert list(timings['timestep']) == [0, 96, 192]
+        assert np.all(timings['total'] >= timings['callback'])
+        assert timer.current_timestep == 288
+        assert recorder.committed_timestep == 288
+        for (i, boiler) in enumerate(boilers):
+            (q_output, schedule) = boiler.getResults(currentValues=False)
+            assert np.all(q_output[:288] == 1000 * (i + 1))
+            assert np.all(q_output[288:] == 0)
+
+        #  Complete run, stopped by the callback in the second horizon
+        lengths = []
+
+        def callback(forecast, timer):
+            lengths.append(len(forecast['pv']))
+            return timer.current_timestep < 96
+
+        timings = rolling.run_rolling_horizon(city, callback)
+        assert lengths == [192, 192]
+
+        #  Last horizon is shorter
+        del lengths[:]
+        timings = rolling.run_rolling_horizon(
+            city, lambda forecast, timer: lengths.append(len(forecast['pv'])))
+        assert len(timings['total']) == 365
+        assert lengths[-1] == 96
+        assert timer.current_timestep == timer.timesteps_total
+
+        timer.reinit(timer.time_discretization, timer.timesteps_horizon,
+                     timer.timesteps_used_horizon, timer.timesteps_total,
+                     timer.initial_day)
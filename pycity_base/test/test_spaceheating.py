@@ -10,6 +10,10 @@ import numpy as np
 import pytest
 
 import pycity_base.classes.demand.space_heating as sh
+import pycity_base.classes.environment as env
+import pycity_base.classes.prices as price
+import pycity_base.classes.timer as time
+import pycity_base.classes.weather as weath
 from pycity_base.test.pycity_fixtures import create_environment
 
 create_environment2 = create_environment
@@ -47,6 +51,19 @@ class TestSpaceHeating(object):
         #  Check if sum of energy demand values is (almost) equal to input
         assert abs(np.sum(th_energy_demand_curve) - 150 * 100) <= 0.001 * 150 * 100
 
+    def test_method1_short_timer(self):
+        #  The SLP is generated for the full year of weather data
+        timer = time.Timer(time_discretization=3600, timesteps_total=168)
+        environment = env.Environment(timer, weath.Weather(timer),
+                                      price.Prices())
+        spaceheating = sh.SpaceHeating(environment, method=1,
+                                       living_area=100, specific_demand=150)
+
+        space_heating_load_curve = spaceheating.get_power(currentValues=False)
+        assert len(space_heating_load_curve) == 8760
+        assert abs(np.sum(space_heating_load_curve) / 1000 - 150 * 100) <= \
+            0.001 * 150 * 100
+
     def test_method3(self, create_environment):  # Modelica profile
 
         #  Generate space heating object
@@ -64,6 +81,40 @@ class TestSpaceHeating(object):
         #  Check if sum of energy demand values is (almost) equal to input
         assert abs(np.sum(th_energy_demand_curve) - 150 * 100) <= 0.001 * 150 * 100
 
+    def test_shared_profiles(self, create_environment):  # Copy-on-write
+        spaceheating_1 = sh.SpaceHeating(create_environment,
+                                         method=1,
+                                         living_area=100,
+                                         specific_demand=150)
+        spaceheating_2 = sh.SpaceHeating(create_environment,
+                                         method=1,
+                                         living_area=200,
+                                         specific_demand=150)
+
+        #  Both objects share one read-only base profile
+        (base_1, scale_1) = spaceheating_1.get_base_profile()
+        (base_2, scale_2) = spaceheating_2.get_base_profile()
+        assert base_1 is base_2
+        assert not base_1.flags.writeable
+        assert (scale_1, scale_2) == (15000, 30000)
+        assert np.allclose(spaceheating_2.get_power(currentValues=False),
+                           2 * spaceheating_1.get_power(currentValues=False))
+
+        #  Accessing the load curve creates a private copy
+        power_1 = spaceheating_1.get_power(currentValues=False).copy()
+        spaceheating_1.loadcurve[:] = 0
+        assert not spaceheating_1.is_shared
+        assert spaceheating_2.is_shared
+        assert np.allclose(spaceheating_1.get_power(currentValues=False), 0)
+        assert np.allclose(spaceheating_2.get_power(currentValues=False),
+                           2 * power_1)
+
+        #  Power curves are read-only, whether they are shared or not
+        for spaceheating in (spaceheating_1, spaceheating_2):
+            assert not spaceheating.get_power(currentValues=False).flags.writeable
+            assert not spaceheating.get_power(currentValues=True).flags.writeable
+        assert spaceheating_1.loadcurve.flags.writeable
+
     @pytest.mark.parametrize("create_environment2", [(3600)], indirect=["create_environment2"])
     def test_multiple_resolutions(self, create_environment, create_environment2):
 
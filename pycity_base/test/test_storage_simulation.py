@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+# coding=utf-8
+"""
+Storage simulation test.
+"""
+
+from __future__ import division
+
+import numpy as np
+
+import pycity_base.classes.supply.battery as bat
+import pycity_base.classes.supply.thermal_energy_storage as tes
+import pycity_base.functions.storage_simulation as storage
+from pycity_base.test.pycity_fixtures import create_environment
+
+
+class TestStorageSimulation(object):
+    """
+    Test class for the batched storage simulation.
+    """
+
+    def test_battery_soc(self):
+        p_charge = np.array([[1000, 1000, 0, 0],
+                             [0, 0, 0, 0]])
+        p_discharge = np.array([[0, 0, 500, 5000],
+                                [0, 0, 0, 0]])
+
+        (soc, charge, discharge) = storage.battery_soc(
+            p_charge, p_discharge, soc_init=[0, 3600], capacity=5400,
+            time_discretization=3, self_discharge=[0, 0.5], eta_charge=1,
+            eta_discharge=1)
+
+        #  Charging is limited by the capacity, discharging by the energy
+        assert np.allclose(soc[0], [3000, 5400, 3900, 0])
+        assert np.allclose(charge[0], [1000, 800, 0, 0])
+        assert np.allclose(discharge[0], [0, 0, 500, 1300])
+
+        #  Self discharge
+        assert np.allclose(soc[1], [1800, 900, 450, 225])
+
+    def test_tes_temperature(self):
+        heat_capacity = 1000 * tes.ThermalEnergyStorage.c_water
+        timesteps = 10
+        q_charge = np.ones((1, timesteps)) * heat_capacity / 3600
+        q_discharge = np.zeros((1, timesteps))
+
+        (t_sto, charge, discharge) = storage.tes_temperature(
+            q_charge, q_discharge, t_init=50, capacity=1000, t_max=55,
+            time_discretization=3600, t_surroundings=20, k_losses=0)
+
+        assert np.allclose(t_sto[0], [51, 52, 53, 54, 55, 55, 55, 55, 55, 55])
+        assert np.allclose(charge[0, 5:], 0)
+
+        (t_sto, charge, discharge) = storage.tes_temperature(
+            np.zeros((1, timesteps)), q_charge * 10, t_init=50,
+            capacity=1000, t_max=55, time_discretization=3600, k_losses=3,
+            t_min=40)
+        assert np.allclose(t_sto[0, 0], 40)
+        assert np.all(t_sto[0, 1:] < 40)
+        assert np.allclose(discharge[0, 1:], 0)
+
+    def test_simulate_devices(self, create_environment):
+        timer = create_environment.timer
+        timesteps = timer.timesteps_horizon
+        used = timer.timesteps_used_horizon
+
+        batteries = [bat.Battery(create_environment, soc_init=0,
+                                 capacity=3600 * 1000 * (i + 1))
+                     for i in range(3)]
+        p_charge = np.ones((3, timesteps)) * 2000
+        (soc, charge, discharge) = storage.simulate_batteries(
+            batteries, p_charge, np.zeros((3, timesteps)))
+
+        assert soc.shape == (3, timesteps)
+        assert np.all(soc <= [[3600 * 1000], [7200 * 1000], [10800 * 1000]])
+        for (i, battery) in enumerate(batteries):
+            (soc_saved, charge_saved, discharge_saved) = \
+                battery.getResults(currentValues=False)
+            assert np.allclose(soc_saved[:used], soc[i, :used])
+            assert battery.soc_init == soc[i, used - 1]
+
+        storages = [tes.ThermalEnergyStorage(create_environment, 60, 500, 80)
+                    for i in range(2)]
+        (t_sto, charge, discharge) = storage.simulate_thermal_storages(
+            storages, np.zeros((2, timesteps)), np.ones((2, timesteps)) * 500)
+
+        assert np.all(np.diff(t_sto, axis=1) <= 0)
+        assert np.allclose(t_sto[:, -1], 20)
+        for (i, thermal_storage) in enumerate(storages):
+            assert np.allclose(thermal_storage.getResults(True),
+                               t_sto[i, :used])
+            assert thermal_storage.t_init == t_sto[i, used - 1]
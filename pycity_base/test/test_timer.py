@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+# coding=utf-8
+"""
+Timer test.
+"""
+
+from __future__ import division
+
+import numpy as np
+
+import shapely.geometry.point as point
+
+import pycity_base.classes.building as build
+import pycity_base.classes.city_district as citydist
+import pycity_base.classes.demand.apartment as apart
+import pycity_base.classes.demand.electrical_demand as ed
+import pycity_base.classes.demand.occupancy as occ
+import pycity_base.classes.demand.space_heating as sh
+import pycity_base.classes.environment as env
+import pycity_base.classes.prices as pr
+import pycity_base.classes.supply.boiler as boil
+import pycity_base.classes.timer as ti
+import pycity_base.classes.weather as we
+
+
+class TestTimer(object):
+    """
+    Test class for the timer (calendar and data types).
+    """
+
+    def test_calendar_arrays(self):
+        timer = ti.Timer(time_discretization=3600, timesteps_total=24 * 10,
+                         initial_day=6, holidays=[2])
+
+        assert timer.timestep_day.shape == (240,)
+        assert timer.timestep_day[25] == 1
+        assert timer.timestep_hour[25] == 1
+        assert list(timer.day_weekday) == [6, 7, 1, 2, 3, 4, 5, 6, 7, 1]
+        assert list(np.flatnonzero(timer.day_weekend)) == [0, 1, 7, 8]
+        assert np.all(timer.timestep_weekend[:48])
+        assert not np.any(timer.timestep_weekend[48:168])
+        assert np.all(timer.timestep_holiday == (timer.timestep_day == 2))
+        assert list(timer.get_weekday_indexes()[:4]) == [5, 6, 6, 1]
+        #  Days after the timer continue the week cycle
+        weekdays = timer.get_weekday_indexes(nb_days=365)
+        assert len(weekdays) == 365
+        assert list(weekdays[8:12]) == [6, 0, 1, 2]
+        assert list(weekdays[[100, 364]]) == [(5 + 100) % 7, (5 + 364) % 7]
+        assert list(timer.get_weekday_indexes(nb_days=3)) == [5, 6, 6]
+        assert timer.day_date is None
+
+    def test_start_date(self):
+        #  1st of January 2017 was a Sunday
+        timer = ti.Timer(time_discretization=900, timesteps_total=96 * 40,
+                         start_date='2017-01-01',
+                         holidays=['2017-01-01', '2017-01-06'])
+        assert timer.initial_day == 7
+        assert timer.current_day_weekend
+        assert timer.day_date[31] == np.datetime64('2017-02-01')
+        assert list(np.flatnonzero(timer.day_holiday)) == [0, 5]
+
+    def test_update(self):
+        timer = ti.Timer(time_discretization=900, timesteps_horizon=192,
+                         timesteps_used_horizon=96, timesteps_total=96 * 14,
+                         initial_day=4)
+        for day in range(1, 6):
+            timer.update()
+            assert timer.current_day == day
+            assert timer.current_weekday == timer.day_weekday[day]
+            assert timer.current_day_weekend == timer.day_weekend[day]
+
+        #  Hourly updates change the day every 24 horizons
+        timer.reinit(3600, 24, 1, 8760, 1)
+        for i in range(24):
+            timer.update()
+        assert timer.current_day == 1
+        assert timer.current_weekday == 2
+
+    def test_float32(self):
+        timer = ti.Timer(time_discretization=3600, timesteps_total=8760,
+                         dtype=np.float32)
+        weather = we.Weather(timer)
+        environment = env.Environment(timer, weather, pr.Prices())
+        assert timer.int_dtype == np.uint8
+        assert weather.t_ambient.dtype == np.float32
+
+        city = citydist.CityDistrict(environment)
+        for i in range(2):
+            apartment = apart.Apartment(environment)
+            apartment.addMultipleEntities([
+                ed.ElectricalDemand(environment, method=0,
+                                    loadcurve=np.ones(8760) * 100),
+                sh.SpaceHeating(environment, method=1, profile_type='HEF',
+                                living_area=100, specific_demand=100),
+                occ.Occupancy(environment, 2, do_profile=False)])
+            apartment.occupancy.occupancy = np.ones(52560) * 2
+            building = build.Building(environment)
+            building.addEntity(apartment)
+            city.addEntity(building, position=point.Point(0, i * 10))
+
+        assert apartment.power_el.loadcurve.dtype == np.float32
+        assert apartment.occupancy.occupancy.dtype == np.uint8
+        (profile, scale) = apartment.demand_space_heating.get_base_profile()
+        assert profile.dtype == np.float32
+        assert apartment.demand_space_heating.get_power().dtype == np.float32
+        assert boil.Boiler(environment, 10000, 0.9).total_q_output.dtype == \
+            np.float32
+
+        #  Aggregates are computed with float64
+        assert city.get_demand_matrix('sh').dtype == np.float32
+        city.use_demand_matrix = True
+        power = city.get_aggr_space_heating_power_curve()
+        assert power.dtype == np.float64
+        assert np.isclose(np.sum(power) / 1000, 2 * 100 * 100, rtol=1e-5)
+
+        #  Converted load curves invalidate the cached curves
+        building.apartments[0].power_el.loadcurve = np.ones(8760) * 100.1
+        assert np.allclose(building.get_electric_power_curve(), 100.1)
+        building.apartments[0].power_el.set_dtype(np.float16)
+        assert np.all(building.get_electric_power_curve() == 100.125)
+        space_heating = building.apartments[0].demand_space_heating
+        version = space_heating.version
+        space_heating.set_dtype(np.float64)
+        assert space_heating.version > version
+        (profile, scale) = space_heating.get_base_profile()
+        assert profile.dtype == np.float64
+        assert not profile.flags.writeable
+        assert np.isclose(np.sum(building.get_space_heating_power_curve()) /
+                          1000, 100 * 100)
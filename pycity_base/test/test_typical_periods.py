@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+# coding=utf-8
+"""
+Typical period aggregation test.
+"""
+
+from __future__ import division
+
+import numpy as np
+
+import pycity_base.classes.forecast_provider as fp
+import pycity_base.functions.typical_periods as typ
+from pycity_base.test.pycity_fixtures import create_environment, \
+    create_loadcurve_citydist
+
+
+class TestTypicalPeriods(object):
+    """
+    Test class for the aggregation to typical periods.
+    """
+
+    def test_aggregate(self, create_loadcurve_citydist):
+        city = create_loadcurve_citydist
+        timer = city.environment.timer
+        weather = city.environment.weather
+
+        periods = typ.aggregate(city, 8, extreme_periods=[('t_ambient', 'min'),
+                                                          ('pv', 'max')],
+                                seed=0)
+
+        assert periods.nb_periods == 8
+        assert periods.timesteps_period == 96
+        assert np.all(np.diff(periods.period_indexes) > 0)
+        assert np.sum(periods.weights) == 365
+        assert len(periods.assignment) == 365
+        assert np.all(periods.assignment[periods.period_indexes] ==
+                      np.arange(8))
+
+        #  Extreme periods are typical periods of their own
+        coldest_day = np.argmin(weather.t_ambient[:timer.timesteps_total]) \
+            // 96
+        assert coldest_day in periods.period_indexes
+        assert periods.weights[list(periods.period_indexes).index(
+            coldest_day)] == 1
+
+        #  Reduced environment
+        reduced_timer = periods.environment.timer
+        assert reduced_timer.timesteps_total == 8 * 96
+        assert reduced_timer.timesteps_horizon == 96
+        assert np.all(reduced_timer.day_weekday ==
+                      timer.day_weekday[periods.period_indexes])
+        first_day = periods.period_indexes[0]
+        assert np.all(periods.environment.weather.t_ambient[:96] ==
+                      weather.t_ambient[first_day * 96:(first_day + 1) * 96])
+        assert periods.environment.weather.current_t_ambient.shape == (96,)
+        assert timer.timesteps_total == 35040
+
+        #  Demands and mapping back to the full year
+        assert periods.demands['sh'].shape == (3, 8 * 96)
+        assert np.all(periods.demands['sh'][1] == 2000)
+        annual_heat = np.sum(periods.demands['sh'].sum(axis=0) *
+                             periods.timestep_weights)
+        assert np.isclose(annual_heat,
+                          np.sum(city.get_demand_matrix('sh')))
+        full_pv = periods.expand(periods.demands['pv'])
+        assert full_pv.shape == (35040,)
+        assert np.all(periods.reduce(full_pv) == periods.demands['pv'])
+
+    def test_incomplete_period(self, create_loadcurve_citydist):
+        city = create_loadcurve_citydist
+
+        periods = typ.aggregate(city, 4, period_days=7, seed=1)
+
+        #  52 complete weeks and one day
+        assert periods.timesteps_period == 7 * 96
+        assert len(periods.assignment) == 53
+        assert np.isclose(np.sum(periods.weights), 365 / 7)
+        assert periods.expand(np.zeros(4 * 7 * 96)).shape == (35040,)
+
+    def test_forecast_provider(self, create_loadcurve_citydist):
+        city = create_loadcurve_citydist
+        weather = city.environment.weather
+        weather.set_forecast_provider(fp.LocalForecastProvider(weather))
+        try:
+            periods = typ.aggregate(city, 2, seed=0)
+
+            #  The reduced weather does not share the forecast provider
+            assert periods.environment.weather.forecast_prefetcher is None
+            assert weather.forecast_prefetcher is not None
+        finally:
+            weather.set_forecast_provider(None)
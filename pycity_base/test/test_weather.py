@@ -6,6 +6,7 @@ Weather test.
 
 import os
 import pytest
+import numpy as np
 
 import pycity_base.classes.timer as ti
 import pycity_base.classes.weather as we
@@ -44,3 +45,71 @@ class TestWeather():
             assert sum(weather1.q_direct[i * 96:(i + 1) * 96]) / 96 == pytest.approx(v)
             assert sum(weather2.q_direct[i * 24:(i + 1) * 24]) / 24 == pytest.approx(v)
             assert sum(weather3.q_direct[i * 16:(i + 1) * 16]) / 16 == pytest.approx(v)
+
+    def test_multi_year(self):
+        timer = ti.Timer(900, timesteps_total=35040 * 3)
+        weather_year = we.Weather(timer=ti.Timer(900))
+
+        #  Cyclic extension of one TRY
+        weather = we.Weather(timer=timer, cyclic=True)
+        assert len(weather.t_ambient) == 35040 * 3
+        assert (weather.t_ambient[35040 * 2 + 10] ==
+                weather_year.t_ambient[10])
+        values = weather.q_direct[35000:35100]
+        assert len(values) == 100
+        assert np.allclose(values[40:], weather_year.q_direct[:60])
+        assert np.isclose(np.mean(weather.t_ambient),
+                          np.mean(weather_year.t_ambient))
+
+        timer.current_timestep = 35040 * 3 - 96
+        (t_ambient,) = weather.getWeatherForecast(getTAmbient=True)
+        assert len(t_ambient) == 96
+
+        #  Chained TRY files, loaded on first access
+        src_path = os.path.dirname(os.path.dirname(__file__))
+        path = os.path.join(src_path, 'inputs', 'weather',
+                            'TRY2010_05_Jahr.dat')
+        weather = we.Weather(timer=ti.Timer(900, timesteps_total=35040 * 2),
+                             path_TRY=[path, path], cache_size=1)
+        source = weather.t_ambient.source
+        assert source._cache == {}
+        assert np.allclose(weather.t_ambient[35040:35140],
+                           weather_year.t_ambient[:100])
+        assert list(source._cache) == [1]
+        assert weather.weather_dataset_name == 'TRY2010_05_Jahr'
+
+    def test_single_multi_year_file(self, tmpdir):
+        src_path = os.path.dirname(os.path.dirname(__file__))
+        path = os.path.join(src_path, 'inputs', 'weather',
+                            'TRY2010_05_Jahr.dat')
+        with open(path) as try_file:
+            lines = try_file.readlines()
+        (header, rows) = (lines[:38], lines[38:38 + 8760])
+        weather_year = we.Weather(timer=ti.Timer(3600))
+
+        #  Leap year: one file with 8784 rows
+        leap_path = str(tmpdir.join('leap.dat'))
+        with open(leap_path, 'w') as try_file:
+            try_file.writelines(header + rows + rows[:24])
+        weather = we.Weather(timer=ti.Timer(3600, timesteps_total=8784),
+                             path_TRY=leap_path)
+        assert len(weather.t_ambient) == 8784
+        assert np.allclose(weather.t_ambient[8760:],
+                           weather_year.t_ambient[:24])
+
+        #  Two years in one file, loaded year by year
+        path_2 = str(tmpdir.join('two_years.dat'))
+        with open(path_2, 'w') as try_file:
+            try_file.writelines(header + rows + rows)
+        weather = we.Weather(timer=ti.Timer(3600, timesteps_total=8760 * 2),
+                             path_TRY=path_2, cache_size=1)
+        source = weather.t_ambient.source
+        assert len(source.loaders) == 2
+        assert np.allclose(weather.t_ambient[8760:8860],
+                           weather_year.t_ambient[:100])
+        assert list(source._cache) == [1]
+
+        #  One year of data is read for timers up to one year
+        weather = we.Weather(timer=ti.Timer(3600, timesteps_total=8760),
+                             path_TRY=path_2)
+        assert len(weather.t_ambient) == 8760